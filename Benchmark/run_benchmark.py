@@ -0,0 +1,258 @@
+'''
+    Time the kernel operations of Chern on a synthetic project.
+
+    Usage (from this directory):
+        python run_benchmark.py --tasks 500 --output results.json
+        python run_benchmark.py --tasks 500 --baseline results.json
+
+    Each operation runs ``repeat'' times on its own copy of the generated
+    project, with the in-memory caches of Chern cleared before each run.
+    The results (the timings in seconds) are written to a JSON file,
+    and compared to a baseline file if given:
+    the operations whose median is more than ``threshold'' times the
+    baseline median are reported as regressions, and the exit code is 1.
+'''
+import io
+import json
+import logging
+import os
+import platform
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import redirect_stdout
+from datetime import datetime, timezone
+from os.path import join
+
+import click
+
+sys.path.insert(0, os.path.abspath(join(os.path.dirname(__file__), "..")))
+
+# pylint: disable=wrong-import-position
+from Chern.kernel import vtask
+from Chern.kernel.chern_cache import ChernCache
+from Chern.kernel.chern_communicator import ChernCommunicator
+from Chern.kernel.vobj_file import LsParameters
+from Chern.kernel.vobject import VObject
+from Chern.utils import metadata
+from stub_dite import StubDite
+from synthetic import ProjectShape, generate_project, touch_files, working_directory
+
+CHERN_CACHE = ChernCache.instance()
+
+DEFAULT_THRESHOLD = 1.25
+# Differences below this (in seconds) are noise
+MIN_DIFFERENCE = 0.005
+
+# The stub servers started by the setups, stopped after each run
+STUBS = []
+
+
+class Operation:
+    ''' A benchmarked operation: ``setup'' (not timed) and ``run'' (timed),
+    both called with the project path and the index of the run
+    '''
+
+    def __init__(self, run, setup=None):
+        self.run = run
+        self.setup = setup
+
+
+def _last_layer(path):
+    ''' The path of the last layer directory '''
+    layers = sorted(name for name in os.listdir(path) if name.startswith("layer_"))
+    return join(path, layers[-1])
+
+
+def _first_task(path):
+    ''' The path of the first task of the first layer '''
+    return join(path, "layer_0", "task_0")
+
+
+def _setup_impress(path, index):
+    ''' Modify a task of the first layer, all its successors change '''
+    touch_files(ProjectShape(files=1), _first_task(path), random.Random(index))
+
+
+def _setup_add_input(path, index):
+    vtask.create_task(join(_last_layer(path), f"bench_{index}"))
+
+
+def _run_add_input(path, index):
+    VObject(join(_last_layer(path), f"bench_{index}")).add_input(_first_task(path), "bench")
+
+
+def _run_move_to(path, index):
+    names = ("task_0", "task_moved")
+    source, target = names[index % 2], names[(index + 1) % 2]
+    VObject(join(_last_layer(path), source)).move_to(join(_last_layer(path), target))
+
+
+def _run_trace(path, _):
+    task = VObject(join(_last_layer(path), "task_0"))
+    if task.impression() is not None and task.impression().parents():
+        task.trace()
+
+
+def _setup_deposit(path, _):
+    stub = StubDite().start()
+    metadata.ConfigFile(join(path, ".chern", "hosts.json")).write_variable(
+        "serverurl", stub.url)
+    ChernCommunicator.ins = None
+    STUBS.append(stub)
+
+
+OPERATIONS = {
+    "ls": Operation(lambda path, _: VObject(_last_layer(path)).ls(LsParameters())),
+    "status": Operation(lambda path, _: VObject(path).status()),
+    "impress": Operation(lambda path, _: VObject(path).impress(), _setup_impress),
+    "add_input": Operation(_run_add_input, _setup_add_input),
+    "copy_to": Operation(lambda path, index: VObject(join(path, "layer_0")).copy_to(
+        join(path, f"copy_{index}"))),
+    "move_to": Operation(_run_move_to),
+    "build_dependency_dag": Operation(lambda path, _: VObject(path).build_dependency_dag()),
+    "trace": Operation(_run_trace),
+    "deposit": Operation(lambda path, _: VObject(path).deposit(), _setup_deposit),
+}
+
+
+def time_operation(name, project, workdir, repeat):
+    ''' Run the operation ``repeat'' times on a copy of the project
+
+    Returns:
+        list: the timings in seconds
+    '''
+    operation = OPERATIONS[name]
+    path = join(workdir, f"bench_{name}")
+    if os.path.exists(path):
+        shutil.rmtree(path)
+    shutil.copytree(project, path, symlinks=True)
+    timings = []
+    with working_directory(path), redirect_stdout(io.StringIO()):
+        for index in range(repeat):
+            if operation.setup is not None:
+                operation.setup(path, index)
+            CHERN_CACHE.__init__()
+            start = time.perf_counter()
+            operation.run(path, index)
+            timings.append(time.perf_counter() - start)
+            while STUBS:
+                STUBS.pop().stop()
+    shutil.rmtree(path)
+    return timings
+
+
+def git_commit():
+    ''' The commit of the working tree, empty if unknown '''
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__))
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ""
+
+
+def compare(results, baseline, thresholds):
+    ''' The regressions of the results with respect to the baseline
+
+    Returns:
+        list: (operation, baseline median, median, ratio)
+    '''
+    regressions = []
+    for name, result in results["results"].items():
+        if name not in baseline.get("results", {}):
+            continue
+        old = baseline["results"][name]["median"]
+        new = result["median"]
+        if new - old < MIN_DIFFERENCE:
+            continue
+        ratio = new / old if old > 0 else float("inf")
+        if ratio > thresholds.get(name, thresholds["*"]):
+            regressions.append((name, old, new, ratio))
+    return regressions
+
+
+@click.command()
+@click.option("--tasks", default=100, help="Number of tasks")
+@click.option("--layers", default=4, help="Number of layers (directories) of tasks")
+@click.option("--fan-in", default=2, help="Number of inputs of each task")
+@click.option("--algorithms", default=2, help="Number of algorithms")
+@click.option("--files", default=4, help="Number of files of each task")
+@click.option("--file-size", default=1024, help="Size of each file in bytes")
+@click.option("--history", default=2, help="Number of impressions of each object")
+@click.option("--seed", default=0, help="Seed of the generator")
+@click.option("--repeat", default=3, help="Number of runs of each operation")
+@click.option("--ops", default=",".join(OPERATIONS), help="Comma separated operations")
+@click.option("--workdir", default="", help="Directory of the projects (temporary if empty)")
+@click.option("--output", default="results.json", help="JSON file of the results")
+@click.option("--baseline", default="", help="JSON file of the results to compare with")
+@click.option("--threshold", default=DEFAULT_THRESHOLD,
+              help="Largest ratio of the median to the baseline median")
+@click.option("--op-threshold", multiple=True,
+              help="Threshold of one operation, as operation=ratio")
+def main(**options):  # pylint: disable=too-many-locals
+    ''' Benchmark the kernel operations '''
+    logging.getLogger("ChernLogger").setLevel(logging.ERROR)
+    shape = ProjectShape(**{field: options[field] for field in ProjectShape().as_dict()})
+    names = [name for name in options["ops"].split(",") if name]
+    unknown = [name for name in names if name not in OPERATIONS]
+    if unknown:
+        raise click.BadParameter(f"Unknown operations: {', '.join(unknown)}")
+
+    workdir = options["workdir"] or tempfile.mkdtemp(prefix="chern_bench_")
+    os.makedirs(workdir, exist_ok=True)
+    project = join(workdir, "project")
+    print(f"Generating the project in {project}...")
+    start = time.perf_counter()
+    generate_project(project, shape)
+    print(f"Generated in {time.perf_counter() - start:.2f} s")
+
+    results = {
+        "commit": git_commit(),
+        "date": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "shape": shape.as_dict(),
+        "repeat": options["repeat"],
+        "results": {},
+    }
+    for name in names:
+        timings = time_operation(name, project, workdir, options["repeat"])
+        results["results"][name] = {
+            "runs": timings,
+            "median": statistics.median(timings),
+            "min": min(timings),
+        }
+        print(f"{name:<24} median {statistics.median(timings):9.4f} s"
+              f"  min {min(timings):9.4f} s")
+    if not options["workdir"]:
+        shutil.rmtree(workdir)
+
+    with open(options["output"], "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+    print(f"Results written to {options['output']}")
+
+    if not options["baseline"]:
+        return
+    with open(options["baseline"], encoding="utf-8") as f:
+        baseline = json.load(f)
+    if baseline.get("shape") != results["shape"]:
+        print("Warning: the baseline was measured on a different project shape")
+    thresholds = {"*": options["threshold"]}
+    for item in options["op_threshold"]:
+        name, ratio = item.split("=", 1)
+        thresholds[name] = float(ratio)
+    regressions = compare(results, baseline, thresholds)
+    for name, old, new, ratio in regressions:
+        print(f"REGRESSION {name}: {old:.4f} s -> {new:.4f} s (x{ratio:.2f})")
+    if regressions:
+        sys.exit(1)
+    print("No regression")
+
+
+if __name__ == "__main__":
+    main()  # pylint: disable=no-value-for-parameter
@@ -0,0 +1,91 @@
+'''
+    A local stub of the DITE server for the benchmarks.
+
+    It answers the requests of ChernCommunicator from memory:
+    the uploads are recorded (and their size counted) but not stored,
+    the deposited queries are answered from the recorded uploads,
+    and every impression is reported as finished.
+'''
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class StubDiteHandler(BaseHTTPRequestHandler):
+    ''' The request handler of the stub server '''
+
+    def log_message(self, format, *args):  # pylint: disable=redefined-builtin
+        ''' Keep the benchmark output quiet '''
+
+    def reply(self, body, content_type="text/plain"):
+        ''' Send a 200 response '''
+        data = body.encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):  # pylint: disable=invalid-name
+        ''' The queries '''
+        parts = self.path.strip("/").split("/")
+        deposited = self.server.deposited
+        if parts[0] == "dite-status":
+            self.reply("ok")
+        elif parts[0] == "deposited":
+            self.reply("TRUE" if parts[1] in deposited else "FALSE")
+        elif parts[0] == "machine-id":
+            self.reply("local")
+        elif parts[0] in ("status", "run-status", "sample-status"):
+            self.reply("finished" if parts[1] in deposited else "unsubmitted")
+        else:
+            self.reply("")
+
+    def do_POST(self):  # pylint: disable=invalid-name
+        ''' The uploads and the batch queries '''
+        length = int(self.headers.get("Content-Length", 0))
+        body = self.rfile.read(length)
+        deposited = self.server.deposited
+        if self.path.strip("/") == "deposited":
+            uuids = json.loads(body).get("impressions", [])
+            self.reply(json.dumps([uuid for uuid in uuids if uuid in deposited]),
+                       "application/json")
+            return
+        if self.path.strip("/") == "upload":
+            # The multipart field ``tarname'' is [uuid].tar.gz
+            text = body.decode("utf-8", errors="replace")
+            marker = 'name="tarname"\r\n\r\n'
+            with self.server.lock:
+                self.server.uploaded_bytes += length
+                if marker in text:
+                    tarname = text.split(marker, 1)[1].split("\r\n", 1)[0]
+                    deposited.add(tarname[:-len(".tar.gz")])
+        self.reply("")
+
+
+class StubDite:
+    ''' The stub server, started in a daemon thread '''
+
+    def __init__(self):
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), StubDiteHandler)
+        self.server.deposited = set()
+        self.server.uploaded_bytes = 0
+        self.server.lock = threading.Lock()
+        self.thread = None
+
+    @property
+    def url(self):
+        ''' The host:port of the server '''
+        host, port = self.server.server_address[:2]
+        return f"{host}:{port}"
+
+    def start(self):
+        ''' Start serving '''
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        ''' Stop serving '''
+        self.server.shutdown()
+        self.server.server_close()
@@ -0,0 +1,144 @@
+'''
+    Generate synthetic Chern projects for the benchmarks.
+
+    The shape of a project is given by a ProjectShape:
+        tasks: the number of tasks, spread over ``layers'' directories
+        fan_in: the number of inputs of each task, from the previous layer
+        algorithms: the number of algorithms shared by the tasks
+        files, file_size: the number and the size (in bytes) of the files
+            of each task
+        history: the number of impressions of every object
+    The generation is deterministic for a given seed.
+'''
+import os
+import random
+import shutil
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass
+
+from Chern.kernel import vdirectory
+from Chern.kernel import vproject
+from Chern.kernel import vtask
+from Chern.kernel.chern_cache import ChernCache
+from Chern.kernel.vobject import VObject
+from Chern.utils import csys
+from Chern.utils import metadata
+
+CHERN_CACHE = ChernCache.instance()
+
+
+@dataclass
+class ProjectShape:
+    ''' The shape of a synthetic project '''
+    tasks: int = 100
+    layers: int = 4
+    fan_in: int = 2
+    algorithms: int = 2
+    files: int = 4
+    file_size: int = 1024
+    history: int = 1
+    seed: int = 0
+
+    def as_dict(self):
+        ''' The shape as a dict, for the results '''
+        return asdict(self)
+
+
+@contextmanager
+def working_directory(path):
+    ''' Change the working directory in the block '''
+    cwd = os.getcwd()
+    os.chdir(path)
+    try:
+        yield
+    finally:
+        os.chdir(cwd)
+
+
+def write_file(path, size, rng):
+    ''' Write a text file of the given size '''
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(rng.randbytes(size // 2 + 1).hex()[:size])
+
+
+def create_algorithm(path):
+    ''' Create an algorithm without opening the editor '''
+    csys.mkdir(path + "/.chern")
+    metadata.ConfigFile(path + "/.chern/config.json").write_variable(
+        "object_type", "algorithm")
+    metadata.YamlFile(path + "/chern.yaml").write_variables({
+        "environment": "script",
+        "commands": ["python run.py"],
+    })
+    with open(path + "/run.py", "w", encoding="utf-8") as f:
+        f.write("print('synthetic')\n")
+    with open(path + "/.chern/README.md", "w", encoding="utf-8") as f:
+        f.write("Synthetic algorithm")
+
+
+def layer_tasks(shape, layer):
+    ''' The paths of the tasks of a layer '''
+    width = shape.tasks // shape.layers + (layer < shape.tasks % shape.layers)
+    return [f"layer_{layer}/task_{index}" for index in range(width)]
+
+
+def touch_files(shape, task_path, rng):
+    ''' Modify the first file of the task '''
+    if shape.files:
+        write_file(f"{task_path}/data_0.txt", shape.file_size, rng)
+
+
+def generate_project(path, shape):
+    ''' Generate the project at path (removed first if it exists)
+
+    Returns:
+        dict: the ``tasks'' and the ``algorithms'' (paths relative to the project)
+    '''
+    rng = random.Random(shape.seed)
+    if os.path.exists(path):
+        shutil.rmtree(path)
+    csys.mkdir(path + "/.chern")
+    path = os.path.abspath(path)
+    vproject.create_readme(path)
+    vproject.create_configfile(path, csys.generate_uuid())
+    vproject.create_hostsfile(path)
+    CHERN_CACHE.__init__()
+
+    with working_directory(path):
+        algorithms = [f"code/algorithm_{index}" for index in range(shape.algorithms)]
+        if algorithms:
+            vdirectory.create_directory("code")
+        for algorithm in algorithms:
+            create_algorithm(algorithm)
+
+        layers = []
+        for layer in range(shape.layers):
+            vdirectory.create_directory(f"layer_{layer}")
+            tasks = layer_tasks(shape, layer)
+            vtask.create_tasks(f"layer_{layer}/task", 0, len(tasks))
+            layers.append(tasks)
+        tasks = [task for layer in layers for task in layer]
+
+        for task in tasks:
+            for index in range(shape.files):
+                write_file(f"{task}/data_{index}.txt", shape.file_size, rng)
+
+        for layer, layer_paths in enumerate(layers):
+            for index, task in enumerate(layer_paths):
+                obj = vtask.VTask(os.path.join(path, task))
+                if algorithms:
+                    obj.add_algorithm(os.path.join(path, algorithms[index % len(algorithms)]))
+                if layer == 0:
+                    continue
+                inputs = rng.sample(layers[layer - 1], min(shape.fan_in, len(layers[layer - 1])))
+                obj.add_inputs([(os.path.join(path, pred), f"in_{number}")
+                                for number, pred in enumerate(inputs)])
+
+        for generation in range(shape.history):
+            if generation > 0:
+                for task in tasks:
+                    touch_files(shape, task, rng)
+            CHERN_CACHE.__init__()
+            VObject(path).impress()
+    CHERN_CACHE.__init__()
+    return {"tasks": tasks, "algorithms": algorithms}
@@ -8,7 +8,10 @@ including initialization, prompt management, command parsing, and completion.
 import cmd
 import os
 from ..utils import csys
+from ..utils import metadata
 from ..utils.metadata import YamlFile
+from ..utils.metrics import ChernMetrics
+from ..utils.profiling import CallCounter
 
 
 class ChernShellBase(cmd.Cmd):
@@ -18,6 +21,7 @@ class ChernShellBase(cmd.Cmd):
     prompt = '[Chern]'
     file = None
     readline_file = None
+    timing = False
 
     def __init__(self):
         """Initialize the shell and set custom completer delimiters."""
@@ -28,6 +32,12 @@ class ChernShellBase(cmd.Cmd):
         current_project_name = manager.get_current_project()
         current_project_path = manager.get_project_path(current_project_name)
         from ..kernel.vproject import VProject
+        from ..kernel.chern_journal import ChernJournal
+        if ChernJournal(current_project_path).recover():
+            print("Recovered an interrupted operation of the project.")
+        # The metrics of the session, shown by ``stats''
+        config_file = metadata.ConfigFile(csys.local_config_path())
+        ChernMetrics.instance().enabled = config_file.read_variable("metrics", True)
         manager.p = VProject(current_project_path)
         manager.c = manager.p
         os.chdir(current_project_path)
@@ -82,6 +92,15 @@ class ChernShellBase(cmd.Cmd):
         command, arg, line = super().parseline(f"{command} {rest}".strip())
         return command, arg, line
 
+    def onecmd(self, line: str) -> bool:
+        """Run a command, and print its timing in the ``timing on'' mode."""
+        if not self.timing:
+            return super().onecmd(line)
+        with CallCounter() as counter:
+            stop = super().onecmd(line)
+        print(counter.summary())
+        return stop
+
     def completenames(self, text, *ignored):
         """Complete command names based on user input."""
         matches = []
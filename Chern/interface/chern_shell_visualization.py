@@ -14,6 +14,8 @@ Install with: pip install plotly graphviz pydot
 # pylint: disable=too-many-locals,too-many-statements,import-error,no-member
 import os
 from ..interface.ChernManager import get_manager
+from ..kernel.chern_layout_cache import ChernLayoutCache
+from ..utils import csys
 
 
 MANAGER = get_manager()
@@ -28,7 +30,6 @@ class ChernShellVisualization:
         import plotly.graph_objects as go
         import networkx as nx
         import numpy as np
-        import pydot
         from collections import defaultdict
         from colorsys import hls_to_rgb, rgb_to_hls
 
@@ -133,32 +134,60 @@ class ChernShellVisualization:
         relabeled_graph = nx.relabel_nodes(graph, node_map)
 
         # TRUE RANKED GRAPHVIZ LAYOUT
-        pydot_graph = nx.nx_pydot.to_pydot(relabeled_graph)
-
-        rank_groups = {}
-        for node_name, depth in node_depth_map.items():
-            rank_groups.setdefault(depth, []).append(node_name)
-
-        for depth, nodes in rank_groups.items():
-            r = pydot.Subgraph(rank='same')
-            for n in nodes:
-                r.add_node(pydot.Node(n))
-            pydot_graph.add_subgraph(r)
-
-        pydot_graph.set_rankdir("TB")
-        pydot_graph.set_nodesep("0.7")
-        pydot_graph.set_ranksep("1.3")
+        def full_layout():
+            try:
+                import pydot
+            except ImportError:
+                print("Warning: pydot is not installed, using spring layout.")
+                return nx.spring_layout(relabeled_graph, k=0.25, iterations=80)
+            pydot_graph = nx.nx_pydot.to_pydot(relabeled_graph)
+
+            # The objects of a directory are drawn in a cluster,
+            # the others are ranked by their depth
+            clustered = set()
+            for index, (directory, nodes) in enumerate(
+                    graph.graph.get("clusters", {}).items()):
+                cluster = pydot.Cluster(f"dir{index}", label=directory,
+                                        style="dashed", rank="same")
+                for node in nodes:
+                    cluster.add_node(pydot.Node(node_map[node]))
+                    clustered.add(node_map[node])
+                pydot_graph.add_subgraph(cluster)
+
+            rank_groups = {}
+            for node_name, depth in node_depth_map.items():
+                if node_name in clustered:
+                    continue
+                rank_groups.setdefault(depth, []).append(node_name)
+
+            for depth, nodes in rank_groups.items():
+                r = pydot.Subgraph(rank='same')
+                for n in nodes:
+                    r.add_node(pydot.Node(n))
+                pydot_graph.add_subgraph(r)
+
+            pydot_graph.set_rankdir("TB")
+            pydot_graph.set_nodesep("0.7")
+            pydot_graph.set_ranksep("1.3")
 
-        try:
-            layout_graph = nx.nx_pydot.from_pydot(pydot_graph)
-            pos_simple = nx.nx_pydot.graphviz_layout(layout_graph, prog="dot")
-            pos = {
-                original: pos_simple[node_map[original]]
-                for original in graph.nodes()
-            }
-        except Exception as e:
-            print(f"Warning: Graphviz failed, using spring layout ({e}).")
-            pos = nx.spring_layout(graph, k=0.25, iterations=80)
+            try:
+                layout_graph = nx.nx_pydot.from_pydot(pydot_graph)
+                return nx.nx_pydot.graphviz_layout(layout_graph, prog="dot")
+            except Exception as e:
+                print(f"Warning: Graphviz failed, using spring layout ({e}).")
+                return nx.spring_layout(relabeled_graph, k=0.25, iterations=80)
+
+        # The layout is cached by the graph structure,
+        # and only updated around the changed nodes after small edits
+        pos_simple = ChernLayoutCache.instance().layout(
+            list(relabeled_graph.nodes()), list(relabeled_graph.edges()),
+            full_layout,
+            scope=f"live:{MANAGER.c.path}:{int(exclude_algorithms)}",
+        )
+        pos = {
+            original: pos_simple[node_map[original]]
+            for original in graph.nodes()
+        }
 
         # LABEL COLLISION AVOIDANCE (VERTICAL JITTER)
         rank_bins = defaultdict(list)
@@ -180,69 +209,85 @@ class ChernShellVisualization:
                 pos[node] = (x, y + dy)
 
         # CURVED EDGES + BUNDLING + GHOST HOVER
+        # All the curves are computed at once and drawn in a few traces,
+        # separated by NaN, instead of two traces per edge
+        dependency_edges = [
+            (u, v) for u, v, data in graph.edges(data=True)
+            if data.get('type') == 'dependency'
+        ]
         edge_traces = []
-        arrow_annotations = []
-
-        for u, v, data in graph.edges(data=True):
-            if data.get('type') != 'dependency':
-                continue
-
-            edge_base_color = node_color_map.get(u, edge_color_default)
-            x0, y0 = pos[u]
-            x1, y1 = pos[v]
 
-            source_label = node_label_map[node_map[u]]
-            target_label = node_label_map[node_map[v]]
-            hover_text = (
-                f"Source: {source_label}<br>Target: {target_label}"
+        if dependency_edges:
+            ends = np.array(
+                [list(pos[u]) + list(pos[v]) for u, v in dependency_edges], dtype=float
+            ).reshape(-1, 4)
+            x0, y0, x1, y1 = ends.T
+            source_labels = [
+                node_label_map[node_map[u]] for u, _ in dependency_edges
+            ]
+            bundle_offsets = np.array(
+                [0.18 * (hash(label) % 9 - 4) for label in source_labels]
             )
-
-            dy = y1 - y0
-            cx = (x0 + x1) / 2
-            cy = (y0 + y1) / 2 + 0.20 * abs(dy)
-            bundle_offset = 0.18 * (hash(source_label) % 9 - 4)
-            cx += bundle_offset
-
-            t = np.linspace(0, 1, 25)
-            curve_x = (1-t)**2 * x0 + 2*(1-t)*t*cx + t**2 * x1
-            curve_y = (1-t)**2 * y0 + 2*(1-t)*t*cy + t**2 * y1
-
-            ghost_hover_trace = go.Scatter(
-                x=list(curve_x) + [None],
-                y=list(curve_y) + [None],
+            cx = (x0 + x1) / 2 + bundle_offsets
+            cy = (y0 + y1) / 2 + 0.20 * np.abs(y1 - y0)
+
+            t = np.linspace(0, 1, 25)[None, :]
+            curve_x = ((1-t)**2 * x0[:, None] + 2*(1-t)*t * cx[:, None]
+                       + t**2 * x1[:, None])
+            curve_y = ((1-t)**2 * y0[:, None] + 2*(1-t)*t * cy[:, None]
+                       + t**2 * y1[:, None])
+            gap = np.full((len(dependency_edges), 1), np.nan)
+            lines_x = np.hstack([curve_x, gap])
+            lines_y = np.hstack([curve_y, gap])
+
+            hover_texts = np.repeat(np.array([
+                f"Source: {source_label}<br>"
+                f"Target: {node_label_map[node_map[v]]}"
+                for source_label, (_, v) in zip(source_labels,
+                                                 dependency_edges)
+            ], dtype=object), lines_x.shape[1])
+            edge_traces.append(go.Scatter(
+                x=lines_x.ravel(), y=lines_y.ravel(),
                 line={'width': 12, 'color': 'rgba(0,0,0,0)'},
                 hoverinfo='text',
-                hovertext=hover_text,
+                hovertext=hover_texts,
                 mode='lines',
                 opacity=0,
                 hoverlabel={
                     'bgcolor': 'white',
                     'font': {'size': 10, 'color': edge_hover_color}
                 }
-            )
-            edge_traces.append(ghost_hover_trace)
-
-            visible_edge_trace = go.Scatter(
-                x=list(curve_x) + [None],
-                y=list(curve_y) + [None],
-                line={'width': 2.5, 'color': edge_base_color},
-                hoverinfo='none',
-                mode='lines',
-                opacity=0.85,
-            )
-            edge_traces.append(visible_edge_trace)
-
-            arrow_annotations.append({
-                'ax': curve_x[-3], 'ay': curve_y[-3],
-                'x': curve_x[-1], 'y': curve_y[-1],
-                'axref': 'x', 'ayref': 'y', 'xref': 'x', 'yref': 'y',
-                'showarrow': True,
-                'arrowhead': 2,
-                'arrowsize': 2,
-                'arrowwidth': 1,
-                'arrowcolor': edge_base_color,
-                'standoff': 10,
-            })
+            ))
+
+            edge_colors = np.array([
+                node_color_map.get(u, edge_color_default)
+                for u, _ in dependency_edges
+            ])
+            # Arrow heads a little before the target node
+            arrow_x, arrow_y = curve_x[:, -3], curve_y[:, -3]
+            arrow_angles = np.degrees(np.arctan2(
+                arrow_x - curve_x[:, -5], arrow_y - curve_y[:, -5]
+            ))
+            for color in np.unique(edge_colors):
+                selected = edge_colors == color
+                edge_traces.append(go.Scatter(
+                    x=lines_x[selected].ravel(), y=lines_y[selected].ravel(),
+                    line={'width': 2.5, 'color': color},
+                    hoverinfo='none',
+                    mode='lines',
+                    opacity=0.85,
+                ))
+                edge_traces.append(go.Scatter(
+                    x=arrow_x[selected], y=arrow_y[selected],
+                    mode='markers',
+                    hoverinfo='none',
+                    marker={
+                        'symbol': 'arrow',
+                        'angle': arrow_angles[selected],
+                        'size': 12,
+                        'color': color,
+                    },
+                ))
 
         # Nodes + Labels
         node_x, node_y, node_text, node_colors = [], [], [], []
@@ -326,11 +371,8 @@ class ChernShellVisualization:
 
         fig = go.Figure(data=edge_traces + [node_trace], layout=layout)
 
-        annotations = arrow_annotations
         if show_permanent_labels:
-            annotations.extend(permanent_annotations)
-
-        fig.update_layout(annotations=annotations)
+            fig.update_layout(annotations=permanent_annotations)
 
         # Output
         if "." not in output_file:
@@ -489,9 +531,9 @@ class ChernShellVisualization:
             }
         )
 
-        # Add Nodes
-        for n in graph.nodes():
-            dot.node(
+        # Add Nodes, the objects of a directory in a cluster
+        def add_node(subgraph, n):
+            subgraph.node(
                 node_map[n],
                 label=graph.nodes[n]['label'],
                 fillcolor=graph.nodes[n]['color_fill'],
@@ -499,6 +541,18 @@ class ChernShellVisualization:
                 fontcolor='#111111'
             )
 
+        clustered = set()
+        for index, (directory, nodes) in enumerate(
+                graph.graph.get("clusters", {}).items()):
+            with dot.subgraph(name=f"cluster_{index}") as cluster:
+                cluster.attr(label=directory, style='dashed', color='#999999')
+                for n in nodes:
+                    add_node(cluster, n)
+                    clustered.add(n)
+        for n in graph.nodes():
+            if n not in clustered:
+                add_node(dot, n)
+
         # Add Filtered Dependency Edges
         for u, v in reduced_dependency_edges:
             u_id = node_map[u]
@@ -517,12 +571,22 @@ class ChernShellVisualization:
         print(
             f"Rendering to {output_file} ({output_format.upper()} format)..."
         )
+        # An unchanged graph is not laid out and rendered again
+        layout_cache = ChernLayoutCache.instance()
+        cached_rendering = layout_cache.rendering(dot.source, output_format)
+        if os.path.exists(cached_rendering):
+            csys.copy(cached_rendering, output_file)
+            os.utime(cached_rendering)
+            print("Done (cached).")
+            return
         try:
             dot.render(
                 os.path.splitext(output_file)[0],
                 format=output_format,
                 cleanup=True
             )
+            csys.copy(output_file, cached_rendering)
+            layout_cache.evict()
             print("Done.")
         except Exception as e:
             print(
@@ -4,10 +4,12 @@ Advanced Developer Tools Command Handlers for Chern Shell.
 This module contains command handlers for advanced operations,
 debugging, and system integration.
 """
-# pylint: disable=broad-exception-caught
+# pylint: disable=broad-exception-caught,no-member
 import os
 from ..interface import shell
 from ..interface.ChernManager import get_manager
+from ..utils import profiling
+from ..utils.metrics import ChernMetrics
 
 
 MANAGER = get_manager()
@@ -61,9 +63,9 @@ class AdvancedCommands:
                 )
             else:
                 os.system(os.environ.get("SHELL", "/bin/bash"))
-            shell.workaround_postshell()
             # Switch back to the original path
             os.chdir(path)
+            shell.workaround_postshell(info)
         except (IndexError, ValueError) as e:
             print(f"Error: Please provide a command to execute. {e}")
         except Exception as e:
@@ -84,6 +86,105 @@ class AdvancedCommands:
         except Exception as e:
             print(f"Error printing history: {e}")
 
+    def do_gc(self, arg):
+        """Collect the unreachable impressions.
+        Usage: gc [--dry-run] [--keep-parents N] [--archive file.tar]"""
+        try:
+            args = arg.split()
+            dry_run = "--dry-run" in args or "-n" in args
+            keep_parents = None
+            if "--keep-parents" in args:
+                keep_parents = int(args[args.index("--keep-parents") + 1])
+            archive = None
+            if "--archive" in args:
+                archive = os.path.abspath(args[args.index("--archive") + 1])
+            shell.gc(dry_run, archive, keep_parents)
+        except (IndexError, ValueError) as e:
+            print(f"Error: Please check the options of gc. {e}")
+        except Exception as e:
+            print(f"Error collecting impressions: {e}")
+
+    def do_doctor(self, arg):
+        """Check the arcs, the aliases and the chern.yaml aliases of all the
+        objects in one pass and report every inconsistency.
+        Usage: doctor [--fix]
+        Without option the project is only checked,
+        --fix applies all the repairs as one batch."""
+        try:
+            shell.doctor(fix="--fix" in arg.split())
+        except Exception as e:
+            print(f"Error checking the project: {e}")
+
+    def do_profile(self, arg):
+        """Run a command under the profiler and print the hot spots.
+        Usage: profile [--sampling] [--top N] [--output file] command [args]
+        The profile is written in the pstats format,
+        or in the speedscope format for a .json file (sampling)."""
+        try:
+            args = arg.split()
+            sampling = False
+            top = profiling.DEFAULT_TOP
+            output = None
+            while args and args[0].startswith("--"):
+                option = args.pop(0)
+                if option == "--sampling":
+                    sampling = True
+                elif option == "--top":
+                    top = int(args.pop(0))
+                elif option == "--output":
+                    output = os.path.abspath(args.pop(0))
+                else:
+                    raise ValueError(f"unknown option {option}")
+            if not args:
+                raise ValueError("no command to profile")
+            command = " ".join(args)
+            profiling.profiled(lambda: self.onecmd(command), sampling=sampling,
+                               top=top, output=output, name=command)
+        except (IndexError, ValueError) as e:
+            print(f"Error: Please check the options of profile. {e}")
+        except Exception as e:
+            print(f"Error profiling: {e}")
+
+    def do_timing(self, arg):
+        """Print the wall time, the filesystem calls and the HTTP requests
+        of every command.
+        Usage: timing on|off"""
+        if arg.strip() not in ("on", "off"):
+            # pylint: disable=access-member-before-definition
+            print(f"Timing is {'on' if self.timing else 'off'}. Usage: timing on|off")
+            return
+        # pylint: disable=attribute-defined-outside-init
+        self.timing = arg.strip() == "on"
+
+    def do_stats(self, arg):
+        """Show the metrics of the session: the metadata parses,
+        the filesystem walks, the file comparisons and the DITE requests.
+        Usage: stats [on|off] [--json|--prometheus] [--output file] [--reset]"""
+        try:
+            args = arg.split()
+            metrics = ChernMetrics.instance()
+            if "on" in args or "off" in args:
+                metrics.enabled = "on" in args
+            if "--json" in args:
+                text = metrics.to_json() + "\n"
+            elif "--prometheus" in args:
+                text = metrics.to_prometheus()
+            else:
+                text = metrics.summary()
+            if "--output" in args:
+                output = os.path.abspath(args[args.index("--output") + 1])
+                with open(output, "w", encoding="utf-8") as f:
+                    f.write(text)
+                print(f"Metrics written to {output}")
+            else:
+                print(text, end="")
+            if "--reset" in args:
+                metrics.reset()
+        except (IndexError, ValueError) as e:
+            print(f"Error: Please check the options of stats. {e}")
+        except Exception as e:
+            print(f"Error showing the metrics: {e}")
+
     def do_system_shell(self, _arg):
         """Enter a system shell (bash). Type 'exit' or Ctrl-D to return."""
         print("Entering system shell. Type 'exit' to return.\n")
@@ -68,13 +68,16 @@ class EnvironmentCommands:
             print(f"Error accessing config: {e}")
 
     def do_submit(self, arg: str) -> None:
-        """Submit current object."""
+        """Submit current object.
+        Usage: submit [runner] [--waves] [--dry-run]
+        The runner ``local-exec'' runs it on this machine.
+        --waves: submit the impressions one depth of the DAG at a time
+        --dry-run: only show the order and the predicted makespan"""
         try:
-            if arg == "":
-                shell.submit()
-            else:
-                obj = arg.split()[0]
-                shell.submit(obj)
+            args = arg.split()
+            runners = [x for x in args if not x.startswith("--")]
+            shell.submit(runners[0] if runners else "local",
+                         waves="--waves" in args, dry_run="--dry-run" in args)
         except Exception as e:
             print(f"Error submitting: {e}")
 
@@ -47,7 +47,7 @@ class FileCommands:
             print(f"Error copying object: {e}")
 
     def do_rm(self, arg: str) -> None:
-        """Remove an object."""
+        """Remove an object: it is moved to the trash (see trash)."""
         try:
             obj = arg.split()[0]
             shell.rm(obj)
@@ -56,21 +56,52 @@ class FileCommands:
         except Exception as e:
             print(f"Error removing object: {e}")
 
+    def do_trash(self, arg: str) -> None:
+        """List the objects and files removed by rm and rm_file,
+        restore one of them, or delete them all now.
+        Usage: trash [restore <path|entry>] [empty]"""
+        try:
+            shell.trash(arg.split())
+        except (IndexError, ValueError) as e:
+            print(f"Error: Please provide the path or the entry to restore. {e}")
+        except Exception as e:
+            print(f"Error managing the trash: {e}")
+
     def do_import(self, arg: str) -> None:
-        """Import a file into current object."""
+        """Import files into current object.
+
+        Usage: import <file|dir|glob> [...] [--link]
+        The files are copied in parallel (reflinked when possible),
+        the files already imported are skipped, so an interrupted
+        import can be resumed. --link hardlinks the files when the
+        copy-on-write clone is not available (do not edit them in place).
+        """
         try:
-            obj = arg.split()[0]
-            shell.import_file(obj)
+            args = arg.split()
+            sources = [source for source in args if source != "--link"]
+            if not sources:
+                raise IndexError("no source given")
+            shell.import_file(sources, link="--link" in args)
         except (IndexError, ValueError) as e:
             print(f"Error: Please provide a file to import. {e}")
         except Exception as e:
             print(f"Error importing file: {e}")
 
     def do_import_file(self, arg: str) -> None:
-        """Import a file into current object."""
+        """Import files into current object.
+
+        Usage: import_file <file|dir|glob> [...] [--link]
+        The files are copied in parallel (reflinked when possible),
+        the files already imported are skipped, so an interrupted
+        import can be resumed. --link hardlinks the files when the
+        copy-on-write clone is not available (do not edit them in place).
+        """
         try:
-            obj = arg.split()[0]
-            shell.import_file(obj)
+            args = arg.split()
+            sources = [source for source in args if source != "--link"]
+            if not sources:
+                raise IndexError("no source given")
+            shell.import_file(sources, link="--link" in args)
         except (IndexError, ValueError) as e:
             print(f"Error: Please provide a file to import. {e}")
         except Exception as e:
@@ -26,9 +26,24 @@ class TaskCommands:
             print(f"Error creating task: {e}")
 
     def do_create_multi_tasks(self, arg: str) -> None:
-        """Create multiple tasks with a base name and number of tasks."""
+        """Create multiple tasks with a base name and number of tasks.
+        Usage: create_multi_tasks base_name [begin] end
+                   [--template task] [--parameter name=value ...]
+        --template copies the settings of the task,
+        the {index} in the parameter values is replaced by the task index."""
         try:
             objs = arg.split()
+            template = None
+            if "--template" in objs:
+                index = objs.index("--template")
+                template = objs[index + 1]
+                del objs[index:index + 2]
+            parameters = {}
+            while "--parameter" in objs:
+                index = objs.index("--parameter")
+                name, value = objs[index + 1].split("=", 1)
+                parameters[name] = value
+                del objs[index:index + 2]
             if len(objs) < 2:
                 print(
                     "Error: Please provide at least two task arguments: "
@@ -41,13 +56,13 @@ class TaskCommands:
                 begin_number_of_tasks = int(objs[1])
             end_number_of_tasks = int(objs[-1])
             number_of_tasks = end_number_of_tasks - begin_number_of_tasks
-            if number_of_tasks <= 0 or number_of_tasks > 10000:
-                print("Error: number_of_tasks should be between 1 and 10000.")
+            if number_of_tasks <= 0 or number_of_tasks > 100000:
+                print("Error: number_of_tasks should be between 1 and 100000.")
                 return
-            for i in range(begin_number_of_tasks, end_number_of_tasks):
-                task_name = f"{base_name}_{i}"
-                shell.mktask(task_name)
-                shell.add_parameter_subtask(task_name, "index", str(i))
+            shell.mktasks(base_name, begin_number_of_tasks, end_number_of_tasks,
+                          template=template, parameters=parameters or None)
+        except (IndexError, ValueError) as e:
+            print(f"Error: Please check the options of create_multi_tasks. {e}")
         except Exception as e:
             print(f"Error creating task: {e}")
 
@@ -120,13 +135,13 @@ class TaskCommands:
                 begin_number_of_tasks = int(objs[2])
             end_number_of_tasks = int(objs[-1])
             number_of_tasks = end_number_of_tasks - begin_number_of_tasks
-            if number_of_tasks <= 0 or number_of_tasks > 10000:
-                print("Error: number_of_tasks should be between 1 and 10000.")
+            if number_of_tasks <= 0 or number_of_tasks > 100000:
+                print("Error: number_of_tasks should be between 1 and 100000.")
                 return
-            for i in range(begin_number_of_tasks, end_number_of_tasks):
-                task_name = f"{base_name}_{i}"
-                alias_index = f"{alias}_{i}"
-                shell.add_input(task_name, alias_index)
+            shell.add_inputs([
+                (f"{base_name}_{i}", f"{alias}_{i}")
+                for i in range(begin_number_of_tasks, end_number_of_tasks)
+            ])
         except Exception as e:
             print(f"Error creating task: {e}")
 
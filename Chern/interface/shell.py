@@ -6,11 +6,14 @@ projects, tasks, algorithms, and directories within the Chern system.
 """
 import os
 import subprocess
+import time
+from typing import Dict, List, Optional
 
 from ..utils import csys
 from ..kernel.vobject import VObject
 from ..interface.ChernManager import get_manager
 from ..kernel.vtask import create_task
+from ..kernel.vtask import create_tasks
 from ..kernel.vtask import create_data
 from ..kernel.valgorithm import create_algorithm
 from ..kernel.vdirectory import create_directory
@@ -18,6 +21,8 @@ from ..utils.pretty import color_print
 from ..utils.pretty import colorize
 from ..utils import metadata
 from ..kernel.chern_communicator import ChernCommunicator
+from ..kernel.chern_impression_gc import ImpressionCollector
+from ..kernel.chern_trash import ChernTrash
 
 MANAGER = get_manager()
 
@@ -237,6 +242,25 @@ def mktask(line: str) -> None:
     create_task(line)
 
 
+def mktasks(base_name: str, begin: int, end: int, *, template: Optional[str] = None,
+            parameters: Optional[Dict[str, str]] = None) -> None:
+    """Create the tasks [base_name]_[index] with the parameter index,
+    or the parameters given, with the settings of the template task."""
+    line = csys.refine_path(base_name, MANAGER.c.path)
+    parent_path = os.path.abspath(line+"/..")
+    object_type = VObject(parent_path).object_type()
+    if object_type not in ("directory", "project"):
+        print("Not allowed to create task here")
+        return
+    if template is not None:
+        template = csys.refine_path(template, MANAGER.c.path)
+        if VObject(template).object_type() != "task":
+            print(f"The template {template} is not a task")
+            return
+    created = create_tasks(line, begin, end, parameters=parameters, template=template)
+    print(f"Created {len(created)} tasks.")
+
+
 def mkdata(line: str) -> None:
     """Create a new data task."""
     line = csys.refine_path(line, MANAGER.c.path)
@@ -277,6 +301,24 @@ def rm(line: str) -> None:
         print(result.colored())
 
 
+def trash(args: List[str]) -> None:
+    """List, restore or empty the trash of the project."""
+    chern_trash = ChernTrash(csys.project_path())
+    if args and args[0] == "restore":
+        print(chern_trash.restore(args[1]).colored(), end="")
+        return
+    if args and args[0] == "empty":
+        print(f"Deleting {chern_trash.purge(everything=True)} entries in the background")
+        return
+    entries = chern_trash.entries()
+    if not entries:
+        print("The trash is empty")
+        return
+    for entry in entries:
+        removed = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(entry["time"]))
+        print(f"{entry['entry']}  {removed}  {', '.join(entry['paths'])}")
+
+
 def rm_file(file_name: str) -> None:
     """Remove a file from current task or algorithm."""
     if MANAGER.c.object_type() not in ("task", "algorithm"):
@@ -285,13 +327,12 @@ def rm_file(file_name: str) -> None:
     # Deal with * case
     if file_name == "*":
         path = MANAGER.c.path
-        for current_file in os.listdir(path):
-            # protect .chern and chern.yaml
-            if current_file in (".chern", "chern.yaml"):
-                continue
-            result = MANAGER.c.rm_file(current_file)
-            if result.messages:  # If there are error messages
-                print(result.colored())
+        # protect .chern and chern.yaml
+        files = [current_file for current_file in os.listdir(path)
+                 if current_file not in (".chern", "chern.yaml")]
+        result = MANAGER.c.rm_files(files)
+        if result.messages:  # If there are error messages
+            print(result.colored())
         return
     result = MANAGER.c.rm_file(file_name)
     if result.messages:  # If there are error messages
@@ -326,28 +367,28 @@ def status() -> None:
     """Show status of current object."""
     print(MANAGER.current_object().printed_status().colored())
 
-def import_file(filename: str) -> None:
-    """Import a file into current task or algorithm."""
+def _import_progress(imported: int, total: int,
+                     imported_bytes: int, total_bytes: int) -> None:
+    """Print the progress of the import on one line."""
+    end = "\n" if imported == total else ""
+    print(f"\rImported {imported}/{total} files "
+          f"({imported_bytes / 1024 ** 2:.1f}/{total_bytes / 1024 ** 2:.1f} MB)",
+          end=end, flush=True)
+
+
+def import_file(sources: List[str], link: bool = False) -> None:
+    """Import files, directories or glob patterns into current task or algorithm."""
     if MANAGER.c.object_type() not in ("task", "algorithm"):
         print("Unable to call importfile if you are not in a task or algorithm.")
         return
 
-    # Check if the path is a format of /path/to/a/dir/*
-    if filename.endswith("/*"):
-        filename = filename[:-2]
-        if not os.path.isdir(filename):
+    # The format /path/to/a/dir/* imports the contents of the directory
+    for source in sources:
+        if source.endswith("/*") and not os.path.isdir(source[:-2]):
             print("The path is not a directory")
             return
-        for file in os.listdir(filename):
-            print(f"Importing: from {os.path.join(filename, file)}")
-            print(f"Importing: to {MANAGER.c.path}")
-            result = MANAGER.c.import_file(os.path.join(filename, file))
-            if result.messages:  # If there are error messages
-                print(result.colored())
-        return
-    result = MANAGER.c.import_file(filename)
-    if result.messages:  # If there are error messages
-        print(result.colored())
+    result = MANAGER.c.import_files(sources, link=link, progress=_import_progress)
+    print(result.colored(), end="")
 
 
 # pylint: disable=too-many-branches
@@ -402,6 +443,19 @@ def add_input(path: str, alias: str) -> None:
     MANAGER.c.add_input(path, alias)
 
 
+def add_inputs(inputs: list) -> None:
+    """Add several inputs [(path, alias), ...] to current task or algorithm."""
+    if MANAGER.c.object_type() == "directory":
+        for path, alias in inputs:
+            add_input(path, alias)
+        return
+    if MANAGER.c.object_type() not in ("task", "algorithm"):
+        print("Unable to call add_input if you are not in a task or algorithm.")
+        return
+    added = MANAGER.c.add_inputs(inputs)
+    print(f"Added {added} inputs.")
+
+
 def add_algorithm(path: str) -> None:
     """Add an algorithm to current task."""
     if MANAGER.c.object_type() == "directory":
@@ -563,9 +617,19 @@ def send(path: str) -> None:
     MANAGER.c.send(path)
 
 
-def submit(runner: str = "local") -> None:
+def _deposit_progress(uploaded: int, total: int,
+                      uploaded_bytes: int, total_bytes: int) -> None:
+    """Print the progress of the deposit on one line."""
+    end = "\n" if uploaded == total else ""
+    print(f"\rDeposited {uploaded}/{total} impressions "
+          f"({uploaded_bytes / 1024 ** 2:.1f}/{total_bytes / 1024 ** 2:.1f} MB)",
+          end=end, flush=True)
+
+
+def submit(runner: str = "local", waves: bool = False, dry_run: bool = False) -> None:
     """Submit to the runner."""
-    message = MANAGER.c.submit(runner)
+    message = MANAGER.c.submit(runner, progress=_deposit_progress,
+                               waves=waves, dry_run=dry_run)
     print(message.colored())
 
 
@@ -623,12 +687,12 @@ def workaround_preshell() -> tuple[bool, str]:
     return MANAGER.c.workaround_preshell()
 
 
-def workaround_postshell() -> None:
+def workaround_postshell(path: str) -> None:
     """Execute post-shell workaround for the current task."""
     if not MANAGER.c.is_task():
         print("Not able to call workaround if you are not in a task.")
         return
-    MANAGER.c.workaround_postshell("")
+    MANAGER.c.workaround_postshell(path)
 
 
 def trace(impression: str) -> None:
@@ -639,3 +703,24 @@ def trace(impression: str) -> None:
 def history() -> None:
     """Print the history of a task or algorithm."""
     MANAGER.c.history()
+
+
+def doctor(fix: bool = False) -> None:
+    """Check the arcs and the aliases of the project, and repair them if fix."""
+    message, _ = MANAGER.c.doctor(fix)
+    print(message.colored(), end="")
+
+
+def gc(dry_run: bool = False, archive: str = None, keep_parents: int = None) -> None:
+    """Collect the impressions not referenced by the project."""
+    collector = ImpressionCollector(csys.project_path())
+    report = collector.collect(dry_run=dry_run, archive=archive, keep_parents=keep_parents)
+    size = report["size"] / 1024 ** 2
+    if dry_run:
+        print(f"{len(report['dead'])} unreachable impressions ({size:.1f} MB), "
+              f"{len(report['live'])} live impressions")
+        for uuid in report["dead"]:
+            print(f"  {uuid}")
+        return
+    action = f"Archived to {archive} and removed" if archive else "Removed"
+    print(f"{action} {len(report['dead'])} impressions ({size:.1f} MB)")
@@ -3,8 +3,17 @@
 This module is responsible for saving the cache
 used by other parts of the application.
 """
+import os
+
 from ..utils import csys
 
+# The tables keyed by the path of an object
+PATH_TABLES = (
+    "consult_table", "impression_consult_table", "predecessor_consult_table",
+    "status_consult_table", "job_status_consult_table", "update_table",
+    "listing_snapshot_table", "status_tree_table", "directory_status_table",
+)
+
 class ChernCache:  # pylint: disable=too-many-instance-attributes
     """
     The class is the cache of the application.
@@ -20,6 +29,30 @@ class ChernCache:  # pylint: disable=too-many-instance-attributes
         self.job_status_consult_table = {}
         self.project_modification_time = (None, -1)
         self.update_table = {}
+        self.listing_snapshot_table = {}
+        self.status_tree_table = {}
+        self.directory_status_table = {}
+        self.impression_index_table = {}
+        self.runtime_history_table = {}
+
+    def forget_subtrees(self, paths):
+        """ Drop the cached entries of the objects under the paths
+        (e.g. moved), and the cached statuses of their ancestors
+        """
+        roots = [os.path.abspath(path) for path in paths]
+        for name in PATH_TABLES:
+            table = getattr(self, name)
+            for key in list(table):
+                key_path = os.path.abspath(key)
+                if any(key_path == root or key_path.startswith(root + os.sep)
+                       for root in roots):
+                    del table[key]
+        for root in roots:
+            parent = os.path.dirname(root)
+            while parent != root:
+                self.directory_status_table.pop(parent, None)
+                root, parent = parent, os.path.dirname(parent)
+        self.project_modification_time = (None, -1)
 
     @classmethod
     def instance(cls): # UnitTest: DONE
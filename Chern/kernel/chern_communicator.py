@@ -45,11 +45,13 @@ Method Usage Status:
 ✓ Used methods: submit, deposit, execute, kill, runners, register_runner,
   remove_runner, status, run_status, collect, export, dite_status, dite_info,
   output_files, get_file, deposit_with_data, add_host, serverurl, is_deposited,
-  workflow, sample_status, job_status, runner_connection, impview, display
+  workflow, sample_status, job_status, runner_connection, impview, display,
+  deposited_impressions
 
 ✗ UNUSED methods: resubmit, runners_url
 """
 
+from concurrent.futures import ThreadPoolExecutor
 from os.path import join
 import json
 from logging import getLogger
@@ -59,8 +61,33 @@ import requests
 
 from ..utils import csys
 from ..utils import metadata
+from ..utils.metrics import ChernMetrics
 from ..utils.pretty import colorize
+from .chern_local_runner import LOCAL_EXEC_RUNNER, LocalRunner
+from .vimpression import VImpression
 logger = getLogger("ChernLogger")
+METRICS = ChernMetrics.instance()
+
+
+def _endpoint(url):
+    """ The endpoint of a DITE url, e.g. ``status'' for http://host/status/uuid """
+    path = url.split("://", 1)[-1].split("/", 1)
+    return path[1].split("/", 1)[0] if len(path) > 1 else ""
+
+
+def _get(url, timeout, **kwargs):
+    """ GET request to DITE, reported to the metrics """
+    with METRICS.timer("dite.request", method="GET", endpoint=_endpoint(url)):
+        return requests.get(url, timeout=timeout, **kwargs)
+
+
+def _post(url, timeout, **kwargs):
+    """ POST request to DITE, reported to the metrics """
+    if METRICS.enabled:
+        for data in (kwargs.get("files") or {}).values():
+            METRICS.add_bytes("dite.upload", len(data), endpoint=_endpoint(url))
+    with METRICS.timer("dite.request", method="POST", endpoint=_endpoint(url)):
+        return requests.post(url, timeout=timeout, **kwargs)
 
 
 class ChernCommunicator():
@@ -84,6 +111,30 @@ class ChernCommunicator():
             cls.ins = ChernCommunicator()
         return cls.ins
 
+    @staticmethod
+    def resolve(impression):
+        """ The impression whose results are reused by the impression,
+        see chern_result_cache, otherwise the impression itself
+        """
+        if not isinstance(impression, VImpression):
+            return impression
+        source = impression.config_file.read_variable("reused_from")
+        if source:
+            return VImpression(source, impression.project_path)
+        return impression
+
+    @staticmethod
+    def local_run(impression):
+        """ The local runner if the impression was run by ``local-exec'',
+        see chern_local_runner, otherwise None
+        """
+        if impression is None:
+            return None
+        local_runner = LocalRunner.instance()
+        if local_runner.has_run(str(getattr(impression, "uuid", impression))):
+            return local_runner
+        return None
+
     def add_host(self, url):
         """ Add a host to the server """
         # FIXME: add host_name and url check
@@ -101,7 +152,7 @@ class ChernCommunicator():
         logger.debug("url: %s", url)
         try:
             logger.debug("http://%s/dite-status", url)
-            r = requests.get(f"http://{url}/dite-status", timeout=self.timeout)
+            r = _get(f"http://{url}/dite-status", timeout=self.timeout)
             logger.debug(r)
         except Exception:
             return "unconnected"
@@ -133,11 +184,11 @@ class ChernCommunicator():
             "config.json": open(impression.path + "/config.json", "rb").read()
         }
         url = self.serverurl()
-        machine_id = requests.get(
+        machine_id = _get(
             f"http://{url}/machine-id/{machine}",
             timeout=self.timeout
         ).text
-        requests.post(
+        _post(
             f"http://{url}/upload",
             data={
                 'tarname': f"{impression.uuid}.tar.gz",
@@ -147,7 +198,7 @@ class ChernCommunicator():
             timeout=self.timeout
         )
         # FIXME: here we simply assume that the upload is always correct
-        requests.get(
+        _get(
             f"http://{url}/run/{impression.uuid}/{machine_id}",
             timeout=self.timeout
         )
@@ -160,7 +211,7 @@ class ChernCommunicator():
             "config.json": open(impression.path + "/config.json", "rb").read()
         }
         url = self.serverurl()
-        requests.post(
+        _post(
             f"http://{url}/upload",
             data={
                 'tarname': f"{impression.uuid}.tar.gz",
@@ -189,7 +240,7 @@ class ChernCommunicator():
         }
         url = self.serverurl()
 
-        requests.post(
+        _post(
             f"http://{url}/upload",
             data={
                 'tarname': f"{impression.uuid}.tar.gz",
@@ -198,7 +249,7 @@ class ChernCommunicator():
             files=files,
             timeout=self.timeout
         )
-        requests.get(
+        _get(
                 f"http://{url}/set-job-status/{impression.uuid}/archived",
                 timeout=self.timeout
         )
@@ -207,11 +258,11 @@ class ChernCommunicator():
         """ Execute the impressions on the server """
         files = {"impressions": " ".join(impressions)}
         url = self.serverurl()
-        machine_id = requests.get(
+        machine_id = _get(
             f"http://{url}/machine-id/{machine}",
             timeout=self.timeout
         ).text
-        requests.post(
+        _post(
             f"http://{url}/execute",
             data={'machine': machine_id},
             files=files,
@@ -232,9 +283,13 @@ class ChernCommunicator():
     # === Job Status & Monitoring ===
     def status(self, impression): # UnitTest: DONE
         """ Get the status of the impression """
+        impression = self.resolve(impression)
+        local_runner = self.local_run(impression)
+        if local_runner is not None:
+            return local_runner.status(impression.uuid)
         url = self.serverurl()
         try:
-            r = requests.get(
+            r = _get(
                 f"http://{url}/status/{impression.uuid}",
                 timeout=self.timeout
             )
@@ -245,9 +300,13 @@ class ChernCommunicator():
 
     def run_status(self, impression, machine="none"): # UnitTest: DONE
         """ Get the run status of the impression """
+        impression = self.resolve(impression)
+        local_runner = self.local_run(impression)
+        if local_runner is not None:
+            return local_runner.status(impression.uuid)
         url = self.serverurl()
         try:
-            r = requests.get(
+            r = _get(
                 f"http://{url}/run-status/{impression.uuid}/{machine}",
                 timeout=self.timeout
             )
@@ -260,7 +319,7 @@ class ChernCommunicator():
         """ Check if the impression is deposited on the server """
         url = self.serverurl()
         try:
-            r = requests.get(
+            r = _get(
                 f"http://{url}/deposited/{impression.uuid}",
                 timeout=self.timeout
             )
@@ -269,11 +328,29 @@ class ChernCommunicator():
             return "FALSE"
         return r.text
 
+    def deposited_impressions(self, impressions):
+        """ Check which of the impressions are deposited on the server,
+        with concurrent single requests (DITE has no batch endpoint)
+
+        Returns:
+            set: the uuids of the deposited impressions
+        """
+        uuids = [impression.uuid for impression in impressions]
+        if not uuids:
+            return set()
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            results = executor.map(self.is_deposited, impressions)
+        return {uuid for uuid, result in zip(uuids, results) if result == "TRUE"}
+
     def job_status(self, impression):
         """ Get the job status of the impression """
+        impression = self.resolve(impression)
+        local_runner = self.local_run(impression)
+        if local_runner is not None:
+            return local_runner.status(impression.uuid)
         url = self.serverurl()
         try:
-            r = requests.get(
+            r = _get(
                 f"http://{url}/status/{impression.uuid}",
                 timeout=self.timeout
             )
@@ -284,9 +361,10 @@ class ChernCommunicator():
 
     def sample_status(self, impression):
         """ Get the sample status of the impression """
+        impression = self.resolve(impression)
         url = self.serverurl()
         try:
-            r = requests.get(
+            r = _get(
                 f"http://{url}/sample-status/{impression.uuid}",
                 timeout=self.timeout
             )
@@ -297,9 +375,12 @@ class ChernCommunicator():
 
     def workflow(self, impression):
         """ Get the workflow of the impression """
+        impression = self.resolve(impression)
+        if self.local_run(impression) is not None:
+            return [LOCAL_EXEC_RUNNER, impression.uuid]
         url = self.serverurl()
         try:
-            r = requests.get(
+            r = _get(
                 f"http://{url}/workflow/{impression.uuid}",
                 timeout=self.timeout
             )
@@ -311,9 +392,12 @@ class ChernCommunicator():
     # === Job Control ===
     def kill(self, impression):
         """ Kill the impression on the server """
+        local_runner = self.local_run(impression)
+        if local_runner is not None:
+            return local_runner.kill(impression.uuid)
         url = self.serverurl()
         try:
-            r = requests.get(
+            r = _get(
                 f"http://{url}/kill/{impression.uuid}",
                 timeout=self.timeout
             )
@@ -324,8 +408,12 @@ class ChernCommunicator():
 
     def collect(self, impression): # UnitTest: DONE
         """ Collect the impression from the server """
+        impression = self.resolve(impression)
+        local_runner = self.local_run(impression)
+        if local_runner is not None:
+            return local_runner.status(impression.uuid)
         url = self.serverurl()
-        r = requests.get(
+        r = _get(
                 f"http://{url}/collect/{impression.uuid}",
                 timeout=self.timeout * 1000
         )
@@ -336,7 +424,7 @@ class ChernCommunicator():
         """ Get the list of runners """
         url = self.serverurl()
         try:
-            r = requests.get(
+            r = _get(
                     f"http://{url}/runners",
                     timeout=self.timeout
             )
@@ -352,7 +440,7 @@ class ChernCommunicator():
         """
         url = self.serverurl()
         try:
-            r = requests.get(
+            r = _get(
                     f"http://{url}/runners-url",
                     timeout=self.timeout
             )
@@ -365,7 +453,7 @@ class ChernCommunicator():
         """ Register a runner to the server """
         url = self.serverurl()
 
-        requests.post(
+        _post(
             f"http://{url}/register-runner",
             data={'runner': runner, 'url': runner_url, 'token': token},
             timeout=self.timeout
@@ -375,7 +463,7 @@ class ChernCommunicator():
         """ Remove a runner from the server """
         url = self.serverurl()
         try:
-            r = requests.get(
+            r = _get(
                     f"http://{url}/remove-runner/{runner}",
                     timeout=self.timeout
             )
@@ -390,7 +478,7 @@ class ChernCommunicator():
         """ Get the connection status of the runner """
         url = self.serverurl()
         try:
-            r = requests.get(
+            r = _get(
                 f"http://{url}/runner-connection/{runner}",
                 timeout=self.timeout
             )
@@ -402,15 +490,19 @@ class ChernCommunicator():
     # === File Operations ===
     def output_files(self, impression, machine="none"): # UnitTest: DONE
         """ Get the output files of the impression """
+        impression = self.resolve(impression)
+        local_runner = self.local_run(impression)
+        if local_runner is not None:
+            return local_runner.output_files(str(impression))
         url = self.serverurl()
         if machine == "none":
             machine_id = "none"
         else:
-            machine_id = requests.get(
+            machine_id = _get(
                 f"http://{url}/machine-id/{machine}",
                 timeout=self.timeout
             ).text
-        r = requests.get(
+        r = _get(
             f"http://{url}/outputs/{impression}/{machine_id}",
             timeout=self.timeout
         )
@@ -418,8 +510,12 @@ class ChernCommunicator():
 
     def get_file(self, impression, filename): # UnitTest: DONE
         """ Get the file from the server """
+        impression = self.resolve(impression)
+        local_runner = self.local_run(impression)
+        if local_runner is not None:
+            return local_runner.get_file(str(impression), filename)
         url = self.serverurl()
-        path = requests.get(
+        path = _get(
             f"http://{url}/get-file/{impression}/{filename}",
             timeout=self.timeout
         ).text
@@ -427,8 +523,13 @@ class ChernCommunicator():
 
     def export(self, impression, filename, output): # UnitTest: DONE
         """ Export the file from the server """
+        impression = self.resolve(impression)
+        local_runner = self.local_run(impression)
+        if local_runner is not None:
+            local_runner.export(impression.uuid, filename, output)
+            return
         url = self.serverurl()
-        r = requests.get(
+        r = _get(
                 f"http://{url}/export/{impression.uuid}/{filename}",
                 timeout=self.timeout
         )
@@ -446,5 +547,6 @@ class ChernCommunicator():
 
     def impview(self, impression):
         """ View the impression in the browser """
+        impression = self.resolve(impression)
         url = self.serverurl()
         return f"http://{url}/imp-view/{impression.uuid}"
@@ -0,0 +1,140 @@
+"""
+This module plans and runs the deposit of impressions to DITE.
+
+The planner first collects the closure of the objects to deposit
+(the tasks and algorithms and all their predecessors),
+impresses the ones that are not impressed,
+and asks DITE (concurrently) which impressions are already deposited.
+The missing impressions are then uploaded concurrently,
+an impression being uploaded only after the impressions of its predecessors.
+The total size of the uploads in flight is capped
+(``deposit_inflight_bytes'' in $HOME/.Chern/config.json, in bytes),
+so that a large project does not read all its tarballs in memory at once.
+"""
+import os
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from logging import getLogger
+from typing import Callable, List, Optional
+
+from ..utils import csys
+from ..utils import metadata
+from ..utils.dag import dependency_index, unblock
+
+logger = getLogger("ChernLogger")
+
+DEFAULT_INFLIGHT_BYTES = 256 * 1024 ** 2
+DEFAULT_WORKERS = 8
+
+
+def _impression_size(impression) -> int:
+    """ The size of the files uploaded for the impression """
+    size = 0
+    for path in (impression.tarfile, os.path.join(impression.path, "config.json")):
+        if os.path.exists(path):
+            size += os.path.getsize(path)
+    return size
+
+
+class DepositPlanner:
+    """ Deposit the impressions of a set of objects to DITE """
+
+    def __init__(self, objects, cherncc):
+        self.objects = objects
+        self.cherncc = cherncc
+        config_file = metadata.ConfigFile(csys.local_config_path())
+        self.max_inflight_bytes = config_file.read_variable(
+            "deposit_inflight_bytes", DEFAULT_INFLIGHT_BYTES
+        )
+        self.max_workers = config_file.read_variable("deposit_workers", DEFAULT_WORKERS)
+
+    def closure(self, new_only: bool = False) -> List:
+        """ The tasks and algorithms to deposit, predecessors included,
+        with ``new_only'' only the predecessors not impressed yet
+        (the impressed ones are already submitted)
+        """
+        closure = {}
+        queue = []
+        for obj in self.objects:
+            queue.extend(sub_object for sub_object in obj.sub_objects_recursively()
+                         if sub_object.is_task_or_algorithm())
+        while queue:
+            obj = queue.pop()
+            if obj.path in closure:
+                continue
+            closure[obj.path] = obj
+            queue.extend(pred for pred in obj.predecessors()
+                         if not (new_only and pred.is_impressed_fast()))
+        return list(closure.values())
+
+    def impress(self) -> List:
+        """ Impress the closure, return the objects of the closure """
+        objects = self.closure()
+        for obj in objects:
+            if not obj.is_impressed_fast():
+                obj.impress()
+        return objects
+
+    def plan(self):
+        """ Impress the objects and find the impressions to upload
+
+        Returns:
+            (impressions, dependencies): the impressions to upload,
+            keyed by uuid, and the uuids of the impressions
+            each of them has to wait for
+        """
+        objects = self.impress()
+        impressions = {}
+        pred_uuids = {}
+        for obj in objects:
+            impression = obj.impression()
+            impressions[impression.uuid] = impression
+            pred_uuids[impression.uuid] = [
+                pred.config_file.read_variable("impression", "")
+                for pred in obj.predecessors()
+            ]
+        deposited = self.cherncc.deposited_impressions(list(impressions.values()))
+        missing = {uuid: impression for uuid, impression in impressions.items()
+                   if uuid not in deposited}
+        dependencies = {
+            uuid: {pred for pred in pred_uuids[uuid] if pred in missing}
+            for uuid in missing
+        }
+        return missing, dependencies
+
+    def run(self, progress: Optional[Callable[[int, int, int, int], None]] = None
+            ) -> List[str]:
+        """ Upload the missing impressions
+
+        Args:
+            progress: called after each upload with
+                (uploaded, total, uploaded_bytes, total_bytes)
+
+        Returns:
+            list: the uuids of the uploaded impressions, in upload order
+        """
+        missing, dependencies = self.plan()
+        sizes = {uuid: _impression_size(impression) for uuid, impression in missing.items()}
+        total_bytes = sum(sizes.values())
+        logger.info("Deposit %d impressions (%d bytes)", len(missing), total_bytes)
+
+        uploaded: List[str] = []
+        uploaded_bytes = 0
+        ready, waiting, successors = dependency_index(dependencies)
+        inflight = {}
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            while ready or inflight:
+                # An upload larger than the cap is sent alone
+                while ready and (not inflight or
+                                 sum(sizes[uuid] for uuid in inflight.values())
+                                 + sizes[ready[-1]] <= self.max_inflight_bytes):
+                    uuid = ready.pop()
+                    inflight[executor.submit(self.cherncc.deposit, missing[uuid])] = uuid
+                for future in wait(inflight, return_when=FIRST_COMPLETED).done:
+                    uuid = inflight.pop(future)
+                    future.result()
+                    uploaded.append(uuid)
+                    uploaded_bytes += sizes[uuid]
+                    ready.extend(unblock(waiting, successors, uuid))
+                    if progress is not None:
+                        progress(len(uploaded), len(missing), uploaded_bytes, total_bytes)
+        return uploaded
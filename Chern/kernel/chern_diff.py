@@ -0,0 +1,118 @@
+"""
+This module provides the file diff used by ``trace''
+to compare the contents of two impressions.
+
+The files are compared before any decoding:
+the files shared by the two impressions (hard links or reflinks)
+and the files with the same bytes are skipped,
+the binary files and the files larger than the threshold
+(``trace_diff_max_bytes'' in $HOME/.Chern/config.json, in bytes)
+are summarized by their size and digest,
+and only the other text files go through the unified diff.
+The files are compared in parallel.
+"""
+import difflib
+import filecmp
+import hashlib
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterable, List, Optional, Tuple
+
+from ..utils import csys
+from ..utils import metadata
+from ..utils.metrics import ChernMetrics
+
+METRICS = ChernMetrics.instance()
+
+DEFAULT_MAX_BYTES = 1024 ** 2
+BINARY_PROBE = 8192
+DIFF_WORKERS = 8
+
+
+def file_digest(path: str) -> str:
+    """ The digest of the file, read in blocks """
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def is_binary(path: str) -> bool:
+    """ Whether the file looks binary: a NUL byte or invalid UTF-8 at the beginning """
+    with open(path, "rb") as f:
+        probe = f.read(BINARY_PROBE)
+    if b"\0" in probe:
+        return True
+    try:
+        probe.decode("utf-8")
+    except UnicodeDecodeError as e:
+        # A multi-byte character may be cut at the end of the probe
+        return e.start < len(probe) - 3
+    return False
+
+
+def max_diff_bytes() -> int:
+    """ The size above which only a summary of the change is given """
+    config_file = metadata.ConfigFile(csys.local_config_path())
+    return config_file.read_variable("trace_diff_max_bytes", DEFAULT_MAX_BYTES)
+
+
+def diff_file(old_path: str, new_path: str, fromfile: str, tofile: str,
+              max_bytes: int) -> Optional[Tuple[str, List[str]]]:
+    """ Compare two files
+
+    Returns:
+        None if the files are identical, otherwise (kind, lines) with kind
+        ``text'' (the unified diff), ``binary'' or ``large'' (a summary)
+    """
+    if os.path.samefile(old_path, new_path):
+        return None
+    old_size = os.path.getsize(old_path)
+    new_size = os.path.getsize(new_path)
+    if old_size == new_size:
+        METRICS.count("filecmp.cmp")
+        if filecmp.cmp(old_path, new_path, shallow=False):
+            return None
+
+    kind = ""
+    if is_binary(old_path) or is_binary(new_path):
+        kind = "binary"
+    elif max(old_size, new_size) > max_bytes:
+        kind = "large"
+    if kind:
+        return kind, [
+            f"size: {old_size} -> {new_size} bytes ({new_size - old_size:+d})\n",
+            f"digest: {file_digest(old_path)} -> {file_digest(new_path)}\n",
+        ]
+
+    with open(old_path, "r", encoding="utf-8", errors="replace") as f:
+        old_lines = f.readlines()
+    with open(new_path, "r", encoding="utf-8", errors="replace") as f:
+        new_lines = f.readlines()
+    return "text", list(difflib.unified_diff(
+        old_lines, new_lines, fromfile=fromfile, tofile=tofile
+    ))
+
+
+def diff_trees(old_root: str, new_root: str, files: Iterable[str],
+               labels: Tuple[str, str], *,
+               max_bytes: Optional[int] = None) -> List[Tuple[str, str, List[str]]]:
+    """ Compare the files (relative paths) of two directories in parallel,
+    ``labels'' are the prefixes of the file names in the unified diffs
+
+    Returns:
+        list: (file, kind, lines) of the changed files, sorted by file
+    """
+    if max_bytes is None:
+        max_bytes = max_diff_bytes()
+    files = sorted(files)
+
+    def compare(rel):
+        return diff_file(os.path.join(old_root, rel), os.path.join(new_root, rel),
+                         f"{labels[0]}:{rel}", f"{labels[1]}:{rel}", max_bytes)
+
+    with ThreadPoolExecutor(max_workers=DIFF_WORKERS) as executor:
+        results = list(executor.map(compare, files))
+    return [(rel, result[0], result[1])
+            for rel, result in zip(files, results) if result is not None]
@@ -0,0 +1,201 @@
+"""
+This module checks the integrity of the arcs and the aliases of a project
+in a single pass.
+
+The configs of all the objects (and the aliases of their chern.yaml)
+are loaded once, and the checks are done in memory:
+    the predecessors exist and have no duplicates,
+    every input (predecessor which is not an algorithm) has an alias,
+    the aliases point to predecessors, and ``alias_to_path''
+    is the inverse of ``path_to_alias'',
+    the aliases of chern.yaml are the aliases of the config,
+    the successors of each object are exactly the objects
+    having it as a predecessor.
+The predecessors and the aliases define the object, so they are the
+reference: the successors are derived from them, a predecessor which does not
+exist or an input without alias is removed (as the interactive doctor did).
+
+All the problems are reported at once, and the repairs are applied
+as one batch in a ChernJournal transaction.
+The objects whose predecessors are repaired have to be impressed again.
+"""
+import os
+from dataclasses import dataclass
+from logging import getLogger
+from typing import Dict, List, Optional
+
+from ..utils import metadata
+from ..utils.message import Message
+from .chern_journal import ChernJournal
+
+logger = getLogger("ChernLogger")
+
+
+@dataclass
+class Problem:
+    """ An inconsistency of an object """
+    path: str
+    kind: str
+    detail: str
+
+
+def _unique(values: List[str]) -> List[str]:
+    """ The values without the duplicates, in order """
+    return list(dict.fromkeys(values))
+
+
+class ProjectDoctor:
+    """ The integrity checker of a project """
+
+    def __init__(self, project_path: str):
+        self.project_path = project_path
+        # The configs of the objects, keyed by invariant path
+        self.configs: Dict[str, dict] = {}
+        # The aliases in chern.yaml, None without chern.yaml
+        self.yaml_aliases: Dict[str, Optional[List[str]]] = {}
+        self.problems: List[Problem] = []
+        # The variables to write, keyed by invariant path
+        self.config_repairs: Dict[str, dict] = {}
+        self.yaml_repairs: Dict[str, List[str]] = {}
+
+    def _config_path(self, path: str) -> str:
+        return os.path.join(self.project_path, path, ".chern", "config.json")
+
+    def _yaml_path(self, path: str) -> str:
+        return os.path.join(self.project_path, path, "chern.yaml")
+
+    def load(self) -> None:
+        """ Read the configs of all the objects of the project """
+        self.configs = {}
+        self.yaml_aliases = {}
+        queue = ["."]
+        while queue:
+            path = queue.pop()
+            config = metadata.ConfigFile(self._config_path(path)).read_variables()
+            if not config.get("object_type"):
+                continue
+            path = os.path.normpath(path)
+            self.configs[path] = config
+            if config["object_type"] in ("task", "algorithm"):
+                yaml_path = self._yaml_path(path)
+                self.yaml_aliases[path] = (
+                    metadata.YamlFile(yaml_path).read_variable("alias", [])
+                    if os.path.exists(yaml_path) else None
+                )
+            for entry in os.scandir(os.path.join(self.project_path, path)):
+                if entry.is_dir() and entry.name != ".chern" and \
+                        metadata.exists(os.path.join(entry.path, ".chern", "config.json")):
+                    queue.append(os.path.join(path, entry.name))
+
+    def _report(self, path: str, kind: str, detail: str) -> None:
+        self.problems.append(Problem(path, kind, detail))
+
+    def _repair(self, path: str, name: str, value) -> None:
+        self.config_repairs.setdefault(path, {})[name] = value
+
+    def check(self) -> List[Problem]:
+        """ Find all the inconsistencies, and compute the repairs """
+        self.load()
+        self.problems = []
+        self.config_repairs = {}
+        self.yaml_repairs = {}
+        predecessors = {
+            path: self._check_predecessors(path)
+            for path, config in sorted(self.configs.items())
+            if config["object_type"] in ("task", "algorithm")
+        }
+
+        successors: Dict[str, List[str]] = {path: [] for path in predecessors}
+        for path, preds in predecessors.items():
+            for pred in preds:
+                successors.setdefault(pred, []).append(path)
+        for path in sorted(successors):
+            current = self.configs[path].get("successors", [])
+            for succ in _unique(current):
+                if succ not in self.configs:
+                    self._report(path, "missing successor", f"{succ} does not exist")
+                elif path not in self.configs[succ].get("predecessors", []):
+                    self._report(path, "dangling successor",
+                                 f"{succ} does not have {path} as input")
+                # Otherwise the input of succ is removed and reported there
+            for succ in successors[path]:
+                if succ not in current:
+                    self._report(path, "missing successor link",
+                                 f"{succ} has {path} as input")
+            expected = [succ for succ in _unique(current) if succ in successors[path]]
+            expected += [succ for succ in successors[path] if succ not in expected]
+            if expected != current:
+                self._repair(path, "successors", expected)
+        return self.problems
+
+    def _check_predecessors(self, path: str) -> List[str]:
+        """ Check the predecessors and the aliases of the object,
+        return the repaired predecessors
+        """
+        config = self.configs[path]
+        current = config.get("predecessors", [])
+        path_to_alias = dict(config.get("path_to_alias", {}))
+        if len(_unique(current)) != len(current):
+            self._report(path, "duplicate predecessor", "the predecessors are repeated")
+        preds = []
+        for pred in _unique(current):
+            if pred not in self.configs:
+                self._report(path, "missing predecessor", f"{pred} does not exist")
+            elif self.configs[pred]["object_type"] != "algorithm" and pred not in path_to_alias:
+                self._report(path, "input without alias", f"{pred} has no alias")
+            else:
+                preds.append(pred)
+        if preds != current:
+            self._repair(path, "predecessors", preds)
+
+        for alias_path, alias in sorted(path_to_alias.items()):
+            if alias_path not in preds:
+                self._report(path, "zombie alias", f"{alias} -> {alias_path} is not an input")
+                path_to_alias.pop(alias_path)
+        alias_to_path = {alias: alias_path for alias_path, alias in path_to_alias.items()}
+        if path_to_alias != config.get("path_to_alias", {}):
+            self._repair(path, "path_to_alias", path_to_alias)
+        if alias_to_path != config.get("alias_to_path", {}):
+            if path_to_alias == config.get("path_to_alias", {}):
+                self._report(path, "alias maps disagree",
+                             "alias_to_path is not the inverse of path_to_alias")
+            self._repair(path, "alias_to_path", alias_to_path)
+        self._check_yaml_aliases(path, sorted(alias_to_path))
+        return preds
+
+    def _check_yaml_aliases(self, path: str, aliases: List[str]) -> None:
+        """ Check that chern.yaml has the aliases of the config """
+        yaml_aliases = self.yaml_aliases.get(path)
+        if yaml_aliases is None:
+            return
+        expected = [alias for alias in _unique(yaml_aliases) if alias in aliases]
+        expected += [alias for alias in aliases if alias not in expected]
+        if expected != yaml_aliases:
+            self._report(path, "chern.yaml aliases", f"{yaml_aliases} instead of {expected}")
+            self.yaml_repairs[path] = expected
+
+    def fix(self) -> int:
+        """ Apply the repairs of the last check in one batch,
+        return the number of objects repaired
+        """
+        with ChernJournal(self.project_path).transaction():
+            for path, variables in self.config_repairs.items():
+                metadata.ConfigFile(self._config_path(path)).write_variables(variables)
+            for path, aliases in self.yaml_repairs.items():
+                metadata.YamlFile(self._yaml_path(path)).write_variable("alias", aliases)
+        repaired = set(self.config_repairs) | set(self.yaml_repairs)
+        logger.info("Repaired %d objects", len(repaired))
+        return len(repaired)
+
+    def report(self) -> Message:
+        """ The problems found by the last check """
+        message = Message()
+        if not self.problems:
+            message.add(f"No problem found in {len(self.configs)} objects.\n", "success")
+            return message
+        for problem in self.problems:
+            message.add(f"[{problem.kind}] ", "warning")
+            message.add(f"{problem.path}: {problem.detail}\n")
+        message.add(f"{len(self.problems)} problems found in {len(self.configs)} objects.\n",
+                    "warning")
+        return message
@@ -0,0 +1,157 @@
+"""
+This module imports files into a task or an algorithm in bulk.
+
+The sources are files, directories (imported with their tree)
+or glob patterns (e.g. ``data/*.root'', ``inputs/**/*.csv''):
+a source is only expanded as a pattern when no such path exists,
+and the patterns match the hidden files too.
+The files are listed first, and then cloned in a thread pool
+(``import_workers'' in $HOME/.Chern/config.json):
+with reflink (copy-on-write) when the filesystem supports it,
+with a hardlink if allowed (only when neither side is modified in place),
+and with a normal copy otherwise.
+
+Each file is cloned to [name].chern_part and renamed when complete,
+so that an interrupted import never leaves a truncated file.
+A file already at the destination with the same size and md5 is skipped,
+so an interrupted import resumes where it stopped when it is run again.
+A different file at the destination is not overwritten.
+"""
+import glob
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from logging import getLogger
+from typing import Callable, Dict, List, Optional, Tuple
+
+from ..utils import csys
+from ..utils import metadata
+from ..utils.message import Message
+
+logger = getLogger("ChernLogger")
+
+DEFAULT_WORKERS = 8
+PART_SUFFIX = ".chern_part"
+
+
+def _same_file(src: str, dst: str, size: int) -> bool:
+    """ Whether dst has the same size and contents as src """
+    return os.path.getsize(dst) == size and csys.md5sum(src) == csys.md5sum(dst)
+
+
+def _expand(source: str) -> List[str]:
+    """ The paths of a source: the path itself when it exists (even with
+    glob characters in its name), otherwise the matches of the pattern,
+    the hidden files included (as os.listdir)
+    """
+    if os.path.lexists(source):
+        return [source]
+    if not any(char in source for char in "*?["):
+        return []
+    try:
+        return sorted(glob.glob(source, recursive=True, include_hidden=True))
+    except TypeError:
+        # include_hidden is new in Python 3.11
+        head, tail = os.path.split(source)
+        paths = glob.glob(source, recursive=True)
+        if tail[:1] in ("*", "?", "["):
+            paths += glob.glob(os.path.join(head, "." + tail), recursive=True)
+        return sorted(paths)
+
+
+class BulkImport:
+    """ Import files, directories and glob patterns into a directory """
+
+    def __init__(self, sources: List[str], target: str, link: bool = False):
+        self.sources = sources
+        self.target = target
+        self.link = link
+        self.max_workers = metadata.ConfigFile(csys.local_config_path()).read_variable(
+            "import_workers", DEFAULT_WORKERS)
+        # The files imported, skipped (identical) and in conflict, by result
+        self.results: Dict[str, List[str]] = {"imported": [], "skipped": [], "conflict": []}
+        self.imported_bytes = 0
+        self.elapsed = 0.0
+
+    def plan(self, message: Message) -> Tuple[List[str], List[Tuple[str, str, int]]]:
+        """ List the directories and the files to import
+
+        Returns:
+            (directories, files): the directories to create,
+            and the (source, destination, size) of the files
+        """
+        directories = []
+        files = []
+        for source in self.sources:
+            paths = _expand(source)
+            if not paths:
+                message.add(f"File does not exist: {source}\n", "warning")
+            for path in paths:
+                path = os.path.abspath(path)
+                destination = os.path.join(self.target, os.path.basename(path.rstrip("/")))
+                if os.path.abspath(destination) == path:
+                    continue
+                if not os.path.isdir(path):
+                    files.append((path, destination, os.path.getsize(path)))
+                    continue
+                for dirpath, _, filenames in os.walk(path):
+                    relative = os.path.relpath(dirpath, path)
+                    directories.append(os.path.normpath(os.path.join(destination, relative)))
+                    for f in sorted(filenames):
+                        src = os.path.join(dirpath, f)
+                        files.append((src, os.path.normpath(os.path.join(destination, relative, f)),
+                                      os.path.getsize(src)))
+        return directories, files
+
+    def import_one(self, src: str, dst: str, size: int) -> str:
+        """ Import one file, return imported, skipped or conflict """
+        if os.path.exists(dst):
+            return "skipped" if _same_file(src, dst, size) else "conflict"
+        csys.clone_file(src, dst + PART_SUFFIX, allow_hardlink=self.link)
+        os.replace(dst + PART_SUFFIX, dst)
+        return "imported"
+
+    def run(self, progress: Optional[Callable[[int, int, int, int], None]] = None) -> Message:
+        """ Import the files
+
+        Args:
+            progress: called after each file with
+                (done, total, done_bytes, total_bytes)
+        """
+        message = Message()
+        start = time.perf_counter()
+        directories, files = self.plan(message)
+        for directory in directories:
+            csys.mkdir(directory)
+        self._import_all(files, progress)
+        self.elapsed = time.perf_counter() - start
+
+        for relative in sorted(self.results["conflict"]):
+            message.add(f"File already exists (different): {relative}\n", "warning")
+        logger.info("Imported %d files (%d bytes) in %.2f s, skipped %d identical files",
+                    len(self.results["imported"]), self.imported_bytes, self.elapsed,
+                    len(self.results["skipped"]))
+        return message
+
+    def _import_all(self, files: List[Tuple[str, str, int]], progress) -> None:
+        """ Import the files in the thread pool """
+        total_bytes = sum(size for _, _, size in files)
+        done_bytes = 0
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = {executor.submit(self.import_one, *item): item for item in files}
+            for done, future in enumerate(as_completed(futures), start=1):
+                _, dst, size = futures[future]
+                result = future.result()
+                self.results[result].append(os.path.relpath(dst, self.target))
+                if result == "imported":
+                    self.imported_bytes += size
+                done_bytes += size
+                if progress is not None:
+                    progress(done, len(files), done_bytes, total_bytes)
+
+    def summary(self) -> str:
+        """ The counts and the throughput of the import """
+        throughput = self.imported_bytes / 1024 ** 2 / self.elapsed if self.elapsed else 0.0
+        return (f"Imported {len(self.results['imported'])} files "
+                f"({self.imported_bytes / 1024 ** 2:.1f} MB) in {self.elapsed:.2f} s "
+                f"({throughput:.1f} MB/s), skipped {len(self.results['skipped'])} identical files")
@@ -0,0 +1,164 @@
+"""
+This module provides the garbage collector of the impressions of a project.
+
+Every impression ever created stays in [project]/.chern/impressions,
+while only a few of them are still referenced.
+The live set is computed from:
+    the current ``impression'' of every task and algorithm,
+    including the ones in the trash, which can still be restored,
+    the ``parents'' chain of these impressions (the history),
+and then closed over the ``dependencies'' and the ``alias_to_impression''
+of the live impressions, so that the history can still be traced.
+The other impressions are unreachable and are deleted,
+or moved into a tar archive first.
+
+With ``keep_parents'', only the latest parents of each chain are kept,
+the older history is collected as well, and removed from the ``parents''
+of the impressions kept.
+"""
+import json
+import os
+import tarfile
+from logging import getLogger
+from typing import Dict, List, Optional, Set
+
+from ..utils import csys
+from ..utils import metadata
+from .vobject import VObject
+from .chern_journal import ChernJournal
+from .chern_trash import ChernTrash
+from .chern_impression_index import impression_index
+
+logger = getLogger("ChernLogger")
+
+
+class ImpressionCollector:
+    """ The garbage collector of the impressions of a project """
+
+    def __init__(self, project_path: str):
+        self.project_path = project_path
+        self.impressions_path = os.path.join(project_path, ".chern", "impressions")
+
+    def _read_config(self, uuid: str) -> dict:
+        """ The config of the impression, empty if it is missing or broken """
+        config_path = os.path.join(self.impressions_path, uuid, "config.json")
+        try:
+            with open(config_path, encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _metadata(self, uuid: str) -> dict:
+        """ The metadata of the impression, from the impression index if possible """
+        entry = impression_index(self.project_path).get(uuid)
+        if entry is not None:
+            return entry
+        return self._read_config(uuid)
+
+    def impressions(self) -> List[str]:
+        """ The uuids of all the impressions on the disk """
+        if not os.path.isdir(self.impressions_path):
+            return []
+        return [uuid for uuid in os.listdir(self.impressions_path)
+                if os.path.isdir(os.path.join(self.impressions_path, uuid))]
+
+    def trashed_configs(self) -> List[metadata.ConfigFile]:
+        """ The configs of the tasks and algorithms in the trash """
+        trash = ChernTrash(self.project_path)
+        configs = []
+        for entry in trash.entries():
+            items_path = os.path.join(trash.trash_path, entry["entry"], "items")
+            for root, dirs, _ in os.walk(items_path):
+                if ".chern" not in dirs:
+                    continue
+                dirs.remove(".chern")
+                config_file = metadata.ConfigFile(os.path.join(root, ".chern", "config.json"))
+                if config_file.read_variable("object_type", "") in ("task", "algorithm"):
+                    configs.append(config_file)
+        return configs
+
+    def roots(self, keep_parents: Optional[int] = None) -> Set[str]:
+        """ The impressions referenced by the objects
+        (in the project or in the trash) and their history
+        """
+        roots = set()
+        project = VObject(self.project_path, self.project_path)
+        configs = [obj.config_file for obj in project.sub_objects_recursively()
+                   if obj.is_task_or_algorithm()]
+        # The objects in the trash (and their predecessors in the same entry)
+        # can be restored, their predecessors outside are reached
+        # through the dependencies of their impressions
+        configs.extend(self.trashed_configs())
+        for config_file in configs:
+            uuid = config_file.read_variable("impression", "")
+            if not uuid:
+                continue
+            roots.add(uuid)
+            parents = self._metadata(uuid).get("parents", [])
+            if keep_parents is not None:
+                parents = parents[len(parents) - keep_parents:] if keep_parents > 0 else []
+            roots.update(parents)
+        return roots
+
+    def live_set(self, keep_parents: Optional[int] = None) -> Set[str]:
+        """ The impressions reachable from the roots """
+        live = set()
+        queue = list(self.roots(keep_parents))
+        while queue:
+            uuid = queue.pop()
+            if uuid in live:
+                continue
+            live.add(uuid)
+            config = self._metadata(uuid)
+            queue.extend(config.get("dependencies", []))
+            queue.extend(config.get("alias_to_impression", {}).values())
+        return live
+
+    def _trim_parents(self, live: Set[str], dead: Set[str]) -> None:
+        """ Remove the collected impressions from the ``parents''
+        of the live impressions, in one batch
+        """
+        trimmed = []
+        with ChernJournal(self.project_path).transaction():
+            for uuid in sorted(live):
+                parents = self._metadata(uuid).get("parents", [])
+                kept = [parent for parent in parents if parent not in dead]
+                if kept != parents:
+                    metadata.ConfigFile(
+                        os.path.join(self.impressions_path, uuid, "config.json")
+                    ).write_variable("parents", kept)
+                    trimmed.append(uuid)
+        # Read again from their config.json at the next query
+        impression_index(self.project_path).remove(trimmed)
+
+    def collect(self, dry_run: bool = False, archive: Optional[str] = None,
+                keep_parents: Optional[int] = None) -> Dict:
+        """ Delete (or archive and delete) the unreachable impressions
+
+        Args:
+            dry_run: only report what would be collected
+            archive: the tar file to move the unreachable impressions to
+            keep_parents: the number of parents kept in each history chain,
+                all of them if None
+
+        Returns:
+            dict: ``live'' and ``dead'' (the uuids) and ``size''
+                (the bytes of the dead impressions)
+        """
+        live = self.live_set(keep_parents)
+        dead = sorted(uuid for uuid in self.impressions() if uuid not in live)
+        size = sum(csys.tree_size(os.path.join(self.impressions_path, uuid)) for uuid in dead)
+        report = {"live": sorted(live), "dead": dead, "size": size}
+        if dry_run or not dead:
+            return report
+
+        if archive is not None:
+            with tarfile.open(archive, "a" if os.path.exists(archive) else "w") as tar:
+                for uuid in dead:
+                    tar.add(os.path.join(self.impressions_path, uuid), arcname=uuid)
+        self._trim_parents(live, set(dead))
+        impression_index(self.project_path).remove(dead)
+        for uuid in dead:
+            csys.rm_tree(os.path.join(self.impressions_path, uuid))
+        logger.info("Collected %d impressions (%d bytes)", len(dead), size)
+        return report
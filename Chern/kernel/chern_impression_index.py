@@ -0,0 +1,191 @@
+"""
+This module provides the metadata index of the impressions of a project.
+
+An impression is immutable once it is created, so its metadata
+(the object path and type, the parents, the dependencies,
+the alias map and the tree) can be read once and kept.
+The index is stored in [project]/.chern/impressions/index.sqlite
+and loaded in memory at the first query, so that ``history'', ``trace''
+and ``is_impressed'' do not parse the config.json of every impression again.
+
+The impressions that are not in the index yet are read from their
+config.json and added to it.
+The index in memory is loaded again when the inode or the modification
+time of the database changes (e.g. written by another process,
+or a project removed and created again at the same path).
+If the database can not be used, the index is kept in memory only.
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+from logging import getLogger
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from ..utils import csys
+from ..utils.metrics import ChernMetrics
+from .chern_cache import ChernCache
+
+CHERN_CACHE = ChernCache.instance()
+METRICS = ChernMetrics.instance()
+logger = getLogger("ChernLogger")
+
+COLUMNS = ("object_path", "object_type", "parents", "dependencies",
+           "alias_to_impression", "tree", "tree_digest")
+
+
+def tree_digest(tree: List) -> str:
+    """ The digest of a (sorted) file tree """
+    return hashlib.md5(json.dumps(tree).encode("utf-8")).hexdigest()
+
+
+def impression_index(project_path: str) -> 'ImpressionIndex':
+    """ The impression index of the project, shared in the process """
+    table = CHERN_CACHE.impression_index_table
+    project_path = os.path.abspath(project_path)
+    if project_path not in table:
+        table[project_path] = ImpressionIndex(project_path)
+    return table[project_path]
+
+
+class ImpressionIndex:
+    """ The metadata index of the impressions of a project """
+
+    def __init__(self, project_path: str):
+        self.impressions_path = os.path.join(project_path, ".chern", "impressions")
+        self.database_path = os.path.join(self.impressions_path, "index.sqlite")
+        self.entries: Optional[Dict[str, Dict[str, Any]]] = None
+        # The (inode, mtime) of the database the entries were loaded from
+        self.signature: Optional[Tuple[int, int]] = None
+        self.lock = threading.Lock()
+
+    def _signature(self) -> Optional[Tuple[int, int]]:
+        """ The inode and the modification time of the database, None if missing """
+        try:
+            stat = os.stat(self.database_path)
+        except OSError:
+            return None
+        return (stat.st_ino, stat.st_mtime_ns)
+
+    def _connect(self) -> Optional[sqlite3.Connection]:
+        """ Open the database, None if it can not be used """
+        if not os.path.isdir(self.impressions_path):
+            return None
+        try:
+            connection = sqlite3.connect(self.database_path, timeout=10)
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS impressions "
+                "(uuid TEXT PRIMARY KEY, "
+                + ", ".join(f"{column} TEXT" for column in COLUMNS) + ")"
+            )
+            return connection
+        except sqlite3.Error as e:
+            logger.warning("Impression index unavailable: %s", e)
+            return None
+
+    def _load(self) -> Dict[str, Dict[str, Any]]:
+        """ Load the index from the database, again if the database changed """
+        if self.entries is not None and self._signature() == self.signature:
+            return self.entries
+        self.entries = {}
+        connection = self._connect()
+        self.signature = self._signature()
+        if connection is None:
+            return self.entries
+        try:
+            rows = connection.execute(
+                "SELECT uuid, " + ", ".join(COLUMNS) + " FROM impressions"
+            ).fetchall()
+        except sqlite3.Error as e:
+            logger.warning("Impression index unreadable: %s", e)
+            rows = []
+        finally:
+            connection.close()
+        for row in rows:
+            entry = dict(zip(COLUMNS, row[1:]))
+            for column in ("parents", "dependencies", "alias_to_impression", "tree"):
+                entry[column] = json.loads(entry[column])
+            self.entries[row[0]] = entry
+        return self.entries
+
+    def _save(self, entries: Dict[str, Dict[str, Any]]) -> None:
+        """ Add the entries to the database """
+        connection = self._connect()
+        if connection is None:
+            return
+        rows = [
+            (uuid,) + tuple(
+                value if isinstance(value, str) else json.dumps(value)
+                for value in (entry[column] for column in COLUMNS)
+            )
+            for uuid, entry in entries.items()
+        ]
+        try:
+            with connection:
+                connection.executemany(
+                    "INSERT OR REPLACE INTO impressions VALUES ("
+                    + ", ".join("?" * (len(COLUMNS) + 1)) + ")", rows
+                )
+        except sqlite3.Error as e:
+            logger.warning("Impression index not saved: %s", e)
+        finally:
+            connection.close()
+        # The entries in memory are up to date with our own writes
+        self.signature = self._signature()
+
+    def _read_entry(self, uuid: str) -> Optional[Dict[str, Any]]:
+        """ Read the entry of a complete impression from its config.json """
+        impression_path = os.path.join(self.impressions_path, uuid)
+        # The packed file is written last, before it the impression is incomplete
+        if not os.path.exists(os.path.join(impression_path, f"packed{uuid}.tar.gz")):
+            return None
+        try:
+            with open(os.path.join(impression_path, "config.json"), encoding="utf-8") as f:
+                config = json.load(f)
+        except (OSError, ValueError):
+            return None
+        tree = csys.sorted_tree(config.get("tree", []))
+        return {
+            "object_path": config.get("current_path", ""),
+            "object_type": config.get("object_type", ""),
+            "parents": config.get("parents", []),
+            "dependencies": config.get("dependencies", []),
+            "alias_to_impression": config.get("alias_to_impression", {}),
+            "tree": tree,
+            "tree_digest": tree_digest(tree),
+        }
+
+    def get(self, uuid: str) -> Optional[Dict[str, Any]]:
+        """ The metadata of the impression, None if it is not complete """
+        with self.lock:
+            entries = self._load()
+            if uuid in entries:
+                METRICS.count("impression_index.hit")
+                return entries[uuid]
+            METRICS.count("impression_index.miss")
+            entry = self._read_entry(uuid)
+            if entry is not None:
+                entries[uuid] = entry
+                self._save({uuid: entry})
+            return entry
+
+    def remove(self, uuids: Iterable[str]) -> None:
+        """ Remove the impressions from the index """
+        uuids = list(uuids)
+        with self.lock:
+            entries = self._load()
+            for uuid in uuids:
+                entries.pop(uuid, None)
+            connection = self._connect()
+            if connection is None:
+                return
+            try:
+                with connection:
+                    connection.executemany("DELETE FROM impressions WHERE uuid = ?",
+                                           [(uuid,) for uuid in uuids])
+            except sqlite3.Error as e:
+                logger.warning("Impression index not updated: %s", e)
+            finally:
+                connection.close()
+            self.signature = self._signature()
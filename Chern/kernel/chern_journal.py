@@ -0,0 +1,124 @@
+"""
+This module provides the journal used to apply a batch of
+metadata changes of a project atomically.
+
+The usual way is to group the writes in a transaction:
+
+    with ChernJournal(project_path).transaction():
+        obj.add_arc_from(pred)
+        obj.set_alias(alias, path)
+
+Inside the transaction, the writes of ConfigFile and YamlFile to the
+files of the project are staged in memory (see metadata.begin_staging)
+and they are committed as one batch at the end.
+If an exception is raised, the staged writes are discarded.
+
+A batch is a list of directory renames followed by a list of
+full-content file writes, all relative to the project path.
+The batch is first written to [project]/.chern/journal.json
+(through a temporary file, fsync and rename, which is the commit point),
+then applied, and the journal is removed at last.
+If the process crashes in between, ``recover'' replays
+the committed journal, all the steps being idempotent,
+and discards the journal that was not completely written.
+"""
+import json
+import os
+from contextlib import contextmanager
+from logging import getLogger
+from typing import Dict, List, Tuple
+
+from ..utils import metadata
+from .chern_cache import ChernCache
+
+logger = getLogger("ChernLogger")
+
+
+def _write_atomically(path: str, contents: str, sync: bool = False) -> None:
+    """ Write the file through a temporary file and a rename """
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temp_path = path + ".chern_tmp"
+    with open(temp_path, "w", encoding="utf-8") as f:
+        f.write(contents)
+        if sync:
+            f.flush()
+            os.fsync(f.fileno())
+    os.replace(temp_path, path)
+
+
+class ChernJournal:
+    """ The journal of a project """
+
+    def __init__(self, project_path: str):
+        self.project_path = project_path
+        self.journal_path = os.path.join(project_path, ".chern", "journal.json")
+
+    def commit(self, renames: List[Tuple[str, str]], writes: Dict[str, str]) -> None:
+        """ Apply the renames and then the writes as one batch
+
+        Args:
+            renames: (source, destination) directories, relative to the project
+            writes: the contents of the files after the renames,
+                keyed by the path relative to the project
+        """
+        batch = {"renames": [list(rename) for rename in renames], "writes": writes}
+        # Only the journal is synchronized, the files can be rebuilt from it
+        _write_atomically(self.journal_path, json.dumps(batch), sync=True)
+        self.apply(batch)
+        os.remove(self.journal_path)
+
+    @contextmanager
+    def transaction(self):
+        """ Group the metadata writes to the project in one batch
+
+        The nested transactions join the outermost one.
+        """
+        if metadata.is_staging():
+            yield
+            return
+        metadata.begin_staging(self.project_path)
+        try:
+            yield
+        except BaseException:
+            metadata.end_staging()
+            raise
+        writes = {
+            os.path.relpath(path, self.project_path): contents
+            for path, contents in metadata.end_staging().items()
+        }
+        if writes:
+            self.commit([], writes)
+
+    def apply(self, batch: dict) -> None:
+        """ Apply a batch, it is safe to apply a batch more than once """
+        moved = []
+        for src, dst in batch.get("renames", []):
+            src = os.path.join(self.project_path, src)
+            dst = os.path.join(self.project_path, dst)
+            if os.path.exists(src) and not os.path.exists(dst):
+                os.rename(src, dst)
+            moved += [src, dst]
+        # The entries cached under the old (and new) paths are stale
+        if moved:
+            ChernCache.instance().forget_subtrees(moved)
+        for path, contents in batch.get("writes", {}).items():
+            _write_atomically(os.path.join(self.project_path, path), contents)
+
+    def recover(self) -> bool:
+        """ Replay the committed journal left by an interrupted batch
+
+        Returns:
+            bool: whether a journal was replayed
+        """
+        temp_path = self.journal_path + ".chern_tmp"
+        if os.path.exists(temp_path):
+            # The batch was not committed, nothing has been applied
+            os.remove(temp_path)
+        if not os.path.exists(self.journal_path):
+            return False
+        with open(self.journal_path, encoding="utf-8") as f:
+            batch = json.load(f)
+        logger.warning("Replaying the interrupted batch in %s", self.journal_path)
+        self.apply(batch)
+        os.remove(self.journal_path)
+        return True
@@ -0,0 +1,261 @@
+"""
+This module manages the cache of the layouts of the dependency DAG
+drawn by ``draw-live-dag''.
+
+A layout is keyed by the hash of the graph structure
+(the node ids and the edges) and stored with the node positions
+in $HOME/.Chern/layouts/[hash].json.
+The latest layout of every drawing (the ``scope'', e.g. the project
+and the options) is recorded as well, so that after a small edit
+only the ranks touched by the edit are laid out again:
+the nodes whose rank and predecessors did not change keep their positions,
+and the new or changed nodes are placed on their rank,
+under their predecessors and beside the stable nodes.
+When more than a fraction of the nodes changed
+(``layout_relayout_fraction'' in $HOME/.Chern/config.json),
+the full layout is computed again.
+
+The graphviz renderings of ``draw-dag-graphviz'' are cached as well,
+keyed by the hash of the dot source, so that an unchanged graph
+is not laid out and rendered again.
+"""
+import hashlib
+import json
+import os
+from logging import getLogger
+from statistics import median
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from ..utils import csys
+from ..utils import metadata
+
+logger = getLogger("ChernLogger")
+
+DEFAULT_RELAYOUT_FRACTION = 0.3
+DEFAULT_MAX_ENTRIES = 64
+
+Position = Tuple[float, float]
+
+
+def structure_hash(nodes: Iterable[str], edges: Iterable[Tuple[str, str]]) -> str:
+    """ The hash of the graph structure, independent of the order """
+    structure = [sorted(nodes), sorted([u, v] for u, v in edges)]
+    return hashlib.sha1(json.dumps(structure).encode("utf-8")).hexdigest()
+
+
+def ranks(nodes: Iterable[str], edges: Iterable[Tuple[str, str]]) -> Optional[Dict[str, int]]:
+    """ The rank of every node, the length of the longest path from a source,
+    None if the graph has a cycle
+    """
+    rank = {node: 0 for node in nodes}
+    successors: Dict[str, List[str]] = {node: [] for node in rank}
+    in_degree = dict.fromkeys(rank, 0)
+    for u, v in edges:
+        successors[u].append(v)
+        in_degree[v] += 1
+    queue = [node for node, degree in in_degree.items() if degree == 0]
+    visited = 0
+    while queue:
+        node = queue.pop()
+        visited += 1
+        for succ in successors[node]:
+            rank[succ] = max(rank[succ], rank[node] + 1)
+            in_degree[succ] -= 1
+            if in_degree[succ] == 0:
+                queue.append(succ)
+    return rank if visited == len(rank) else None
+
+
+def _neighbours(nodes: Iterable[str], edges: Iterable[Tuple[str, str]]) -> Dict[str, Tuple]:
+    """ The sorted predecessors and successors of every node """
+    preds: Dict[str, List[str]] = {node: [] for node in nodes}
+    succs: Dict[str, List[str]] = {node: [] for node in preds}
+    for u, v in edges:
+        succs[u].append(v)
+        preds[v].append(u)
+    return {node: (sorted(preds[node]), sorted(succs[node])) for node in preds}
+
+
+def _rank_levels(rank: Dict[str, int], positions: Dict[str, Position]) -> Dict[int, float]:
+    """ The y of every rank, from the placed nodes,
+    interpolated or extrapolated for the empty ranks
+    """
+    known: Dict[int, List[float]] = {}
+    for node, position in positions.items():
+        known.setdefault(rank[node], []).append(position[1])
+    levels = {r: median(ys) for r, ys in known.items()}
+    ordered = sorted(levels)
+    steps = [(levels[b] - levels[a]) / (b - a) for a, b in zip(ordered, ordered[1:])]
+    step = median(steps) if steps else -1.0
+    for r in range(max(rank.values(), default=0) + 1):
+        if r in levels:
+            continue
+        below = [k for k in ordered if k < r]
+        above = [k for k in ordered if k > r]
+        if below:
+            levels[r] = levels[below[-1]] + step * (r - below[-1])
+        elif above:
+            levels[r] = levels[above[0]] - step * (above[0] - r)
+        else:
+            levels[r] = step * r
+    return levels
+
+
+def _spacing(positions: Dict[str, Position]) -> float:
+    """ The typical horizontal gap between the nodes of a rank """
+    rows: Dict[float, List[float]] = {}
+    for x, y in positions.values():
+        rows.setdefault(round(y, 3), []).append(x)
+    gaps = []
+    for xs in rows.values():
+        xs.sort()
+        gaps.extend(b - a for a, b in zip(xs, xs[1:]) if b > a)
+    return median(gaps) if gaps else 1.0
+
+
+def _place(neighbours: Tuple, y: float, positions: Dict[str, Position],
+           spacing: float) -> Position:
+    """ The position of a node on the rank at ``y'',
+    under its placed predecessors (or above its placed successors)
+    """
+    preds, succs = neighbours
+    placed = [positions[pred][0] for pred in preds if pred in positions]
+    if not placed:
+        placed = [positions[succ][0] for succ in succs if succ in positions]
+    x = sum(placed) / len(placed) if placed else 0.0
+    # Move right until the node does not overlap another one of its rank
+    for px in sorted(px for px, py in positions.values() if abs(py - y) < 1e-6):
+        if abs(px - x) < spacing * 0.999:
+            x = px + spacing
+    return x, y
+
+
+def incremental_layout(previous: Dict, nodes: List[str], edges: List[Tuple[str, str]],
+                       max_fraction: float = DEFAULT_RELAYOUT_FRACTION
+                       ) -> Optional[Dict[str, Position]]:
+    """ Update the previous layout to the new graph
+
+    Args:
+        previous: the cached layout, with ``nodes'', ``edges'' and ``positions''
+        max_fraction: the largest fraction of new or changed nodes
+
+    Returns:
+        the positions of the nodes, None if the graph changed too much
+    """
+    rank = ranks(nodes, edges)
+    old_rank = ranks(previous["nodes"], [tuple(edge) for edge in previous["edges"]])
+    if rank is None or old_rank is None:
+        return None
+    neighbours = _neighbours(nodes, edges)
+    old_neighbours = _neighbours(previous["nodes"], [tuple(edge) for edge in previous["edges"]])
+    old_positions = previous["positions"]
+
+    positions = {
+        node: tuple(old_positions[node]) for node in nodes
+        if node in old_positions and old_rank.get(node) == rank[node]
+        and old_neighbours.get(node, ((),))[0] == neighbours[node][0]
+    }
+    changed = [node for node in nodes if node not in positions]
+    if not positions or len(changed) > max_fraction * len(nodes):
+        return None
+
+    # Only the ranks with changed nodes are laid out again,
+    # rank by rank so that the predecessors are placed first
+    levels = _rank_levels(rank, positions)
+    spacing = _spacing(positions)
+    for node in sorted(changed, key=lambda node: (rank[node], node)):
+        positions[node] = _place(neighbours[node], levels[rank[node]], positions, spacing)
+    logger.debug("Incremental layout: %d of %d nodes placed", len(changed), len(nodes))
+    return positions
+
+
+class ChernLayoutCache:
+    """ The cache of the DAG layouts """
+    ins = None
+
+    def __init__(self):
+        self.cache_dir = os.path.join(csys.local_config_dir(), "layouts")
+        self.scopes = metadata.ConfigFile(os.path.join(self.cache_dir, "scopes.json"))
+
+    @classmethod
+    def instance(cls):
+        """ Singleton instance """
+        if cls.ins is None:
+            cls.ins = ChernLayoutCache()
+        return cls.ins
+
+    def path(self, key: str) -> str:
+        """ The file of the cached layout """
+        return os.path.join(self.cache_dir, f"{key}.json")
+
+    def load(self, key: str) -> Optional[Dict]:
+        """ The cached layout, None if it is missing or broken """
+        try:
+            with open(self.path(key), encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def save(self, key: str, nodes: List[str], edges: List[Tuple[str, str]],
+             positions: Dict[str, Position], scope: str = "") -> None:
+        """ Store the layout and record it as the latest one of the scope """
+        csys.mkdir(self.cache_dir)
+        layout = {
+            "nodes": nodes,
+            "edges": [list(edge) for edge in edges],
+            "positions": {node: list(positions[node]) for node in nodes},
+        }
+        temp_path = self.path(key) + f".tmp{os.getpid()}"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump(layout, f)
+        os.replace(temp_path, self.path(key))
+        if scope:
+            self.scopes.write_variable(scope, key)
+        self.evict()
+
+    def rendering(self, source: str, output_format: str) -> str:
+        """ The file of the cached rendering of a graphviz source """
+        digest = hashlib.sha1(source.encode("utf-8")).hexdigest()
+        return os.path.join(self.cache_dir, f"{digest}.{output_format}")
+
+    def evict(self) -> None:
+        """ Remove the oldest entries above the maximum number of entries """
+        config_file = metadata.ConfigFile(csys.local_config_path())
+        max_entries = config_file.read_variable("layout_cache_entries", DEFAULT_MAX_ENTRIES)
+        entries = [os.path.join(self.cache_dir, name) for name in os.listdir(self.cache_dir)
+                   if name != "scopes.json" and ".tmp" not in name]
+        entries.sort(key=os.path.getmtime)
+        for path in entries[:max(0, len(entries) - max_entries)]:
+            os.remove(path)
+
+    def layout(self, nodes: List[str], edges: List[Tuple[str, str]],
+               compute: Callable[[], Dict[str, Position]],
+               scope: str = "") -> Dict[str, Position]:
+        """ The positions of the nodes
+
+        The cached layout of the same structure is used if any,
+        otherwise the latest layout of the scope is updated incrementally,
+        and ``compute'' (the full layout) is called as the last resort.
+        """
+        nodes = sorted(set(nodes))
+        edges = sorted(set((u, v) for u, v in edges))
+        key = structure_hash(nodes, edges)
+        cached = self.load(key)
+        if cached is not None and set(cached["positions"]) == set(nodes):
+            logger.debug("Layout cache hit: %s", key)
+            os.utime(self.path(key))
+            return {node: tuple(cached["positions"][node]) for node in nodes}
+
+        positions = None
+        previous_key = self.scopes.read_variable(scope, "") if scope else ""
+        previous = self.load(previous_key) if previous_key else None
+        if previous is not None:
+            config_file = metadata.ConfigFile(csys.local_config_path())
+            max_fraction = config_file.read_variable("layout_relayout_fraction",
+                                                     DEFAULT_RELAYOUT_FRACTION)
+            positions = incremental_layout(previous, nodes, edges, max_fraction)
+        if positions is None:
+            logger.debug("Layout cache miss: %s", key)
+            positions = {node: tuple(position) for node, position in compute().items()}
+        self.save(key, nodes, edges, positions, scope)
+        return positions
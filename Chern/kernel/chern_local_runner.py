@@ -0,0 +1,360 @@
+"""
+This module runs the impressions locally, as a stand-in for DITE.
+
+``submit local-exec'' hands the impressions of an object to the local runner,
+which runs them and all the impressions they depend on
+(except the ones already finished locally) in a pool of workers
+(``local_exec_workers'' in $HOME/.Chern/config.json, the number of cores
+by default). An impression is started once all its dependencies are finished,
+the ready impressions with the longest chain of work after them first
+(critical path, see chern_schedule), so that the long chains do not start late.
+
+Each impression runs in $HOME/.Chern/local_runs/[uuid]:
+    run.json: the status (pending, running, finished or failed),
+        the start and end times and the return code
+    output.log: the commands and their output
+    workdir: the working directory, with
+        the contents of the impression,
+        code: the contents of the algorithm impression,
+            and code/[alias] the contents of its algorithm inputs,
+        [alias]/outputs: a link to the outputs of each input,
+        outputs: the outputs of the impression
+The commands of the algorithm (``commands'' in its chern.yaml, with the
+``${parameter}'' replaced by the parameters of the task) are run one by one
+in the working directory, in a shell limited to the ``memory_limit''
+of the task (RLIMIT_AS, set by ulimit -v). The outputs of a rawdata task are its files,
+the data sent to DITE are not available locally.
+
+An impression identical to one finished locally (same fingerprint,
+see chern_result_cache) is not run: its outputs link to the finished ones.
+
+ChernCommunicator answers the status and output queries of the impressions
+run locally from here, so that the usual commands work on them.
+"""
+import heapq
+import json
+import os
+import re
+import signal
+import subprocess
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from logging import getLogger
+from typing import Dict, List, Optional, Set, Tuple
+
+from ..utils import csys
+from ..utils import metadata
+from ..utils.dag import dependency_index, unblock
+from .chern_result_cache import ChernResultCache
+from .chern_schedule import SubmissionPlan, runtime_history
+from .vimpression import VImpression
+
+logger = getLogger("ChernLogger")
+
+LOCAL_EXEC_RUNNER = "local-exec"
+
+_MEMORY_UNITS = {
+    "": 1, "k": 1000, "M": 1000 ** 2, "G": 1000 ** 3, "T": 1000 ** 4,
+    "Ki": 1024, "Mi": 1024 ** 2, "Gi": 1024 ** 3, "Ti": 1024 ** 4,
+}
+
+
+def memory_bytes(limit: str) -> Optional[int]:
+    """ The memory limit in bytes, e.g. 268435456 for ``256Mi'',
+    None if there is no (valid) limit
+    """
+    match = re.fullmatch(r"\s*([0-9]+(?:\.[0-9]+)?)\s*(Ki|Mi|Gi|Ti|[kMGT]|)\s*", str(limit or ""))
+    if match is None:
+        return None
+    return int(float(match.group(1)) * _MEMORY_UNITS[match.group(2)])
+
+
+class LocalRunner:
+    """ Run the impressions locally """
+    ins = None
+
+    def __init__(self):
+        self.runs_dir = os.path.join(csys.local_config_dir(), "local_runs")
+        config_file = metadata.ConfigFile(csys.local_config_path())
+        self.max_workers = config_file.read_variable(
+            "local_exec_workers", os.cpu_count() or 1)
+        self.lock = threading.Lock()
+        self.processes: Dict[str, subprocess.Popen] = {}
+        self.cancelled: Set[str] = set()
+        self.schedulers: List[threading.Thread] = []
+
+    @classmethod
+    def instance(cls):
+        """ Singleton instance """
+        if cls.ins is None:
+            cls.ins = LocalRunner()
+        return cls.ins
+
+    # === Records ===
+    def run_dir(self, uuid: str) -> str:
+        """ The directory of the run of the impression """
+        return os.path.join(self.runs_dir, uuid)
+
+    def outputs_dir(self, uuid: str) -> str:
+        """ The outputs of the impression """
+        return os.path.join(self.run_dir(uuid), "workdir", "outputs")
+
+    def record(self, uuid: str) -> Dict:
+        """ The run record of the impression, empty if it was never run """
+        try:
+            with open(os.path.join(self.run_dir(uuid), "run.json"), encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _write_record(self, uuid: str, **values) -> None:
+        """ Update the run record, replaced atomically for the readers """
+        record = self.record(uuid)
+        record.update(values)
+        csys.mkdir(self.run_dir(uuid))
+        path = os.path.join(self.run_dir(uuid), "run.json")
+        with open(path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(record, f)
+        os.replace(path + ".tmp", path)
+
+    def has_run(self, uuid: str) -> bool:
+        """ Whether the impression was run locally """
+        return os.path.exists(os.path.join(self.run_dir(uuid), "run.json"))
+
+    def status(self, uuid: str) -> str:
+        """ The status of the impression: unsubmitted, pending, running,
+        finished or failed (also when the runner died before the end)
+        """
+        record = self.record(uuid)
+        status = record.get("status", "unsubmitted")
+        if status in ("pending", "running") and not csys.pid_alive(record.get("runner_pid", 0)):
+            return "failed"
+        return status
+
+    # === Execution ===
+    def closure(self, impressions: List[VImpression],
+                reused: Optional[Dict[str, str]] = None) -> Dict[str, VImpression]:
+        """ The impressions to run: the impressions and all their dependencies,
+        except the ones already finished locally
+        and the ones reusing a finished identical impression (added to reused)
+        """
+        result_cache = ChernResultCache.instance()
+        closure = {}
+        queue = list(impressions)
+        while queue:
+            impression = queue.pop()
+            if impression.uuid in closure or self.status(impression.uuid) == "finished":
+                continue
+            source = result_cache.lookup(impression, LOCAL_EXEC_RUNNER)
+            if source is not None and self.status(source) == "finished":
+                self.reuse(impression, source)
+                if reused is not None:
+                    reused[impression.uuid] = source
+                continue
+            if source is not None:
+                result_cache.forget(source, LOCAL_EXEC_RUNNER)
+            closure[impression.uuid] = impression
+            queue.extend(impression.pred_impressions())
+        return closure
+
+    def reuse(self, impression: VImpression, source: str) -> None:
+        """ Finish the impression with the outputs of the source impression """
+        workdir = os.path.join(self.run_dir(impression.uuid), "workdir")
+        if os.path.isdir(workdir):
+            csys.rm_tree(workdir)
+        csys.symlink(self.outputs_dir(source), os.path.join(workdir, "outputs"))
+        now = time.time()
+        self._write_record(impression.uuid, status="finished", runner_pid=os.getpid(),
+                           submitted=now, start=now, end=now, returncode=0,
+                           reason="", reused_from=source)
+
+    def execute(self, impressions: List[VImpression], wait_finished: bool = False
+                ) -> Tuple[List[str], Dict[str, str]]:
+        """ Run the impressions and their dependencies in the background
+
+        Returns:
+            (to_run, reused): the uuids of the impressions to run,
+            and the impressions reusing a finished one, {uuid: finished uuid}
+        """
+        reused: Dict[str, str] = {}
+        closure = self.closure(impressions, reused)
+        plan = SubmissionPlan(list(closure.values()), self.max_workers)
+        for uuid in closure:
+            self.cancelled.discard(uuid)
+            self._write_record(uuid, status="pending", runner_pid=os.getpid(),
+                               submitted=time.time(), start=None, end=None,
+                               returncode=None, reason="")
+        scheduler = threading.Thread(
+            target=self._schedule, args=(closure, plan.dependencies, plan.priorities),
+            daemon=True)
+        self.schedulers.append(scheduler)
+        scheduler.start()
+        if wait_finished:
+            self.wait()
+        return list(closure), reused
+
+    def wait(self) -> None:
+        """ Wait for all the submitted impressions """
+        while self.schedulers:
+            self.schedulers.pop().join()
+
+    def _schedule(self, closure: Dict[str, VImpression],
+                  dependencies: Dict[str, Set[str]], priorities: Dict[str, float]) -> None:
+        """ Start the ready impressions, the highest priority first """
+        initial, waiting, successors = dependency_index(dependencies)
+        ready = [(-priorities[uuid], uuid) for uuid in initial]
+        heapq.heapify(ready)
+        running = {}
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            while ready or running:
+                while ready and len(running) < self.max_workers:
+                    _, uuid = heapq.heappop(ready)
+                    running[executor.submit(self._run, closure[uuid])] = uuid
+                for future in wait(running, return_when=FIRST_COMPLETED).done:
+                    uuid = running.pop(future)
+                    if future.result():
+                        for succ in unblock(waiting, successors, uuid):
+                            heapq.heappush(ready, (-priorities[succ], succ))
+                    else:
+                        self._fail_successors(successors, uuid)
+
+    def _fail_successors(self, successors: Dict[str, List[str]], uuid: str) -> None:
+        """ Mark all the impressions depending on a failed one as failed """
+        queue = list(successors.get(uuid, []))
+        failed = set()
+        while queue:
+            succ = queue.pop()
+            if succ in failed:
+                continue
+            failed.add(succ)
+            self._write_record(succ, status="failed", reason=f"dependency {uuid} failed")
+            queue.extend(successors.get(succ, []))
+
+    def _run(self, impression: VImpression) -> bool:
+        """ Run one impression, return whether it finished """
+        uuid = impression.uuid
+        start = time.time()
+        self._write_record(uuid, status="running", start=start)
+        try:
+            returncode = self._run_commands(impression)
+        except Exception as e:  # pylint: disable=broad-exception-caught
+            logger.error("Local run of %s failed: %s", uuid, e)
+            self._write_record(uuid, status="failed", end=time.time(), reason=str(e))
+            return False
+        if uuid in self.cancelled:
+            status, reason = "failed", "killed"
+        elif returncode != 0:
+            status, reason = "failed", f"command exited with {returncode}"
+        else:
+            status, reason = "finished", ""
+        end = time.time()
+        self._write_record(uuid, status=status, end=end, duration=end - start,
+                           returncode=returncode, reason=reason)
+        if status == "finished":
+            ChernResultCache.instance().record(impression, LOCAL_EXEC_RUNNER)
+        if status == "finished" and \
+                impression.config_file.read_variable("object_type") != "algorithm":
+            runtime_history(impression.project_path).record(
+                impression.config_file.read_variable("current_path", ""), end - start)
+        return status == "finished"
+
+    def _prepare(self, impression: VImpression) -> str:
+        """ Make the working directory of the impression """
+        workdir = os.path.join(self.run_dir(impression.uuid), "workdir")
+        if os.path.isdir(workdir):
+            csys.rm_tree(workdir)
+        csys.copy_tree(impression.path + "/contents", workdir)
+        csys.mkdir(os.path.join(workdir, "outputs"))
+        for dep in impression.pred_impressions():
+            if dep.config_file.read_variable("object_type") == "algorithm":
+                code = os.path.join(workdir, "code")
+                csys.copy_tree(dep.path + "/contents", code)
+                # The algorithm inputs of the algorithm, under code as well
+                for alias, uuid in dep.index_entry()["alias_to_impression"].items():
+                    alg_input = VImpression(uuid, impression.project_path)
+                    if alg_input.index_entry()["object_type"] == "algorithm":
+                        csys.copy_tree(alg_input.path + "/contents", os.path.join(code, alias))
+        for alias, uuid in impression.index_entry()["alias_to_impression"].items():
+            environment = metadata.YamlFile(
+                VImpression(uuid, impression.project_path).path + "/contents/chern.yaml"
+            ).read_variable("environment", "")
+            if environment == "rawdata":
+                csys.symlink(self.outputs_dir(uuid), os.path.join(workdir, alias))
+            else:
+                csys.symlink(self.outputs_dir(uuid), os.path.join(workdir, alias, "outputs"))
+        return workdir
+
+    def _run_commands(self, impression: VImpression) -> int:
+        """ Run the commands of the algorithm in the working directory,
+        return the first non-zero return code, or 0
+        """
+        workdir = self._prepare(impression)
+        if impression.config_file.read_variable("object_type") == "algorithm":
+            return 0
+        settings = metadata.YamlFile(os.path.join(workdir, "chern.yaml")).read_variables()
+        if settings.get("environment") == "rawdata":
+            for name in os.listdir(workdir):
+                if name != "outputs":
+                    csys.move(os.path.join(workdir, name), os.path.join(workdir, "outputs"))
+            return 0
+
+        parameters = settings.get("parameters") or {}
+        commands = metadata.YamlFile(
+            os.path.join(workdir, "code", "chern.yaml")).read_variable("commands", [])
+        limit = memory_bytes(settings.get("memory_limit") or
+                             settings.get("kubernetes_memory_limit", ""))
+        with open(os.path.join(self.run_dir(impression.uuid), "output.log"), "w",
+                  encoding="utf-8") as log:
+            for command in commands:
+                for parameter, value in parameters.items():
+                    command = command.replace("${" + parameter + "}", str(value))
+                if impression.uuid in self.cancelled:
+                    return -signal.SIGTERM
+                log.write(f"$ {command}\n")
+                log.flush()
+                if limit:
+                    # RLIMIT_AS of the shell and hence of the command
+                    command = f"ulimit -v {limit // 1024}; {command}"
+                process = subprocess.Popen(  # pylint: disable=consider-using-with
+                    command, shell=True, cwd=workdir, stdout=log, stderr=subprocess.STDOUT,
+                    start_new_session=True)
+                with self.lock:
+                    self.processes[impression.uuid] = process
+                returncode = process.wait()
+                with self.lock:
+                    self.processes.pop(impression.uuid, None)
+                if returncode != 0:
+                    return returncode
+        return 0
+
+    def kill(self, uuid: str) -> str:
+        """ Kill the impression, and hence all the impressions depending on it """
+        self.cancelled.add(uuid)
+        with self.lock:
+            process = self.processes.get(uuid)
+        if process is not None:
+            try:
+                os.killpg(process.pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+        return "killed"
+
+    # === Outputs ===
+    def output_files(self, uuid: str) -> List[str]:
+        """ The output files of the impression, relative to the outputs """
+        outputs = self.outputs_dir(uuid)
+        files = []
+        for dirpath, _, filenames in os.walk(outputs, followlinks=True):
+            for f in filenames:
+                files.append(os.path.relpath(os.path.join(dirpath, f), outputs))
+        return sorted(files)
+
+    def get_file(self, uuid: str, filename: str) -> str:
+        """ The path of an output file, NOTFOUND if it does not exist """
+        path = os.path.join(self.outputs_dir(uuid), filename)
+        return path if os.path.exists(path) else "NOTFOUND"
+
+    def export(self, uuid: str, filename: str, output: str) -> None:
+        """ Copy an output file to output """
+        csys.copy(os.path.join(self.outputs_dir(uuid), filename), os.path.abspath(output))
@@ -0,0 +1,129 @@
+"""
+This module manages the local cache of the outputs of the impressions.
+
+The outputs of an impression are immutable, so once they are exported
+from DITE they can be reused by all the later workaround sessions.
+The cache lives in $HOME/.Chern/outputs/[uuid]/[filename], and the
+index ($HOME/.Chern/outputs/index.json) records the size and the last
+usage time of every cached impression.
+When the total size exceeds the capacity
+(``output_cache_size'' in $HOME/.Chern/config.json, in bytes),
+the least recently used impressions are evicted,
+except the ones still linked by a live staging area.
+"""
+import os
+import time
+from logging import getLogger
+from typing import Iterable, List, Optional
+
+from ..utils import csys
+from ..utils import metadata
+
+logger = getLogger("ChernLogger")
+
+DEFAULT_CAPACITY = 10 * 1024 ** 3
+
+
+class ChernOutputCache:
+    """ The cache of the impression outputs """
+    ins = None
+
+    def __init__(self):
+        self.cache_dir = os.path.join(csys.local_config_dir(), "outputs")
+        self.index = metadata.ConfigFile(os.path.join(self.cache_dir, "index.json"))
+
+    @classmethod
+    def instance(cls):
+        """ Singleton instance """
+        if cls.ins is None:
+            cls.ins = ChernOutputCache()
+        return cls.ins
+
+    def capacity(self) -> int:
+        """ The maximum size of the cache in bytes """
+        config_file = metadata.ConfigFile(csys.local_config_path())
+        return config_file.read_variable("output_cache_size", DEFAULT_CAPACITY)
+
+    def path(self, uuid: str) -> str:
+        """ The directory of the cached outputs of the impression """
+        return os.path.join(self.cache_dir, uuid)
+
+    def lookup(self, uuid: str) -> Optional[str]:
+        """ Return the cached directory of the impression outputs
+        and mark it as recently used, or None if it is not cached
+        """
+        entries = self.index.read_variable("entries", {})
+        if uuid not in entries or not os.path.isdir(self.path(uuid)):
+            return None
+        entries[uuid]["last_used"] = time.time()
+        self.index.write_variable("entries", entries)
+        return self.path(uuid)
+
+    def fetch(self, impression, cherncc, protected: Iterable[str] = ()) -> str:
+        """ Return the cached directory of the impression outputs,
+        collecting and exporting them from DITE on a cache miss
+        """
+        uuid = impression.uuid
+        cached = self.lookup(uuid)
+        if cached:
+            logger.debug("Output cache hit: %s", uuid)
+            return cached
+
+        logger.debug("Output cache miss: %s", uuid)
+        cherncc.collect(impression)
+        # Export to a temporary directory first,
+        # so that an interrupted download never looks complete
+        temp_dir = os.path.join(self.cache_dir, f".tmp_{uuid}_{os.getpid()}")
+        if os.path.isdir(temp_dir):
+            csys.rm_tree(temp_dir)
+        csys.mkdir(temp_dir)
+        for f in cherncc.output_files(impression):
+            output_path = os.path.join(temp_dir, f)
+            csys.mkdir(os.path.dirname(output_path))
+            cherncc.export(impression, f, output_path)
+        if os.path.isdir(self.path(uuid)):
+            csys.rm_tree(self.path(uuid))
+        os.rename(temp_dir, self.path(uuid))
+
+        entries = self.index.read_variable("entries", {})
+        entries[uuid] = {
+            "size": csys.tree_size(self.path(uuid)),
+            "last_used": time.time(),
+        }
+        self.index.write_variable("entries", entries)
+        self.evict(set(protected) | {uuid})
+        return self.path(uuid)
+
+    def evict(self, protected: Iterable[str] = ()) -> List[str]:
+        """ Evict the least recently used impressions
+        until the cache fits in the capacity
+        """
+        protected = set(protected)
+        entries = self.index.read_variable("entries", {})
+        total = sum(entry["size"] for entry in entries.values())
+        capacity = self.capacity()
+        evicted = []
+        for uuid in sorted(entries, key=lambda x: entries[x]["last_used"]):
+            if total <= capacity:
+                break
+            if uuid in protected:
+                continue
+            total -= entries[uuid]["size"]
+            if os.path.isdir(self.path(uuid)):
+                csys.rm_tree(self.path(uuid))
+            del entries[uuid]
+            evicted.append(uuid)
+        if evicted:
+            self.index.write_variable("entries", entries)
+            logger.info("Evicted %d impressions from the output cache", len(evicted))
+        return evicted
+
+    def size(self) -> int:
+        """ The total size of the cache in bytes """
+        entries = self.index.read_variable("entries", {})
+        return sum(entry["size"] for entry in entries.values())
+
+    def clear(self) -> None:
+        """ Remove all the cached outputs """
+        if os.path.isdir(self.cache_dir):
+            csys.rm_tree(self.cache_dir)
@@ -0,0 +1,197 @@
+"""
+This module identifies the impressions by their contents,
+so that the results of an impression can be reused by an identical one.
+
+The uuid of an impression is random, so the same analysis copied
+(copy_to) or set up in another project gets new uuids.
+The fingerprint of an impression is derived from what it runs:
+    the object type,
+    the md5 of the files of the contents (except chern.yaml),
+    the settings of chern.yaml, except the aliases and the memory limits,
+    the fingerprints of its dependencies (the inputs by alias)
+and is recorded in the config.json of the impression when it is first
+needed (see VImpression.compute_fingerprint).
+An impression has no fingerprint if one of its dependencies has none,
+or if it is a rawdata task whose data is not set.
+
+The result cache ($HOME/.Chern/results.json) records the finished
+impressions of every fingerprint, and where their outputs are:
+``local-exec'' (the local runner) or the url of the DITE.
+The finished impressions seen by the status queries are only noted
+in memory (``defer''), the fingerprints are computed and the index is
+written once, on submit or collect (``flush'').
+On submit, an impression whose fingerprint has a finished impression
+at the same place reuses its outputs instead of running:
+the impression records it as ``reused_from'', and ChernCommunicator
+answers the queries about it with the reused impression.
+"""
+import os
+import threading
+import time
+from logging import getLogger
+from typing import Dict, List, Optional, Tuple
+
+from ..utils import csys
+from ..utils import metadata
+
+logger = getLogger("ChernLogger")
+
+# Number of finished impressions kept for each fingerprint
+RESULTS_PER_FINGERPRINT = 4
+
+
+def reusable(dependencies: Dict[str, set], found: Dict[str, str]) -> Dict[str, str]:
+    """ The impressions that can reuse a result on a remote runner
+
+    A reused impression is not run, so it can only be reused if none of the
+    impressions depending on it runs (they would need its outputs there).
+
+    Args:
+        dependencies: the dependencies of each impression to run
+        found: the impressions with a result, {uuid: uuid of the result}
+    """
+    successors: Dict[str, List[str]] = {}
+    for uuid, deps in dependencies.items():
+        for dep in deps:
+            successors.setdefault(dep, []).append(uuid)
+    reused = dict(found)
+    changed = True
+    while changed:
+        changed = False
+        for uuid in list(reused):
+            if any(succ not in reused for succ in successors.get(uuid, [])):
+                del reused[uuid]
+                changed = True
+    return reused
+
+
+class ChernResultCache:
+    """ The finished impressions, by fingerprint """
+    ins = None
+
+    def __init__(self):
+        self.index = metadata.ConfigFile(
+            os.path.join(csys.local_config_dir(), "results.json"))
+        self.lock = threading.Lock()
+        # The (uuid, location) recorded in this process
+        self.recorded = set()
+        # The finished impressions to record, keyed by (uuid, location)
+        self.pending = {}
+
+    @classmethod
+    def instance(cls):
+        """ Singleton instance """
+        if cls.ins is None:
+            cls.ins = ChernResultCache()
+        return cls.ins
+
+    def record(self, impression, location: str) -> None:
+        """ Record that the impression finished at the location """
+        self.record_many([(impression, location)])
+
+    def defer(self, impression, location: str) -> None:
+        """ Note that the impression finished at the location,
+        it is recorded by the next flush
+        """
+        if (impression.uuid, location) not in self.recorded:
+            self.pending[(impression.uuid, location)] = impression
+
+    def flush(self) -> None:
+        """ Record the impressions noted by defer """
+        pending, self.pending = self.pending, {}
+        self.record_many([(impression, location)
+                          for (_, location), impression in pending.items()])
+
+    def record_many(self, finished: List[Tuple]) -> None:
+        """ Record the (impression, location) finished, in one write """
+        keys = []
+        for impression, location in finished:
+            if (impression.uuid, location) in self.recorded:
+                continue
+            self.recorded.add((impression.uuid, location))
+            if impression.config_file.read_variable("reused_from"):
+                continue
+            key = impression.fingerprint()
+            if key is not None:
+                keys.append((key, impression.uuid, location))
+        if not keys:
+            return
+        now = time.time()
+        with self.lock:
+            results = self.index.read_variable("results", {})
+            for key, uuid, location in keys:
+                entries = [entry for entry in results.get(key, [])
+                           if (entry["uuid"], entry["location"]) != (uuid, location)]
+                entries.append({"uuid": uuid, "location": location, "time": now})
+                results[key] = entries[-RESULTS_PER_FINGERPRINT:]
+            self.index.write_variable("results", results)
+
+    def lookup(self, impression, location: str) -> Optional[str]:
+        """ The uuid of the latest other impression with the same fingerprint
+        finished at the location, None if there is none
+        """
+        key = impression.fingerprint()
+        if key is None:
+            return None
+        for entry in reversed(self.index.read_variable("results", {}).get(key, [])):
+            if entry["location"] == location and entry["uuid"] != impression.uuid:
+                return entry["uuid"]
+        return None
+
+    def plan_reuse(self, impressions: Dict, dependencies: Dict[str, set],
+                   location: str) -> Tuple[Dict[str, str], List[str]]:
+        """ Find the impressions to submit that can reuse a result at the location
+
+        The reused impressions record their ``reused_from'', and the other
+        ones forget it. The dependencies of the impressions to run must have
+        their own outputs, so the ones reusing a result are run again.
+
+        Args:
+            impressions: the VImpressions to submit, keyed by uuid
+            dependencies: their dependencies, within the impressions
+
+        Returns:
+            (reused, revoked): the impressions reusing a result,
+            {uuid: uuid of the result}, and the dependencies to run again
+        """
+        self.flush()
+        found = {}
+        for uuid, impression in impressions.items():
+            source = self.lookup(impression, location)
+            if source is not None:
+                found[uuid] = source
+        reused = reusable(dependencies, found)
+        for uuid, impression in impressions.items():
+            if uuid in reused:
+                impression.config_file.write_variable("reused_from", reused[uuid])
+            elif impression.config_file.read_variable("reused_from"):
+                impression.config_file.write_variable("reused_from", "")
+
+        revoked = []
+        visited = set(impressions)
+        queue = [dep for uuid, impression in impressions.items() if uuid not in reused
+                 for dep in impression.pred_impressions()]
+        while queue:
+            impression = queue.pop()
+            if impression.uuid in visited:
+                continue
+            visited.add(impression.uuid)
+            if impression.config_file.read_variable("reused_from"):
+                impression.config_file.write_variable("reused_from", "")
+                revoked.append(impression.uuid)
+            queue.extend(impression.pred_impressions())
+        return reused, revoked
+
+    def forget(self, uuid: str, location: str) -> None:
+        """ Remove a result which is not available any more """
+        with self.lock:
+            results = self.index.read_variable("results", {})
+            for key, entries in list(results.items()):
+                entries = [entry for entry in entries
+                           if (entry["uuid"], entry["location"]) != (uuid, location)]
+                if entries:
+                    results[key] = entries
+                else:
+                    del results[key]
+            self.index.write_variable("results", results)
+        self.recorded.discard((uuid, location))
@@ -0,0 +1,222 @@
+"""
+This module plans the order in which the impressions are run.
+
+The impressions form a DAG (an impression depends on the impressions
+of its inputs and of its algorithm). Each impression has a cost:
+the typical runtime of its task, from the runtimes recorded in
+[project]/.chern/runtimes.json (the median of the last runs of the task,
+or the median of all the tasks when the task never ran, and no cost for an
+algorithm). The priority of an impression is the cost of the longest chain
+of impressions starting at it (critical path): with a limited number of
+slots (``runner_slots'' in $HOME/.Chern/config.json), starting the long
+chains first lets the whole DAG finish earlier.
+
+The runtimes are recorded by the local runner when an impression finishes,
+and for DITE from the submission time to the first ``finished'' job status
+seen, which is an upper bound of the runtime.
+"""
+import heapq
+import os
+import statistics
+import threading
+import time
+from typing import Dict, List, Optional, Set, Tuple
+
+from ..utils import csys
+from ..utils import metadata
+from ..utils.dag import dependency_index, unblock
+from .chern_cache import ChernCache
+
+CHERN_CACHE = ChernCache.instance()
+
+DEFAULT_SLOTS = 8
+DEFAULT_RUNTIME = 60.0
+# Number of runtimes kept for each task
+HISTORY_LENGTH = 10
+
+
+def critical_path(dependencies: Dict[str, Set[str]],
+                  costs: Dict[str, float]) -> Dict[str, float]:
+    """ The cost of the longest chain of impressions starting at each impression """
+    ready, waiting, successors = dependency_index(dependencies)
+    order = []
+    while ready:
+        uuid = ready.pop()
+        order.append(uuid)
+        ready.extend(unblock(waiting, successors, uuid))
+    lengths: Dict[str, float] = {}
+    for uuid in reversed(order):
+        lengths[uuid] = costs.get(uuid, 1.0) + max(
+            (lengths[succ] for succ in successors.get(uuid, [])), default=0.0)
+    return lengths
+
+
+def levels(dependencies: Dict[str, Set[str]]) -> Dict[str, int]:
+    """ The depth of each impression: 0 without dependencies,
+    otherwise one more than the deepest dependency
+    """
+    ready, waiting, successors = dependency_index(dependencies)
+    depth = {uuid: 0 for uuid in ready}
+    while ready:
+        uuid = ready.pop()
+        for succ in unblock(waiting, successors, uuid):
+            depth[succ] = 1 + max(depth[dep] for dep in dependencies[succ])
+            ready.append(succ)
+    return depth
+
+
+def simulate(dependencies: Dict[str, Set[str]], costs: Dict[str, float],
+             priorities: Dict[str, float], slots: int) -> Tuple[List[str], float]:
+    """ Run the DAG on ``slots'' slots, the ready impressions with the highest
+    priority first
+
+    Returns:
+        (order, makespan): the impressions in start order, and the end time
+    """
+    initial, waiting, successors = dependency_index(dependencies)
+    ready = [(-priorities[uuid], uuid) for uuid in initial]
+    heapq.heapify(ready)
+    running: List[Tuple[float, str]] = []
+    order = []
+    now = 0.0
+    while ready or running:
+        while ready and len(running) < max(slots, 1):
+            _, uuid = heapq.heappop(ready)
+            order.append(uuid)
+            heapq.heappush(running, (now + costs.get(uuid, 1.0), uuid))
+        now, uuid = heapq.heappop(running)
+        for succ in unblock(waiting, successors, uuid):
+            heapq.heappush(ready, (-priorities[succ], succ))
+    return order, now
+
+
+def runtime_history(project_path: str) -> 'RuntimeHistory':
+    """ The runtime history of the project, shared in the process """
+    table = CHERN_CACHE.runtime_history_table
+    if project_path not in table:
+        table[project_path] = RuntimeHistory(project_path)
+    return table[project_path]
+
+
+class RuntimeHistory:
+    """ The recorded runtimes of the tasks of a project """
+
+    def __init__(self, project_path: str):
+        self.config_file = metadata.ConfigFile(
+            os.path.join(project_path, ".chern", "runtimes.json"))
+        self.lock = threading.Lock()
+        # The impressions submitted to DITE and not seen finished yet
+        self.submitted: Dict[str, List] = self.config_file.read_variable("submitted", {})
+
+    def runtimes(self) -> Dict[str, List[float]]:
+        """ The runtimes of the tasks, keyed by invariant path """
+        return self.config_file.read_variable("tasks", {})
+
+    def record(self, path: str, seconds: float) -> None:
+        """ Record a runtime of the task """
+        with self.lock:
+            runtimes = self.runtimes()
+            runtimes[path] = (runtimes.get(path, []) + [seconds])[-HISTORY_LENGTH:]
+            self.config_file.write_variable("tasks", runtimes)
+
+    def estimates(self, paths: List[str]) -> Dict[str, float]:
+        """ The estimated runtimes of the tasks """
+        runtimes = self.runtimes()
+        known = [statistics.median(values) for values in runtimes.values() if values]
+        default = statistics.median(known) if known else DEFAULT_RUNTIME
+        return {path: statistics.median(runtimes[path]) if runtimes.get(path) else default
+                for path in paths}
+
+    def mark_submitted(self, impressions: Dict[str, str]) -> None:
+        """ Record the submission time of the impressions,
+        given as {uuid: invariant path of the task}
+        """
+        now = time.time()
+        with self.lock:
+            for uuid, path in impressions.items():
+                self.submitted[uuid] = [path, now]
+            self.config_file.write_variable("submitted", self.submitted)
+
+    def observe(self, uuid: str, status: str) -> None:
+        """ Record the runtime of a submitted impression seen finished """
+        if uuid not in self.submitted or status not in ("finished", "failed"):
+            return
+        with self.lock:
+            path, submitted = self.submitted.pop(uuid)
+            self.config_file.write_variable("submitted", self.submitted)
+        if status == "finished":
+            self.record(path, time.time() - submitted)
+
+
+class SubmissionPlan:  # pylint: disable=too-many-instance-attributes
+    """ The critical-path order of a set of impressions """
+
+    def __init__(self, impressions: List, slots: Optional[int] = None):
+        """ impressions: the VImpressions to run, of the same project """
+        self.impressions = {impression.uuid: impression for impression in impressions}
+        self.dependencies = {
+            uuid: {dep.uuid for dep in impression.pred_impressions()
+                   if dep.uuid in self.impressions}
+            for uuid, impression in self.impressions.items()
+        }
+        self.paths = {}
+        tasks = []
+        for uuid, impression in self.impressions.items():
+            self.paths[uuid] = impression.config_file.read_variable("current_path", "")
+            if impression.config_file.read_variable("object_type") != "algorithm":
+                tasks.append(uuid)
+        project_path = impressions[0].project_path if impressions else ""
+        self._schedule(project_path, tasks, slots)
+
+    @classmethod
+    def from_objects(cls, objects: List, project_path: str,
+                     slots: Optional[int] = None) -> 'SubmissionPlan':
+        """ The plan of the tasks and algorithms themselves, keyed by
+        invariant path, so nothing is impressed (for a dry run)
+        """
+        plan = cls.__new__(cls)
+        plan.impressions = {}
+        plan.paths = {obj.invariant_path(): obj.invariant_path() for obj in objects}
+        plan.dependencies = {
+            obj.invariant_path(): {pred.invariant_path() for pred in obj.predecessors()
+                                   if pred.invariant_path() in plan.paths}
+            for obj in objects
+        }
+        tasks = [obj.invariant_path() for obj in objects if obj.object_type() != "algorithm"]
+        plan._schedule(project_path, tasks, slots)  # pylint: disable=protected-access
+        return plan
+
+    def _schedule(self, project_path: str, tasks: List[str], slots: Optional[int]) -> None:
+        """ Estimate the costs and order the plan """
+        if slots is None:
+            slots = metadata.ConfigFile(csys.local_config_path()).read_variable(
+                "runner_slots", DEFAULT_SLOTS)
+        self.slots = slots
+        if tasks:
+            estimates = runtime_history(project_path).estimates(
+                [self.paths[key] for key in tasks])
+        else:
+            estimates = {}
+        self.costs = {key: 0.0 for key in self.dependencies}
+        self.costs.update({key: estimates[self.paths[key]] for key in tasks})
+        self.priorities = critical_path(self.dependencies, self.costs)
+        self.order, self.makespan = simulate(
+            self.dependencies, self.costs, self.priorities, self.slots)
+
+    def critical_path_length(self) -> float:
+        """ The cost of the longest chain, the makespan with unlimited slots """
+        return max(self.priorities.values(), default=0.0)
+
+    def waves(self) -> List[List[str]]:
+        """ The impressions by depth in the DAG, each wave in priority order """
+        depth = levels(self.dependencies)
+        waves: List[List[str]] = [[] for _ in range(max(depth.values(), default=-1) + 1)]
+        for uuid in sorted(depth, key=lambda x: -self.priorities[x]):
+            waves[depth[uuid]].append(uuid)
+        return waves
+
+    def report(self) -> str:
+        """ The predicted makespan """
+        return (f"Predicted makespan: {self.makespan:.0f} s on {self.slots} slots "
+                f"(critical path {self.critical_path_length():.0f} s, "
+                f"{len(self.dependencies)} impressions)")
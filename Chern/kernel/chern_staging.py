@@ -0,0 +1,162 @@
+"""
+This module manages the staging areas used by the workaround shell.
+
+A staging area is a temporary directory (/tmp/chernws_[uuid]) where the
+files of a task, its algorithm and the algorithm inputs are cloned.
+The files are cloned with reflink (copy-on-write) when the filesystem
+supports it and copied otherwise, so that entering a workaround shell
+does not duplicate big code or data.
+
+Every staging area is recorded in $HOME/.Chern/staging/[name].json with
+the pid of the owner and the manifest (size, mtime) of the staged files.
+The manifest is used to sync back only the files modified in the shell,
+and the owner pid is used to garbage-collect the abandoned areas.
+The record also lists the impressions whose cached outputs
+(see chern_output_cache) are linked into the area.
+"""
+import os
+import stat
+import time
+from logging import getLogger
+from typing import Dict, List
+
+from ..utils import csys
+from ..utils import metadata
+
+logger = getLogger("ChernLogger")
+
+WRITE_MODE = stat.S_IWUSR | stat.S_IWGRP | stat.S_IWOTH
+
+
+def _file_stat(path: str) -> List[int]:
+    """ The (size, mtime) signature of a file """
+    file_stat = os.stat(path)
+    return [file_stat.st_size, file_stat.st_mtime_ns]
+
+
+class ChernStaging:
+    """ The manager of the staging areas """
+    ins = None
+
+    def __init__(self):
+        self.registry_dir = os.path.join(csys.local_config_dir(), "staging")
+
+    @classmethod
+    def instance(cls):
+        """ Singleton instance """
+        if cls.ins is None:
+            cls.ins = ChernStaging()
+        return cls.ins
+
+    def record(self, area: str) -> metadata.ConfigFile:
+        """ The registry record of the staging area """
+        name = os.path.basename(os.path.normpath(area))
+        return metadata.ConfigFile(os.path.join(self.registry_dir, name + ".json"))
+
+    def create_area(self, prefix: str = "chernws_") -> str:
+        """ Create a new staging area owned by the current process """
+        area = csys.create_temp_dir(prefix=prefix)
+        record = self.record(area)
+        record.write_variable("path", area)
+        record.write_variable("pid", os.getpid())
+        record.write_variable("created", time.time())
+        record.write_variable("manifests", {})
+        record.write_variable("outputs", [])
+        return area
+
+    def stage_tree(self, area: str, src: str, dst: str = "",
+                   read_only: bool = False) -> Dict[str, int]:
+        """ Clone the files of ``src'' (excluding .chern) to ``area/dst''
+        and record their manifest.
+        The files staged ``read_only'' (never synced back) are made read only.
+        They are never hardlinked: a file edited in place in the shell
+        would change the file of the project.
+        Return the number of files for each clone method.
+        """
+        methods = {}
+        manifest = {}
+        for dirpath, _, filenames in csys.tree_excluded(src):
+            for f in filenames:
+                rel_path = os.path.normpath(os.path.join(dirpath, f))
+                dest_path = os.path.join(area, dst, rel_path)
+                method = csys.clone_file(os.path.join(src, rel_path), dest_path)
+                if read_only:
+                    os.chmod(dest_path, os.stat(dest_path).st_mode & ~WRITE_MODE)
+                methods[method] = methods.get(method, 0) + 1
+                manifest[rel_path] = _file_stat(dest_path)
+        record = self.record(area)
+        manifests = record.read_variable("manifests", {})
+        manifests[dst] = manifest
+        record.write_variable("manifests", manifests)
+        logger.debug("Staged %s to %s: %s", src, area, methods)
+        return methods
+
+    def pin_output(self, area: str, uuid: str) -> None:
+        """ Record that the area links the cached outputs of the impression,
+        so that they are not evicted while the area is alive
+        """
+        record = self.record(area)
+        outputs = record.read_variable("outputs", [])
+        if uuid not in outputs:
+            outputs.append(uuid)
+            record.write_variable("outputs", outputs)
+
+    def pinned_outputs(self) -> List[str]:
+        """ The impressions whose cached outputs are linked by an area """
+        pinned = set()
+        for area in self.areas():
+            pinned.update(self.record(area).read_variable("outputs", []))
+        return sorted(pinned)
+
+    def modified_files(self, area: str, dst: str = "") -> List[str]:
+        """ The staged files in ``area/dst'' modified since they were staged
+        """
+        manifest = self.record(area).read_variable("manifests", {}).get(dst, {})
+        modified = []
+        for rel_path, signature in manifest.items():
+            path = os.path.join(area, dst, rel_path)
+            if not os.path.isfile(path):
+                continue
+            if _file_stat(path) != signature:
+                modified.append(rel_path)
+        return sorted(modified)
+
+    def sync_back(self, area: str, dst: str, target: str) -> List[str]:
+        """ Copy the files modified in ``area/dst'' back to ``target''
+        """
+        modified = self.modified_files(area, dst)
+        for rel_path in modified:
+            csys.copy(os.path.join(area, dst, rel_path), os.path.join(target, rel_path))
+        return modified
+
+    def release(self, area: str) -> None:
+        """ Remove the staging area and its record """
+        if os.path.isdir(area):
+            csys.rm_tree(area)
+        record = self.record(area)
+        if os.path.exists(record.file_path):
+            os.remove(record.file_path)
+
+    def areas(self) -> List[str]:
+        """ All the registered staging areas """
+        if not os.path.isdir(self.registry_dir):
+            return []
+        areas = []
+        for name in sorted(os.listdir(self.registry_dir)):
+            if not name.endswith(".json"):
+                continue
+            record = metadata.ConfigFile(os.path.join(self.registry_dir, name))
+            areas.append(record.read_variable("path", ""))
+        return [area for area in areas if area]
+
+    def gc(self) -> List[str]:
+        """ Remove the staging areas whose owner is no longer running
+        """
+        removed = []
+        for area in self.areas():
+            pid = self.record(area).read_variable("pid", -1)
+            if os.path.isdir(area) and pid > 0 and csys.pid_alive(pid):
+                continue
+            self.release(area)
+            removed.append(area)
+        return removed
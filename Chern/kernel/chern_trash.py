@@ -0,0 +1,184 @@
+"""
+This module keeps the removed objects and files in the trash of the project,
+[project]/.chern/trash, and deletes them in the background.
+
+rm (and rm_file) only rename the objects or the files into a trash entry,
+[project]/.chern/trash/[entry]/items/[path], with an info.json recording
+the original paths and the time of the removal: the rename is atomic and
+immediate, whatever the size of the object. The files removed together
+(e.g. ``rm_file *'') share one entry.
+
+The entries are kept ``trash_retention'' seconds ($HOME/.Chern/config.json,
+one hour by default, 0 to delete at once) and can be restored until then.
+The expired entries are deleted in a daemon thread at the idle I/O priority,
+started by each removal (and by ``trash empty'').
+An entry is renamed to [entry].deleting before its deletion, so it is never
+restored half deleted, and a deletion interrupted by the end of the session
+is finished by the next one.
+"""
+import os
+import shutil
+import subprocess
+import threading
+import time
+import uuid
+from logging import getLogger
+from typing import Dict, List, Optional, Set
+
+from ..utils import csys
+from ..utils import metadata
+from ..utils.message import Message
+
+logger = getLogger("ChernLogger")
+
+DEFAULT_RETENTION = 3600
+DELETING_SUFFIX = ".deleting"
+
+# The deletion threads of the process, and the entries they delete
+_DELETERS: List[threading.Thread] = []
+_DELETING: Set[str] = set()
+_LOCK = threading.Lock()
+
+
+def _lower_priority() -> None:
+    """ Lower the CPU and I/O priority of the current thread (Linux) """
+    tid = threading.get_native_id()
+    try:
+        os.setpriority(os.PRIO_PROCESS, tid, 19)
+    except (AttributeError, OSError):
+        pass
+    if shutil.which("ionice"):
+        subprocess.run(["ionice", "-c", "3", "-p", str(tid)], check=False,
+                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+def _delete(paths: List[str]) -> None:
+    """ Delete the trash entries, in the deletion thread """
+    _lower_priority()
+    for path in paths:
+        shutil.rmtree(path, ignore_errors=True)
+        logger.debug("Deleted from the trash: %s", path)
+        with _LOCK:
+            _DELETING.discard(path)
+
+
+def wait_deletions(timeout: Optional[float] = None) -> None:
+    """ Wait for the background deletions of the process """
+    for thread in list(_DELETERS):
+        thread.join(timeout)
+        if not thread.is_alive():
+            _DELETERS.remove(thread)
+
+
+class ChernTrash:
+    """ The trash of a project """
+
+    def __init__(self, project_path: str):
+        self.project_path = project_path
+        self.trash_path = os.path.join(project_path, ".chern", "trash")
+        self.retention = metadata.ConfigFile(csys.local_config_path()).read_variable(
+            "trash_retention", DEFAULT_RETENTION)
+
+    def move(self, path: str) -> str:
+        """ Move the file or the object into the trash, return the entry """
+        return self.move_many([path])
+
+    def move_many(self, paths: List[str]) -> str:
+        """ Move the files or the objects into one trash entry,
+        and purge the expired entries once, return the entry
+        """
+        entry = f"{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:8]}"
+        entry_path = os.path.join(self.trash_path, entry)
+        relative_paths = [os.path.relpath(path, self.project_path) for path in paths]
+        csys.mkdir(entry_path)
+        metadata.ConfigFile(os.path.join(entry_path, "info.json")).write_variables({
+            "paths": relative_paths,
+            "time": time.time(),
+        })
+        for path, relative_path in zip(paths, relative_paths):
+            # The items keep their path relative to the project
+            destination = os.path.join(entry_path, "items", relative_path)
+            csys.mkdir(os.path.dirname(destination))
+            try:
+                os.rename(path, destination)
+            except OSError:
+                # Not on the filesystem of the project (e.g. a mount point)
+                shutil.move(path, destination)
+        self.purge()
+        return entry
+
+    def entries(self) -> List[Dict]:
+        """ The entries of the trash, the oldest first """
+        if not os.path.isdir(self.trash_path):
+            return []
+        entries = []
+        for entry in sorted(os.listdir(self.trash_path)):
+            if entry.endswith(DELETING_SUFFIX):
+                continue
+            info = metadata.ConfigFile(os.path.join(self.trash_path, entry, "info.json"))
+            entries.append({"entry": entry, "paths": info.read_variable("paths", []),
+                            "time": info.read_variable("time", 0.0)})
+        # The entries of the same second are ordered by the time of the removal
+        return sorted(entries, key=lambda entry: entry["time"])
+
+    def restore(self, name: str) -> Message:
+        """ Restore the entry, or the path from its latest entry, to its place """
+        message = Message()
+        name = name.rstrip("/")
+        with _LOCK:
+            found = [entry for entry in self.entries()
+                     if name == entry["entry"] or name in entry["paths"]]
+            if not found:
+                message.add(f"Not in the trash: {name}\n", "warning")
+                return message
+            entry = found[-1]
+            entry_path = os.path.join(self.trash_path, entry["entry"])
+            paths = entry["paths"] if name == entry["entry"] else [name]
+            restored = []
+            for path in paths:
+                destination = os.path.join(self.project_path, path)
+                if os.path.exists(destination):
+                    message.add(f"Unable to restore, {path} exists.\n", "warning")
+                    continue
+                csys.mkdir(os.path.dirname(destination))
+                os.rename(os.path.join(entry_path, "items", path), destination)
+                restored.append(path)
+            left = [path for path in entry["paths"] if path not in restored]
+            if left:
+                metadata.ConfigFile(os.path.join(entry_path, "info.json")).write_variable(
+                    "paths", left)
+            else:
+                shutil.rmtree(entry_path, ignore_errors=True)
+        for path in restored:
+            message.add(f"Restored {path}\n", "success")
+            if os.path.isdir(os.path.join(self.project_path, path, ".chern")):
+                message.add("The arcs to the objects outside were removed by rm, "
+                            "add them again if needed.\n", "normal")
+        return message
+
+    def purge(self, everything: bool = False) -> int:
+        """ Delete the expired entries (or all of them) in the background,
+        return the number of entries deleted
+        """
+        if not os.path.isdir(self.trash_path):
+            return 0
+        now = time.time()
+        paths = []
+        with _LOCK:
+            for entry in os.listdir(self.trash_path):
+                path = os.path.join(self.trash_path, entry)
+                if not entry.endswith(DELETING_SUFFIX):
+                    info = metadata.ConfigFile(os.path.join(path, "info.json"))
+                    if not everything and now - info.read_variable("time", 0.0) < self.retention:
+                        continue
+                    os.rename(path, path + DELETING_SUFFIX)
+                    path += DELETING_SUFFIX
+                # The deletions interrupted in a previous session are resumed
+                if path not in _DELETING:
+                    _DELETING.add(path)
+                    paths.append(path)
+        if paths:
+            thread = threading.Thread(target=_delete, args=(paths,), daemon=True)
+            thread.start()
+            _DELETERS.append(thread)
+        return len(paths)
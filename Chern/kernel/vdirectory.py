@@ -34,8 +34,6 @@ from ..utils import csys
 from ..utils import metadata
 from ..utils.message import Message
 from .vobject import VObject
-from .vtask import VTask
-from .valgorithm import VAlgorithm
 from . import helpme
 
 class VDirectory(VObject):
@@ -48,19 +46,6 @@ class VDirectory(VObject):
         message.add(helpme.directory_helpme.get(command, "No such command, try ``helpme'' alone."))
         return message
 
-    def deposit(self):
-        """ Deposit the contents of the directory
-            (apply deposit to the tasks/algorithms/subdirectories)
-        """
-        sub_objects = self.sub_objects()
-        for sub_object in sub_objects:
-            if sub_object.is_task():
-                VTask(sub_object.path).deposit()
-            elif sub_object.object_type() == "algorithm":
-                VAlgorithm(sub_object.path).deposit()
-            else:
-                VDirectory(sub_object.path).deposit()
-
 def create_directory(path):
     """ Create a directory
     """
@@ -1,29 +1,39 @@
 """ Helper class for impress operation
 """
-from os.path import join
+import hashlib
+import json
+from os.path import join, normpath
 from logging import getLogger
-from typing import Optional, List, TYPE_CHECKING, Any
+from typing import Optional, List, Dict, TYPE_CHECKING, Any
 
 from ..utils import csys
 from ..utils import metadata
+from .chern_impression_index import impression_index, tree_digest
 
 if TYPE_CHECKING:
     from .vobject import VObject
 
 logger = getLogger("ChernLogger")
 
+# The settings of chern.yaml that do not change the outputs
+_UNFINGERPRINTED_SETTINGS = ("alias", "memory_limit", "kubernetes_memory_limit")
+
 class VImpression():
     """ A class to represent an impression
     """
     uuid: Optional[str] = None
-    def __init__(self, uuid: Optional[str] = None) -> None:
+    def __init__(self, uuid: Optional[str] = None,
+                 project_path: Optional[str] = None) -> None:
         """ Initialize the impression
         """
         if uuid is None:
             self.uuid = csys.generate_uuid()
         else:
             self.uuid = uuid
-        self.path = csys.project_path() + "/.chern/impressions/" + self.uuid
+        if project_path is None:
+            project_path = csys.project_path()
+        self.project_path = project_path
+        self.path = project_path + "/.chern/impressions/" + self.uuid
         self.config_file = metadata.ConfigFile(self.path+"/config.json")
         self.tarfile = self.path + "/packed" + self.uuid + ".tar.gz"
 
@@ -67,15 +77,37 @@ class VImpression():
         """
         # FIXME: to be implemented
 
+    def index_entry(self) -> Dict[str, Any]:
+        """ Get the metadata of the impression from the impression index,
+        or from the config.json if the impression is not complete
+        """
+        entry = impression_index(self.project_path).get(self.uuid)
+        if entry is not None:
+            return entry
+        return {
+            "tree": self.config_file.read_variable("tree"),
+            "parents": self.config_file.read_variable("parents", []),
+            "dependencies": self.config_file.read_variable("dependencies", []),
+            "alias_to_impression": self.config_file.read_variable("alias_to_impression", {}),
+        }
+
     def tree(self) -> Any:
         """ Get the tree of the impression
         """
-        return self.config_file.read_variable("tree")
+        return self.index_entry()["tree"]
+
+    def tree_digest(self) -> str:
+        """ Get the digest of the sorted tree of the impression
+        """
+        entry = self.index_entry()
+        if "tree_digest" in entry:
+            return entry["tree_digest"]
+        return tree_digest(csys.sorted_tree(entry["tree"] or []))
 
     def parents(self) -> List[str]:
         """ Get the parents of the impression
         """
-        return self.config_file.read_variable("parents", [])
+        return list(self.index_entry()["parents"])
 
     def parent(self) -> Optional[str]:
         """ Get the parent of the impression
@@ -91,21 +123,66 @@ class VImpression():
         # FIXME An assumption is that all the predcessor's are impressed,
         # if they are not, we should impress them first
         # Need to add check to this
-        dependencies_uuid = self.config_file.read_variable("dependencies", [])
-        dependencies = [VImpression(uuid) for uuid in dependencies_uuid]
+        dependencies_uuid = self.index_entry()["dependencies"]
+        dependencies = [VImpression(uuid, self.project_path) for uuid in dependencies_uuid]
         return dependencies
 
     def has_alias(self, alias: str) -> bool:
         """ Check if the impression has an alias
         """
-        alias_to_imp = self.config_file.read_variable("alias_to_impression", {})
-        return alias in alias_to_imp
+        return alias in self.index_entry()["alias_to_impression"]
 
     def alias_to_impression_uuid(self, alias: str) -> str:
         """ Get the alias to impression mapping
         """
-        alias_to_imp = self.config_file.read_variable("alias_to_impression", {})
-        return alias_to_imp.get(alias, "")
+        return self.index_entry()["alias_to_impression"].get(alias, "")
+
+    def fingerprint(self) -> Optional[str]:
+        """ Get the content fingerprint of the impression, see chern_result_cache.
+        It is computed on first use (when a result is recorded or looked up),
+        not on impress, and kept in the config.
+        """
+        config = self.config_file.read_variables()
+        if "fingerprint" in config:
+            return config["fingerprint"]
+        if self.is_zombie():
+            return None
+        fingerprint = self.compute_fingerprint()
+        self.config_file.write_variable("fingerprint", fingerprint)
+        return fingerprint
+
+    def compute_fingerprint(self) -> Optional[str]:
+        """ Compute the content fingerprint from the contents, the settings
+        and the fingerprints of the dependencies
+        """
+        config = self.config_file.read_variables()
+        settings = metadata.YamlFile(self.path + "/contents/chern.yaml").read_variables()
+        for name in _UNFINGERPRINTED_SETTINGS:
+            settings.pop(name, None)
+        if settings.get("environment") == "rawdata" and not settings.get("uuid"):
+            return None
+
+        dependencies = {}
+        for uuid in config.get("dependencies", []):
+            dependencies[uuid] = VImpression(uuid, self.project_path).fingerprint()
+            if dependencies[uuid] is None:
+                return None
+        files = {}
+        for dirpath, _, filenames in config.get("tree", []):
+            for f in filenames:
+                if dirpath != "." or f != "chern.yaml":
+                    files[normpath(join(dirpath, f))] = csys.md5sum(
+                        f"{self.path}/contents/{dirpath}/{f}")
+        document = {
+            "object_type": config.get("object_type"),
+            "files": files,
+            "settings": settings,
+            "inputs": {alias: dependencies.get(uuid)
+                       for alias, uuid in config.get("alias_to_impression", {}).items()},
+            "dependencies": sorted(dependencies.values()),
+        }
+        return hashlib.sha256(
+            json.dumps(document, sort_keys=True, default=str).encode("utf-8")).hexdigest()
 
     def create(self, obj: 'VObject') -> None:
         """ Create this impression with a VObject file
@@ -145,4 +222,35 @@ class VImpression():
             if parent_impression.is_zombie():
                 parent_impression.clean()
         self.config_file.write_variable("parents", parents)
+        # The fingerprint is computed on first use, see fingerprint()
         self.pack()
+
+    def create_by_reference(self, source: 'VImpression', config: Dict[str, Any]) -> None:
+        """ Create this impression from the unchanged contents of ``source''
+
+        The contents and the packed file are immutable,
+        so they are cloned (reflink or hardlink when possible) instead of copied,
+        and the configuration (``config'' on top of the tree
+        and the object type of the source) is written at once.
+        """
+        for dirpath, _, filenames in source.tree():
+            for f in filenames:
+                csys.clone_file(f"{source.path}/contents/{dirpath}/{f}",
+                                f"{self.path}/contents/{dirpath}/{f}",
+                                allow_hardlink=True)
+        csys.mkdir(self.path+"/contents")
+        if csys.exists(source.tarfile):
+            csys.clone_file(source.tarfile, self.tarfile, allow_hardlink=True)
+        # The copies of the dependencies have the same fingerprints,
+        # so has the copy of the source (if it is already computed)
+        variables = {
+            "object_type": source.config_file.read_variable("object_type"),
+            "tree": source.tree(),
+        }
+        fingerprint = source.config_file.read_variable("fingerprint")
+        if fingerprint is not None:
+            variables["fingerprint"] = fingerprint
+        variables.update(config)
+        self.config_file.write_variables(variables)
+        if not csys.exists(self.tarfile):
+            self.pack()
@@ -2,8 +2,7 @@
 """
 import os
 import re
-from collections import defaultdict
-from itertools import combinations
+from collections import defaultdict, deque
 from logging import getLogger
 from os.path import join
 from time import time
@@ -11,13 +10,31 @@ from time import time
 import networkx as nx
 
 from ..utils import csys
+from ..utils import metadata
 from .vobj_core import Core
 from .chern_cache import ChernCache
+from .chern_doctor import ProjectDoctor
+from .chern_journal import ChernJournal
 
 CHERN_CACHE = ChernCache.instance()
 logger = getLogger("ChernLogger")
 
 
+def _update_successors(project_path, removed_successors, added_successors):
+    """ Remove and append the successors of the objects, one write for each
+    """
+    for path in set(removed_successors) | set(added_successors):
+        config_file = metadata.ConfigFile(
+            join(project_path, path, ".chern", "config.json")
+        )
+        successors = config_file.read_variable("successors", [])
+        for succ_path in removed_successors.get(path, []):
+            if succ_path in successors:
+                successors.remove(succ_path)
+        successors += added_successors.get(path, [])
+        config_file.write_variable("successors", successors)
+
+
 class ArcManagement(Core):
     """ The class for arc management of VObject
     """
@@ -40,6 +57,7 @@ class ArcManagement(Core):
         pred_str = self.config_file.read_variable("predecessors", [])
         pred_str.append(obj.invariant_path())
         self.config_file.write_variable("predecessors", pred_str)
+        self.invalidate_status()
 
     def remove_arc_from(self, obj, single=False):
         """
@@ -65,6 +83,7 @@ class ArcManagement(Core):
         pred_str = self.config_file.read_variable("predecessors", [])
         pred_str.remove(obj.invariant_path())
         self.config_file.write_variable("predecessors", pred_str)
+        self.invalidate_status()
 
     def add_arc_to(self, obj):
         """
@@ -84,6 +103,7 @@ class ArcManagement(Core):
         succ_str = self.config_file.read_variable("successors", [])
         succ_str.append(obj.invariant_path())
         self.config_file.write_variable("successors", succ_str)
+        obj.invalidate_status()
 
     def remove_arc_to(self, obj, single=False):
         """
@@ -109,6 +129,7 @@ class ArcManagement(Core):
         succ_str = self.config_file.read_variable("successors", [])
         succ_str.remove(obj.invariant_path())
         self.config_file.write_variable("successors", succ_str)
+        obj.invalidate_status()
 
     def successors(self):
         """ The successors of the current object
@@ -118,7 +139,7 @@ class ArcManagement(Core):
         successors = []
         project_path = self.project_path()
         for path in succ_str:
-            successors.append(self.get_vobject(f"{project_path}/{path}"))
+            successors.append(self.get_vobject(f"{project_path}/{path}", project_path))
         return successors
 
     def predecessors(self):
@@ -129,7 +150,7 @@ class ArcManagement(Core):
         predecessors = []
         project_path = self.project_path()
         for path in pred_str:
-            predecessors.append(self.get_vobject(f"{project_path}/{path}"))
+            predecessors.append(self.get_vobject(f"{project_path}/{path}", project_path))
         return predecessors
 
     def has_successor(self, obj): # UnitTest: DONE
@@ -176,79 +197,23 @@ class ArcManagement(Core):
         consult_table[self.path] = (time(), False)
         return False
 
-    def doctor(self):
-        """ Try to exam and fix the repository.
-        """
-        queue = self.sub_objects_recursively()
-        for obj in queue:
-            if not obj.is_task_or_algorithm():
-                continue
-
-            self.doctor_predecessor(obj)
-            self.doctor_successor(obj)
-            self.doctor_alias(obj)
-            self.doctor_path_to_alias(obj)
-
-    def doctor_predecessor(self, obj):
-        """ Doctor the predecessors of the object
-        """
-        for pred_object in obj.predecessors():
-            if pred_object.is_zombie() or \
-                    not pred_object.has_successor(obj):
-                print(f"The predecessor \n\t {pred_object} \n\t "
-                      f"does not exist or does not have a link "
-                      f"to object {obj}")
-                choice = input(
-                    "Would you like to remove the input or the algorithm? "
-                    "[Y/N]: "
-                )
-                if choice.upper() == "Y":
-                    obj.remove_arc_from(pred_object, single=True)
-                    obj.remove_alias(obj.path_to_alias(pred_object.path))
-                    obj.impress()
-
+    def doctor(self, fix=False):
+        """ Check the arcs and the aliases of the whole project in one pass
+        (see chern_doctor), and repair them in one batch if fix.
 
-    def doctor_successor(self, obj):
-        """ Doctor the successors of the object
-        """
-        for succ_object in obj.successors():
-            if succ_object.is_zombie() or \
-                    not succ_object.has_predecessor(obj):
-                print("The successor")
-                print(f"\t {succ_object}")
-                print(f"\t does not exist or does not have a link to object {obj}")
-                choice = input("Would you like to remove the output? [Y/N]")
-                if choice == "Y":
-                    obj.remove_arc_to(succ_object, single=True)
-
-    def doctor_alias(self, obj):
-        """ Doctor the alias of the object
+        Returns:
+            (message, left): the report, and the number of problems left
         """
-        for pred_object in obj.predecessors():
-            if obj.path_to_alias(pred_object.invariant_path()) == "" and \
-                    not pred_object.is_algorithm():
-                print(f"The input {pred_object} of {obj} does not have an alias, "
-                      f"it will be removed.")
-                choice = input(
-                    "Would you like to remove the input or the algorithm? [Y/N]: "
-                    )
-                if choice.upper() == "Y":
-                    obj.remove_arc_from(pred_object)
-                    obj.impress()
-
-    def doctor_path_to_alias(self, obj):
-        """ Doctor the alias of the object recursively
-        """
-        path_to_alias = obj.config_file.read_variable("path_to_alias", {})
-        for path in path_to_alias.keys():
-            project_path = self.project_path()
-            pred_obj = self.get_vobject(f"{project_path}/{path}")
-            if not obj.has_predecessor(pred_obj):
-                print("There seems to be a zombie alias to")
-                print(f"{pred_obj} in {obj}")
-                choice = input("Would you like to remove it? [Y/N]: ")
-                if choice.upper() == "Y":
-                    obj.remove_alias(obj.path_to_alias(path))
+        project_doctor = ProjectDoctor(self.project_path())
+        project_doctor.check()
+        message = project_doctor.report()
+        if fix and project_doctor.problems:
+            message.add(f"Repaired {project_doctor.fix()} objects, "
+                        "impress them again.\n", "success")
+            project_doctor.check()
+            if project_doctor.problems:
+                message.append(project_doctor.report())
+        return message, len(project_doctor.problems)
 
     def add_input(self, path, alias):
         """ add input
@@ -274,18 +239,117 @@ class ArcManagement(Core):
             print("The input already exists.")
             return
 
-        if self.has_alias(alias):
-            print("The alias already exists. "
-                  "The original input and alias will be replaced.")
-            project_path = self.project_path()
-            original_object = self.get_vobject(
-                join(project_path, self.alias_to_path(alias))
+        # The arcs, the aliases and chern.yaml are written in one transaction
+        with ChernJournal(self.project_path()).transaction():
+            if self.has_alias(alias):
+                print("The alias already exists. "
+                      "The original input and alias will be replaced.")
+                project_path = self.project_path()
+                original_object = self.get_vobject(
+                    join(project_path, self.alias_to_path(alias))
+                )
+                self.remove_arc_from(original_object)
+                self.remove_alias(alias)
+
+            self.add_arc_from(obj)
+            self.set_alias(alias, obj.invariant_path())
+
+    def descendants(self):
+        """ The invariant paths of this object and all its successors,
+        recursively
+        """
+        project_path = self.project_path()
+        visited = {self.invariant_path()}
+        queue = deque(visited)
+        while queue:
+            path = queue.popleft()
+            config_file = metadata.ConfigFile(
+                join(project_path, path, ".chern", "config.json")
             )
-            self.remove_arc_from(original_object)
-            self.remove_alias(alias)
+            for succ_path in config_file.read_variable("successors", []):
+                if succ_path not in visited:
+                    visited.add(succ_path)
+                    queue.append(succ_path)
+        return visited
+
+    # pylint: disable=too-many-locals,too-many-branches
+    def add_inputs(self, inputs):
+        """ Add several inputs [(path, alias), ...] at once
 
-        self.add_arc_from(obj)
-        self.set_alias(alias, obj.invariant_path())
+        All the new arcs are checked against the dependency graph in one pass,
+        the predecessors and aliases of this object are written once,
+        and the successors of each input are appended once.
+        The invalid inputs are reported and skipped.
+
+        Returns:
+            int: the number of inputs added
+        """
+        if not self.is_task_or_algorithm():
+            print(f"You are adding input to {self.object_type()} type object. "
+                  "The input is required to be a task or an algorithm.")
+            return 0
+
+        project_path = self.project_path()
+        self_path = self.invariant_path()
+        descendants = self.descendants()
+        predecessors = self.config_file.read_variable("predecessors", [])
+        path_to_alias = self.config_file.read_variable("path_to_alias", {})
+        alias_to_path = self.config_file.read_variable("alias_to_path", {})
+        yaml_file = metadata.YamlFile(join(self.path, "chern.yaml"))
+        yaml_alias = yaml_file.read_variable("alias", [])
+        # The successors to remove from and to append to each source
+        removed_successors = defaultdict(list)
+        added_successors = defaultdict(list)
+
+        for path, alias in inputs:
+            obj = self.get_vobject(path)
+            obj_path = obj.invariant_path()
+            if obj.object_type() != self.object_type():
+                print(f"You are adding {obj.object_type()} type object {obj_path} as"
+                      f" input. The input is required to be a {self.object_type()}.")
+                continue
+            if obj_path in descendants:
+                print(f"The object {obj_path} is already in the dependency diagram of "
+                      "the ``input'', which will cause a loop.")
+                continue
+            if obj_path in predecessors:
+                print(f"The input {obj_path} already exists.")
+                continue
+            if alias in alias_to_path:
+                print(f"The alias {alias} already exists. "
+                      "The original input and alias will be replaced.")
+                original_path = alias_to_path.pop(alias)
+                path_to_alias.pop(original_path, None)
+                if original_path in predecessors:
+                    predecessors.remove(original_path)
+                    if self_path in added_successors[original_path]:
+                        added_successors[original_path].remove(self_path)
+                    else:
+                        removed_successors[original_path].append(self_path)
+                if alias in yaml_alias:
+                    yaml_alias.remove(alias)
+
+            predecessors.append(obj_path)
+            added_successors[obj_path].append(self_path)
+            if alias != "" and obj_path not in path_to_alias:
+                path_to_alias[obj_path] = alias
+                alias_to_path[alias] = obj_path
+                if alias not in yaml_alias:
+                    yaml_alias.append(alias)
+
+        with ChernJournal(project_path).transaction():
+            self.config_file.write_variables({
+                "predecessors": predecessors,
+                "path_to_alias": path_to_alias,
+                "alias_to_path": alias_to_path,
+            })
+            yaml_file.write_variable("alias", yaml_alias)
+            _update_successors(project_path, removed_successors, added_successors)
+        # The statuses cached with the previous arcs are stale
+        self.invalidate_status()
+        for path in set(removed_successors) | set(added_successors):
+            self.get_vobject(join(project_path, path)).invalidate_status()
+        return sum(len(paths) for paths in added_successors.values())
 
     def remove_input(self, alias):
         """ Remove the input """
@@ -295,8 +359,9 @@ class ArcManagement(Core):
             return
         project_path = self.project_path()
         obj = self.get_vobject(join(project_path, path))
-        self.remove_arc_from(obj)
-        self.remove_alias(alias)
+        with ChernJournal(project_path).transaction():
+            self.remove_arc_from(obj)
+            self.remove_alias(alias)
 
     # def build_dependency_dag(self, exclude_algorithms=False):
     #     """
@@ -454,90 +519,54 @@ class ArcManagement(Core):
     # CORE METHOD: GRAPH CONSTRUCTION
     # ----------------------------------------------------------------------
 
-    # pylint: disable=too-many-locals,too-many-branches
     def build_dependency_dag(self, exclude_algorithms=False):
         """
         Builds a NetworkX DiGraph optimized for visualization.
+
+        The objects of the same directory are not linked to each other,
+        they are listed in graph.graph["clusters"] (directory -> nodes)
+        so that the drawing can group them in a subgraph.
         """
         graph = nx.DiGraph()
+        project_path = self.project_path()
 
-        # --- 1. Standard Graph Traversal (with Canonical Node Tracking) ---
+        # --- 1. Graph Traversal (Breadth-First, Canonical Node Tracking) ---
         sub_objects = self.sub_objects_recursively()
-        queue = [s for s in sub_objects if s.object_type() == "task"]
+        queue = deque(s for s in sub_objects if s.object_type() == "task")
 
         # Use visited as the canonical node registry (key=path, value=unique object instance)
         visited = {s.invariant_path(): s for s in queue}
-        for s in queue:
-            graph.add_node(s)
+        excluded = {path: False for path in visited}
+        graph.add_nodes_from(queue)
 
         while queue:
-            current_obj = queue.pop(0)
-
-            # Exclude algorithms logic (omitted for brevity)
-            if exclude_algorithms and current_obj.is_algorithm():
-                for pred_obj in current_obj.predecessors():
-                    pred_path = pred_obj.invariant_path()
-                    if pred_path not in visited:
-                        visited[pred_path] = pred_obj
-                        queue.append(pred_obj)
-                continue
-
-            for pred_obj in current_obj.predecessors():
-                pred_path = pred_obj.invariant_path()
-                is_excluded = exclude_algorithms and pred_obj.is_algorithm()
-
-                if pred_path not in visited:
+            current_obj = queue.popleft()
+            current_path = current_obj.invariant_path()
+            # The predecessors are read once for each node
+            for pred_path in current_obj.config_file.read_variable("predecessors", []):
+                pred_obj = visited.get(pred_path)
+                if pred_obj is None:
                     # Node instance is new; register it and add to queue
+                    pred_obj = self.get_vobject(join(project_path, pred_path), project_path)
                     visited[pred_path] = pred_obj
+                    excluded[pred_path] = exclude_algorithms and pred_obj.is_algorithm()
                     queue.append(pred_obj)
-                else:
-                    # Use the existing, canonical object instance for this path
-                    pred_obj = visited[pred_path]
-
-                if not is_excluded:
-                    if pred_obj not in graph:
-                        graph.add_node(pred_obj)
-
-                    # Add standard dependency (weight=1)
-                    graph.add_edge(pred_obj, current_obj, weight=1.0, type='dependency')
+                if excluded[current_path] or excluded[pred_path]:
+                    continue
+                # Add standard dependency (weight=1)
+                graph.add_edge(pred_obj, current_obj, weight=1.0, type='dependency')
 
         # --- 1.5. NODE AGGREGATION ---
         graph = self._aggregate_sequential_nodes(graph)
 
-        # --- 2. Calculate Spatial Weights (Clustering) ---
-        dir_groups = defaultdict(list)
+        # --- 2. Directory Clusters ---
+        clusters = defaultdict(list)
         for node in graph.nodes():
-            p = getattr(node, 'path', None)
-            if not p:
-                if hasattr(node, 'invariant_path'):
-                    p = node.invariant_path()
-                else:
-                    p = str(node)
-
-            # Handle Aggregated Node path retrieval
-            if isinstance(p, str) and p.startswith("AGGREGATE:"):
-                if graph.nodes[node].get('aggregated_path'):
-                    agg_path = graph.nodes[node]['aggregated_path']
-                    dir_groups[os.path.dirname(agg_path)].append(node)
-                continue
-
-            if p:
-                dir_groups[os.path.dirname(p)].append(node)
-
-        # Create 'sibling' cliques for clustering
-        for siblings in dir_groups.values():
-            if len(siblings) < 2:
-                continue
-            for node_u, node_v in combinations(siblings, 2):
-                if graph.has_edge(node_u, node_v):
-                    # Reinforce existing dependency
-                    graph[node_u][node_v]['weight'] = 10.0
-                elif graph.has_edge(node_v, node_u):
-                    # Reinforce existing dependency
-                    graph[node_v][node_u]['weight'] = 10.0
-                else:
-                    # Add high-weight 'sibling' edge for layout clustering
-                    graph.add_edge(node_u, node_v, weight=10.0,
-                                   type='sibling', style='dashed')
-
+            if graph.nodes[node].get('node_type') == 'aggregate':
+                clusters[os.path.dirname(graph.nodes[node]['aggregated_path'])].append(node)
+            else:
+                clusters[os.path.dirname(node.invariant_path())].append(node)
+        graph.graph["clusters"] = {
+            directory: nodes for directory, nodes in clusters.items() if len(nodes) > 1
+        }
         return graph
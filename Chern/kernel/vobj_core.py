@@ -8,7 +8,7 @@ import os
 from abc import ABC, abstractmethod
 from logging import getLogger
 from subprocess import Popen
-from typing import TYPE_CHECKING, Optional
+from typing import TYPE_CHECKING, Dict, Optional
 
 
 from ..utils import csys
@@ -133,6 +133,19 @@ class Core(ABC):
     def job_status(self, consult_id = None, runner: Optional[str] = None) -> str:
         """ Abstract method for future implementation"""
 
+    @abstractmethod
+    def status_tree(self) -> Dict[str, str]:
+        """ Abstract method for future implementation"""
+
+    @abstractmethod
+    def invalidate_status(self) -> None:
+        """ Abstract method for future implementation"""
+
+    @abstractmethod
+    def job_status_tree(self, consult_id = None,
+                        runner: Optional[str] = None) -> Dict[str, str]:
+        """ Abstract method for future implementation"""
+
     @abstractmethod
     def import_file(self, path: str) -> None:
         """ Abstract method for future implementation"""
@@ -1,17 +1,23 @@
 """ This module provides the ExecutionManagement class.
 """
+import os
 import time
 from logging import getLogger
-from typing import Optional, TYPE_CHECKING
+from typing import Dict, List, Optional, TYPE_CHECKING
 
 from ..utils.message import Message
 from .chern_communicator import ChernCommunicator
+from .chern_deposit import DepositPlanner
+from .chern_local_runner import LOCAL_EXEC_RUNNER, LocalRunner
+from .chern_result_cache import ChernResultCache
+from .chern_schedule import SubmissionPlan, runtime_history
 from .vobj_core import Core
 from .chern_cache import ChernCache
 
+from .vimpression import VImpression
+
 if TYPE_CHECKING:
     from .vobject import VObject
-    from .vimpression import VImpression
 
 
 CHERN_CACHE = ChernCache.instance()
@@ -42,43 +48,84 @@ class ExecutionManagement(Core):
             return []
         return [impression.uuid]
 
-    def submit(self, runner: str = "local") -> Message:
-        """ Submit the impression to the runner. """
+    def submit(self, runner: str = "local", progress=None, *,
+               waves: bool = False, dry_run: bool = False) -> Message:
+        """ Submit the impression to the runner.
+
+        The impressions are sent in critical-path priority order,
+        see chern_schedule, and with ``waves'' one request per depth
+        of the DAG. The predicted makespan is reported first,
+        and with ``dry_run'' nothing is impressed nor submitted: the plan
+        covers the objects and their predecessors not impressed yet.
+        The impressions identical to one finished on the DITE reuse it,
+        see chern_result_cache.
+        """
+        if runner == LOCAL_EXEC_RUNNER and not dry_run:
+            return self.submit_local()
         cherncc = ChernCommunicator.instance()
         # Check the connection
-        dite_status = cherncc.dite_status()
-        if dite_status != "connected":
+        if not dry_run and cherncc.dite_status() != "connected":
             msg = Message()
             msg.add("DITE is not connected. Please check the connection.", "warning")
             # logger.error(msg)
             return msg
-        self.deposit()
+        if dry_run:
+            # Planned on the objects, nothing is impressed
+            plan = SubmissionPlan.from_objects(
+                DepositPlanner([self], None).closure(new_only=True), self.project_path())
+            msg = Message()
+            msg.add(plan.report() + "\n", "info")
+            for key in plan.order:
+                msg.add(f"  {plan.paths[key]} [{plan.costs[key]:.0f} s]\n")
+            return msg
+        self.deposit(progress)
+        plan = SubmissionPlan([VImpression(uuid, self.project_path())
+                               for uuid in self.get_impressions()])
+        msg = Message()
+        msg.add(plan.report() + "\n", "info")
+        reused, revoked = ChernResultCache.instance().plan_reuse(
+            plan.impressions, plan.dependencies, cherncc.serverurl())
+        if reused:
+            msg.add(f"{len(reused)} impressions reuse the results of "
+                    f"identical impressions.\n", "info")
+        submitted = []
+        for wave in [revoked] + (plan.waves() if waves else [plan.order]):
+            wave = [uuid for uuid in wave if uuid not in reused]
+            if wave:
+                cherncc.execute(wave, runner)
+                submitted.extend(wave)
+        runtime_history(self.project_path()).mark_submitted(
+            {uuid: VImpression(uuid, self.project_path()).config_file.read_variable(
+                "current_path", "") for uuid in submitted})
+        msg.add(f"Impressions {submitted} submitted to {runner}.", "info")
+        return msg
+
+    def submit_local(self, wait: bool = False) -> Message:
+        """ Run the impressions on this machine, see chern_local_runner. """
+        DepositPlanner([self], None).impress()
         impressions = self.get_impressions()
-        cherncc.execute(impressions, runner)
+        local_runner = LocalRunner.instance()
+        to_run, reused = local_runner.execute(
+            [VImpression(uuid, self.project_path()) for uuid in impressions], wait)
         msg = Message()
-        msg.add(f"Impressions {impressions} submitted to {runner}.", "info")
+        msg.add(f"Impressions {impressions} submitted to {LOCAL_EXEC_RUNNER}: "
+                f"{len(to_run)} to run on {local_runner.max_workers} workers, "
+                f"{len(reused)} reusing finished identical impressions.", "info")
         return msg
 
     def resubmit(self, runner: str = "local") -> None:
         """ Resubmit the impression to the runner. """
         # FIXME: incomplete
 
-    def deposit(self) -> None:
-        """ Deposit the impression to the dite. """
-        if not self.is_task_or_algorithm():
-            sub_objects = self.sub_objects()
-            for sub_object in sub_objects:
-                sub_object.deposit()
-            return
+    def deposit(self, progress=None) -> List[str]:
+        """ Deposit the impression to the dite.
 
+        The impressions of the object, its sub objects and all their
+        predecessors are checked in one batch and the missing ones are
+        uploaded concurrently, see DepositPlanner.
+        """
         cherncc = ChernCommunicator.instance()
-        if self.is_deposited():
-            return
-        if not self.is_impressed_fast():
-            self.impress()
-        for obj in self.predecessors():
-            obj.deposit()
-        cherncc.deposit(self.impression())
+        return DepositPlanner([self], cherncc).run(progress)
 
     def is_deposited(self) -> bool:
         """ Judge whether deposited or not. Return a True or False. """
@@ -87,6 +134,40 @@ class ExecutionManagement(Core):
         cherncc = ChernCommunicator.instance()
         return cherncc.is_deposited(self.impression()) == "TRUE"
 
+    def job_status_tree(self, consult_id = None,
+                        runner: Optional[str] = None) -> Dict[str, str]:
+        """ The job status of this object and all its sub objects
+
+        The status of each task is consulted once, and the status of
+        the directories is aggregated bottom-up (post-order):
+        failed if any task failed, pending if any task is not finished,
+        finished otherwise.
+        """
+        if consult_id is None:
+            consult_id = time.time()
+        consult_table = CHERN_CACHE.job_status_consult_table
+        statuses = {}
+        queue = self.sub_objects_recursively()
+        for obj in queue:
+            if not obj.is_task_or_algorithm():
+                statuses[obj.path] = "finished"
+        for obj in reversed(queue):
+            if obj.object_type() == "algorithm":
+                continue
+            if obj.is_task_or_algorithm():
+                statuses[obj.path] = obj.job_status(consult_id, runner)
+            else:
+                consult_table[obj.path] = (consult_id, statuses[obj.path])
+            if obj is self:
+                continue
+            parent_path = os.path.dirname(obj.path)
+            status = statuses[obj.path]
+            if status == "failed" or statuses[parent_path] == "failed":
+                statuses[parent_path] = "failed"
+            elif status not in ("finished", "archived"):
+                statuses[parent_path] = "pending"
+        return statuses
+
     def job_status(self, consult_id = None, runner: Optional[str] = None) -> str:
         """ Get the status of the job"""
         consult_table = CHERN_CACHE.job_status_consult_table
@@ -96,30 +177,20 @@ class ExecutionManagement(Core):
                 return status
 
         if consult_id is None:
-            consult_id = time
+            consult_id = time.time()
 
         if not self.is_task_or_algorithm():
-            sub_objects = self.sub_objects()
-            pending = False
-            for sub_object in sub_objects:
-                if sub_object.object_type() == "algorithm":
-                    continue
-                status = sub_object.job_status(consult_id, runner)
-                if status == "failed":
-                    consult_table[self.path] = (consult_id, "failed")
-                    return "failed"
-                if status not in ("finished", "archived"):
-                    pending = True
-            if pending:
-                consult_table[self.path] = (consult_id, "pending")
-                return "pending"
-            consult_table[self.path] = (consult_id, "finished")
-            return "finished"
+            return self.job_status_tree(consult_id, runner)[self.path]
         cherncc = ChernCommunicator.instance()
+        impression = self.impression()
         if runner is None:
-            job_status = cherncc.job_status(self.impression())
-            consult_table[self.path] = (consult_id, job_status)
-            return job_status
-        job_status = cherncc.job_status(self.impression(), runner)
+            job_status = cherncc.job_status(impression)
+        else:
+            job_status = cherncc.job_status(impression, runner)
         consult_table[self.path] = (consult_id, job_status)
+        if impression is not None:
+            runtime_history(self.project_path()).observe(impression.uuid, job_status)
+        if job_status == "finished" and cherncc.local_run(impression) is None:
+            # Recorded in one batch on submit or collect
+            ChernResultCache.instance().defer(impression, cherncc.serverurl())
         return job_status
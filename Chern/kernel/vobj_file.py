@@ -1,5 +1,6 @@
 """ This module is used to manage the file system of the VObject
 """
+import json
 import os
 import time
 from os.path import join
@@ -7,7 +8,7 @@ from os.path import normpath
 import shutil
 from dataclasses import dataclass
 from logging import getLogger
-from typing import TYPE_CHECKING, Tuple, List
+from typing import TYPE_CHECKING, Dict, Tuple, List
 
 from ..utils import csys
 from ..utils.message import Message
@@ -15,6 +16,10 @@ from ..utils import metadata
 from .vobj_core import Core
 from .chern_cache import ChernCache
 from .chern_communicator import ChernCommunicator
+from .chern_import import BulkImport
+from .chern_journal import ChernJournal
+from .chern_trash import ChernTrash
+from .vimpression import VImpression
 
 if TYPE_CHECKING:
     from .vobject import VObject
@@ -22,6 +27,9 @@ if TYPE_CHECKING:
 CHERN_CACHE = ChernCache.instance()
 logger = getLogger("ChernLogger")
 
+# The modifications closer than this to a scan are rescanned
+LISTING_RACY_NS = 1_000_000_000
+
 # from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
 # === at top of your file ===
 # def _check_sub_status(sub):
@@ -42,7 +50,7 @@ class LsParameters:
     status: bool = False
     successors: bool = False
 
-class FileManagement(Core):
+class FileManagement(Core): # pylint: disable=too-many-public-methods
     """ This class is used to manage the file system of the VObject
     """
     def ls(self, show_info: 'LsParameters' = LsParameters()) -> Message:
@@ -110,7 +118,8 @@ class FileManagement(Core):
                 message.add("\n")
                 return message
         else:
-            if self.status() == "impressed":
+            statuses = self.status_tree()
+            if statuses[self.path] == "impressed":
                 message.add("All the subobjects are ")
                 message.add("[impressed]", 'success')
                 message.add(".\n")
@@ -118,27 +127,11 @@ class FileManagement(Core):
                 message.add("Some subobjects are ")
                 message.add("[not impressed]", 'normal')
                 message.add(".\n")
-                # ---- Testing the parallelization speedup ----
-                # Parallelized subobject status checks
-
-                sub_objects = self.sub_objects()
-
-                # Parallel check of subobject statuses (CPU-bound)
-                # with ProcessPoolExecutor(max_workers=8) as executor:
-                #     futures = [executor.submit(_check_sub_status, sub) for sub in sub_objects]
-                #     for fut in as_completed(futures):
-                #         name, sub_status = fut.result()
-                #         if sub_status == "new":
-                #             message.add(f"Subobject {name} is [not impressed]\n", "normal")
-                # ----------------------------------------------
-
-                # ---- Original serial subobject status checks ----
-                for sub_object in sub_objects:
-                    if sub_object.status() == "new":
+                for sub_object in self.sub_objects():
+                    if statuses[sub_object.path] == "new":
                         message.add(f"Subobject {sub_object} is ")
                         message.add("[not impressed]", 'normal')
                         message.add("\n")
-                # -------------------------------------------------
                 return message
 
         cherncc = ChernCommunicator.instance()
@@ -159,15 +152,15 @@ class FileManagement(Core):
                 message.add("Impression not deposited in DITE\n")
                 return message
 
-        now = time.time()
         if not self.is_task_or_algorithm():
-            job_status = self.job_status(now)
+            job_statuses = self.job_status_tree()
+            job_status = job_statuses[self.path]
             message.add(f"{'Job status':<10}: ")
             message.add(f"{'['+job_status+']'}")
             message.add("\n---------------\n")
             objects = []
             for sub_object in self.sub_objects():
-                objects.append((str(sub_object), sub_object.job_status(now)))
+                objects.append((str(sub_object), job_statuses.get(sub_object.path, "")))
 
             max_width = 0
             if objects:
@@ -196,23 +189,28 @@ class FileManagement(Core):
     def show_sub_objects(self, sub_objects: List['VObject'], show_info: LsParameters) -> Message:
         """ Show the sub_objects"""
         message = Message()
-        sub_objects = self.sub_objects()
-        sub_objects.sort(key=lambda x: (x.object_type(), x.path))
+        object_types = dict(self.listing_snapshot())
+        sub_objects = sorted(
+            sub_objects,
+            key=lambda x: (object_types.get(os.path.basename(x.path), ""), x.path)
+        )
         if sub_objects:
             message.add(">>>> Subobjects:\n", "title0")
 
+        # The statuses of the sub objects come from the cached status tree
+        statuses = self.status_tree() if show_info.status and sub_objects else {}
         for index, sub_object in enumerate(sub_objects):
             sub_path = self.relative_path(sub_object.path)
+            object_type = object_types.get(os.path.basename(sub_object.path), "")
             if show_info.status:
-                # FIXME
-                status = "[FIXME]"
+                status = statuses.get(sub_object.path) or sub_object.status()
                 color_tag = self.color_tag(status)
-                message.add(f"[{index}] {f'({sub_object.object_type()})':<12} "
+                message.add(f"[{index}] {f'({object_type})':<12} "
                             f"{sub_path:>20} ")
                 message.add(f"({status})", color_tag)
                 message.add("\n")
             else:
-                message.add(f"[{index}] {f'({sub_object.object_type()})':<12} {sub_path:>20}\n")
+                message.add(f"[{index}] {f'({object_type})':<12} {sub_path:>20}\n")
         return message
 
     def show_predecessors(self, predecessors: List['VObject'], total: int) -> Message:
@@ -292,52 +290,164 @@ class FileManagement(Core):
 
         return True, ""
 
-    def copy_to_deal_with_arcs(self, queue: List['VObject'], new_path: str) -> None:
-        """ Deal with the arcs when copying
+    def copy_to_plan_arcs(self, queue: List['VObject'],
+                          new_path: str) -> Tuple[Dict[str, dict], Dict[str, List[str]]]:
+        """ Plan the arcs and the aliases of the copied objects in memory
+
+        Returns:
+            Tuple[dict, dict]: (the flow variables of each new object,
+            the successors to append to each outside predecessor),
+            both keyed by invariant path
         """
+        project_path = self.project_path()
+
+        def new_invariant_path(path):
+            norm_path = normpath(join(new_path, self.relative_path(path)))
+            return os.path.relpath(norm_path, project_path)
+
+        plan = {}
         for obj in queue:
-            # Calculate the absolute path of the new directory
-            norm_path = normpath(
-                join(new_path, self.relative_path(obj.path))
-            )
-            new_object = self.get_vobject(norm_path, self.project_path())
-            new_object.clean_flow()
-            new_object.clean_impressions()
+            plan[new_invariant_path(obj.path)] = {
+                "predecessors": [], "successors": [],
+                "path_to_alias": {}, "alias_to_path": {},
+            }
 
+        outside_successors = {}
         for obj in queue:
-            # Calculate the absolute path of the new directory
-            norm_path = normpath(
-                join(new_path, self.relative_path(obj.path))
-            )
-            new_object = self.get_vobject(norm_path, self.project_path())
-            for pred_object in obj.predecessors():
-                # if in the outside directory
-                if self.relative_path(pred_object.path).startswith(".."):
+            new_invariant = new_invariant_path(obj.path)
+            variables = plan[new_invariant]
+            path_to_alias = obj.config_file.read_variable("path_to_alias", {})
+            for pred_path in obj.config_file.read_variable("predecessors", []):
+                pred_abspath = join(project_path, pred_path)
+                if self.relative_path(pred_abspath).startswith(".."):
+                    # if in the outside directory
                     # FIXME: link the outside object, make it optional?
-                    new_object.add_arc_from(pred_object)
-                    alias = obj.path_to_alias(pred_object.invariant_path())
-                    new_object.set_alias(alias, pred_object.invariant_path())
+                    target = pred_path
+                    outside_successors.setdefault(pred_path, []).append(new_invariant)
                 else:
                     # if in the same tree
-                    relative_path = self.relative_path(pred_object.path)
-                    new_object.add_arc_from(self.get_vobject(
-                        join(new_path, relative_path), self.project_path())
-                    )
-                    alias1 = obj.path_to_alias(pred_object.invariant_path())
-                    norm_path = normpath(
-                        join(new_path, relative_path)
-                    )
-                    new_object.set_alias(
-                        alias1,
-                        self.get_vobject(norm_path, self.project_path()).invariant_path()
-                    )
+                    target = new_invariant_path(pred_abspath)
+                    if target in plan:
+                        plan[target]["successors"].append(new_invariant)
+                variables["predecessors"].append(target)
+                alias = path_to_alias.get(pred_path, "")
+                if alias == "" or alias in variables["alias_to_path"] \
+                        or target in variables["path_to_alias"]:
+                    continue
+                variables["path_to_alias"][target] = alias
+                variables["alias_to_path"][alias] = target
+        return plan, outside_successors
 
-            for succ_object in obj.successors():
-                if self.relative_path(succ_object.path).startswith(".."):
-                    pass
+    def copy_to_plan_impressions(self, queue: List['VObject'], new_path: str,
+                                 plan: Dict[str, dict]) -> Dict[str, tuple]:
+        """ Plan the impressions of the copied objects
+
+        The new impressions reuse the contents of the source impressions,
+        the uuids are generated in advance so that
+        each new config is written only once.
+
+        Returns:
+            dict: (source impression, new impression) keyed by invariant path
+        """
+        project_path = self.project_path()
+        impressions = {}
+        for obj in queue:
+            if not obj.is_task_or_algorithm():
+                continue
+            norm_path = normpath(join(new_path, self.relative_path(obj.path)))
+            new_invariant = os.path.relpath(norm_path, project_path)
+            plan[new_invariant].update({
+                "impressions": [], "impression": "",
+                "output_md5s": {}, "output_md5": "",
+            })
+            source = obj.impression()
+            if source is None or source.is_zombie():
+                continue
+            impression = VImpression(project_path=project_path)
+            plan[new_invariant]["impression"] = impression.uuid
+            impressions[new_invariant] = (source, impression)
+        return impressions
+
+    def copy_to_write_configs(self, plan: Dict[str, dict],
+                              outside_successors: Dict[str, List[str]]) -> None:
+        """ Write the planned configs, once for each object
+        """
+        project_path = self.project_path()
+        for invariant_path, variables in plan.items():
+            config_file = metadata.ConfigFile(
+                join(project_path, invariant_path, ".chern/config.json")
+            )
+            config_file.write_variables(variables)
+
+        for invariant_path, successors in outside_successors.items():
+            config_file = metadata.ConfigFile(
+                join(project_path, invariant_path, ".chern/config.json")
+            )
+            succ_str = config_file.read_variable("successors", [])
+            config_file.write_variables({"successors": succ_str + successors})
+
+    def copy_to_create_impressions(self, plan: Dict[str, dict],
+                                   impressions: Dict[str, tuple]) -> None:
+        """ Create the planned impressions of the copied objects,
+        in topological order: the objects without a valid source impression
+        are impressed before the impressions depending on them
+        """
+        project_path = self.project_path()
+
+        def impression_uuid(invariant_path):
+            if invariant_path in plan:
+                return plan[invariant_path].get("impression", "")
+            config_file = metadata.ConfigFile(
+                join(project_path, invariant_path, ".chern/config.json")
+            )
+            return config_file.read_variable("impression", "")
+
+        # The predecessors first, so that every dependency has its uuid
+        order: List[str] = []
+        visited = set()
+
+        def visit(invariant_path):
+            if invariant_path in visited:
+                return
+            visited.add(invariant_path)
+            for pred_path in plan[invariant_path]["predecessors"]:
+                if "impression" in plan.get(pred_path, {}):
+                    visit(pred_path)
+            order.append(invariant_path)
+
+        for invariant_path, variables in plan.items():
+            if "impression" in variables:
+                visit(invariant_path)
+
+        for invariant_path in order:
+            variables = plan[invariant_path]
+            if invariant_path not in impressions:
+                # Without a valid source impression, impressed as usual
+                obj = self.get_vobject(join(project_path, invariant_path), project_path)
+                obj.impress()
+                variables["impression"] = obj.config_file.read_variable("impression", "")
+                continue
+            source, impression = impressions[invariant_path]
+            dependencies = {path: impression_uuid(path) for path in variables["predecessors"]}
+            missing = [path for path, uuid in dependencies.items() if uuid == ""]
+            if missing:
+                raise ValueError(f"{invariant_path}: the inputs {missing} are not impressed")
+            impression.create_by_reference(source, {
+                "dependencies": sorted(dependencies.values()),
+                "current_path": invariant_path,
+                "alias_to_impression": {
+                    alias: dependencies[path]
+                    for alias, path in variables["alias_to_path"].items()
+                },
+                "parents": [],
+            })
 
     def copy_to(self, new_path: str) -> Message: # UnitTest: DONE
         """ Copy the current objects and its containings to a new path.
+
+        The arcs, aliases and impressions of the copied objects are planned
+        in memory, so that each new config is written only once,
+        and the new impressions are created from the source impressions.
         """
         is_valid, error_message = self.copy_to_check(new_path)
         if not is_valid:
@@ -353,88 +463,77 @@ class FileManagement(Core):
             if not obj.is_impressed_fast():
                 obj.impress()
 
-        shutil.copytree(self.path, new_path)
-
-        self.copy_to_deal_with_arcs(queue, new_path)
+        shutil.copytree(self.path, new_path, copy_function=csys.clone_file)
 
-         # Deal with the impression
-        for obj in queue:
-            # Calculate the absolute path of the new directory
-            norm_path = normpath(f"{new_path}/{self.relative_path(obj.path)}")
-            if obj.object_type() == "directory":
-                continue
-            new_object = self.get_vobject(norm_path, self.project_path())
-            new_object.impress()
+        plan, outside_successors = self.copy_to_plan_arcs(queue, new_path)
+        impressions = self.copy_to_plan_impressions(queue, new_path, plan)
+        with ChernJournal(self.project_path()).transaction():
+            self.copy_to_write_configs(plan, outside_successors)
+            self.copy_to_create_impressions(plan, impressions)
 
         return Message()  # Empty message for success
 
-    def move_to_deal_with_arcs(self, queue: List['VObject'],
-                              new_path: str) -> None:
-        """ Deal with the arcs when moving
-        """
-        for obj in queue:
-            # Calculate the absolute path of the new directory
-            norm_path = normpath(
-                join(new_path, self.relative_path(obj.path))
-            )
-            new_object = self.get_vobject(norm_path, self.project_path())
-            new_object.clean_flow()
-
-        for obj in queue:
-            # Calculate the absolute path of the new directory
-            norm_path = normpath(
-                join(new_path, self.relative_path(obj.path))
-            )
-            new_object = self.get_vobject(norm_path, self.project_path())
-            for pred_object in obj.predecessors():
-                if self.relative_path(pred_object.path).startswith(".."):
-                    # if in the outside directory
-                    new_object.add_arc_from(pred_object)
-                    alias = obj.path_to_alias(pred_object.invariant_path())
-                    new_object.set_alias(alias, pred_object.invariant_path(), ignore_yaml=True)
-                else:
-                    # if in the same tree
-                    relative_path = self.relative_path(pred_object.path)
-                    new_object.add_arc_from(
-                        self.get_vobject(join(new_path, relative_path), self.project_path())
-                    )
-                    alias1 = obj.path_to_alias(pred_object.invariant_path())
-                    alias2 = pred_object.path_to_alias(obj.invariant_path())
-                    norm_path = normpath(
-                        join(new_path, relative_path)
-                    )
-                    new_object.set_alias(
-                        alias1,
-                        self.get_vobject(norm_path).invariant_path(),
-                        ignore_yaml=True
-                    )
-                    self.get_vobject(norm_path, self.project_path()).set_alias(
-                        alias2,
-                        new_object.invariant_path(),
-                        ignore_yaml=True
-                    )
+    def move_to_plan(self, queue: List['VObject'], new_path: str) -> Dict[str, str]:
+        """ Plan the path and alias rewrites when moving
 
-            for succ_object in obj.successors():
-                # if in the outside directory
-                if self.relative_path(succ_object.path).startswith(".."):
-                    new_object.add_arc_to(succ_object)
-                    succ_object.remove_arc_from(self)
-                    alias = succ_object.path_to_alias(obj.invariant_path())
-                    succ_object.remove_alias(alias, ignore_yaml=True)
-                    succ_object.set_alias(alias, new_object.invariant_path(), ignore_yaml=True)
+        The configs of the moved objects and of their outside neighbours
+        are rewritten in memory.
 
+        Returns:
+            dict: the contents of the configs after the move,
+            keyed by the path relative to the project
+        """
+        project_path = self.project_path()
+        old_prefix = self.invariant_path()
+        new_prefix = os.path.relpath(new_path, project_path)
+
+        def moved(path):
+            if path == old_prefix or path.startswith(old_prefix + "/"):
+                return new_prefix + path[len(old_prefix):]
+            return path
+
+        def rewrite(config):
+            for key in ("predecessors", "successors"):
+                if key in config:
+                    config[key] = [moved(path) for path in config[key]]
+            if "path_to_alias" in config:
+                config["path_to_alias"] = {
+                    moved(path): alias for path, alias in config["path_to_alias"].items()
+                }
+            if "alias_to_path" in config:
+                config["alias_to_path"] = {
+                    alias: moved(path) for alias, path in config["alias_to_path"].items()
+                }
+            return config
+
+        writes = {}
+        outside = set()
         for obj in queue:
-            for pred_object in obj.predecessors():
-                if self.relative_path(pred_object.path).startswith(".."):
-                    obj.remove_arc_from(pred_object)
-
-            for succ_object in obj.successors():
-                if self.relative_path(succ_object.path).startswith(".."):
-                    obj.remove_arc_to(succ_object)
+            config = obj.config_file.read_variables()
+            for path in config.get("predecessors", []) + config.get("successors", []):
+                if moved(path) == path:
+                    outside.add(path)
+            config_path = join(moved(obj.invariant_path()), ".chern", "config.json")
+            writes[config_path] = json.dumps(rewrite(config))
+
+        for path in sorted(outside):
+            config_file = metadata.ConfigFile(join(project_path, path, ".chern", "config.json"))
+            if not metadata.exists(config_file.file_path):
+                continue
+            config = config_file.read_variables()
+            writes[join(path, ".chern", "config.json")] = json.dumps(rewrite(config))
+        return writes
 
     def move_to(self, new_path: str) -> Message: # UnitTest: DONE
         """ move to another path
+
+        The directory is renamed, and the configs of the moved objects and
+        their outside neighbours are rewritten in one journaled batch,
+        see chern_journal for details.
         """
+        journal = ChernJournal(self.project_path())
+        journal.recover()
+
         is_valid, error_message = self.move_to_check(new_path)
         if not is_valid:
             message = Message()
@@ -460,11 +559,11 @@ class FileManagement(Core):
                            f"please impress it and try again\n", "warning")
             return message
 
-        shutil.copytree(self.path, new_path)
-
-        self.move_to_deal_with_arcs(queue, new_path)
-
-        shutil.rmtree(self.path)
+        writes = self.move_to_plan(queue, new_path)
+        journal.commit(
+            [(self.invariant_path(), os.path.relpath(new_path, self.project_path()))],
+            writes
+        )
 
         return Message()  # Empty message for success
 
@@ -521,6 +620,7 @@ class FileManagement(Core):
     def rm(self) -> Message: # UnitTest: DONE
         """ Remove this object.
         The important thing is to unalias.
+        The object is moved to the trash of the project (see chern_trash).
         """
         queue = self.sub_objects_recursively()
         for obj in queue:
@@ -536,22 +636,59 @@ class FileManagement(Core):
                     alias = succ_object.path_to_alias(succ_object.path)
                     succ_object.remove_alias(alias)
 
-        shutil.rmtree(self.path)
+        entry = ChernTrash(self.project_path()).move(self.path)
 
-        return Message()  # Empty message for success
+        message = Message()
+        message.add(f"Moved to the trash ({entry}), "
+                    f"restore with: trash restore {self.invariant_path()}\n", "normal")
+        return message
+
+    def listing_snapshot(self) -> List[Tuple[str, str]]:
+        """ The (name, object_type) of the sub_objects
+
+        The snapshot is cached in ChernCache: the directory is rescanned
+        only when it is modified, and the type of a child is read again
+        only when its config is modified.
+        The modifications within LISTING_RACY_NS of the last scan
+        are not trusted, because of the timestamp granularity.
+        """
+        now = time.time_ns()
+        dir_mtime = os.stat(self.path).st_mtime_ns
+        cached_mtime, scanned_at, children = CHERN_CACHE.listing_snapshot_table.get(
+            self.path, (None, 0, {})
+        )
+        if dir_mtime != cached_mtime or dir_mtime >= scanned_at - LISTING_RACY_NS:
+            children = {
+                item: children.get(item, (None, ""))
+                for item in os.listdir(self.path)
+                if os.path.isdir(join(self.path, item))
+            }
+
+        snapshot = {}
+        for name, (config_mtime, object_type) in children.items():
+            config_path = join(self.path, name, ".chern", "config.json")
+            try:
+                mtime = os.stat(config_path).st_mtime_ns
+            except FileNotFoundError:
+                mtime = -1
+            if mtime != config_mtime or mtime >= scanned_at - LISTING_RACY_NS:
+                object_type = ""
+                if mtime != -1:
+                    config_file = metadata.ConfigFile(config_path)
+                    object_type = config_file.read_variable("object_type", "")
+            snapshot[name] = (mtime, object_type)
+        CHERN_CACHE.listing_snapshot_table[self.path] = (dir_mtime, now, snapshot)
+        return [(name, object_type)
+                for name, (_, object_type) in snapshot.items() if object_type]
 
     def sub_objects(self) -> List['VObject']: # UnitTest: DONE
         """ return a list of the sub_objects
         """
-        sub_directories = os.listdir(self.path)
-        sub_object_list = []
-        for item in sub_directories:
-            if os.path.isdir(join(self.path, item)):
-                obj = self.get_vobject(join(self.path, item), self.project_path())
-                if obj.is_zombie():
-                    continue
-                sub_object_list.append(obj)
-        return sub_object_list
+        project_path = self.project_path()
+        return [
+            self.get_vobject(join(self.path, name), project_path)
+            for name, _ in self.listing_snapshot()
+        ]
 
     def sub_objects_recursively(self) -> List['VObject']: # UnitTest: DONE
         """ Return a list of all the sub_objects
@@ -587,44 +724,73 @@ class FileManagement(Core):
             csys.copy_tree(path, self.path + "/" + filename)
         else:
             csys.copy(path, self.path + "/" + filename)
+        self.invalidate_status()
 
         return message  # Empty message for success
 
+    def import_files(self, sources: List[str], link: bool = False,
+                     progress=None) -> Message:
+        """
+        Import files, directories and glob patterns to this task directory,
+        in parallel, skipping the files already imported (see chern_import)
+        """
+        message = Message()
+
+        if not self.is_task_or_algorithm():
+            message.add("This function is only available for task or algorithm.", "warning")
+            return message
+
+        bulk = BulkImport(sources, self.path, link=link)
+        message.append(bulk.run(progress))
+        message.add(bulk.summary() + "\n", "normal")
+        self.invalidate_status()
+        return message
+
     def rm_file(self, file: str) -> Message:
         """
         Remove the files within a task or an algorithm
         """
+        return self.rm_files([file])
+
+    def rm_files(self, files: List[str]) -> Message:
+        """
+        Remove several files within a task or an algorithm,
+        they are moved to the trash together
+        """
         message = Message()
 
         if not self.is_task_or_algorithm():
             message.add("This function is only available for task or algorithm.", "warning")
             return message
 
-        abspath = self.path + "/" + file
+        paths = []
+        for file in files:
+            abspath = self.path + "/" + file
 
-        if not os.path.exists(abspath):
-            message.add("File does not exist.", "warning")
-            return message
+            if not os.path.exists(abspath):
+                message.add("File does not exist.", "warning")
+                continue
 
-        # protect: the file should not go out of the task directory
-        if self.relative_path(abspath).startswith(".."):
-            message.add("The file should not go out of the task directory.", "warning")
-            return message
+            # protect: the file should not go out of the task directory
+            if self.relative_path(abspath).startswith(".."):
+                message.add("The file should not go out of the task directory.", "warning")
+                continue
 
-        # protect: the file should not be the task directory
-        if self.relative_path(abspath) == ".":
-            message.add("The file should not be the task directory.", "warning")
-            return message
+            # protect: the file should not be the task directory
+            if self.relative_path(abspath) == ".":
+                message.add("The file should not be the task directory.", "warning")
+                continue
 
-        # protect: should not remove the .chern and chern.yaml
-        if self.relative_path(abspath) in (".chern", "chern.yaml"):
-            message.add("The file should not be the .chern or chern.yaml.", "warning")
-            return message
+            # protect: should not remove the .chern and chern.yaml
+            if self.relative_path(abspath) in (".chern", "chern.yaml"):
+                message.add("The file should not be the .chern or chern.yaml.", "warning")
+                continue
 
-        if os.path.isdir(abspath):
-            csys.rm_tree(abspath)
-        else:
-            os.remove(abspath)
+            paths.append(abspath)
+
+        if paths:
+            ChernTrash(self.project_path()).move_many(paths)
+            self.invalidate_status()
 
         return message  # Empty message for success
 
@@ -659,5 +825,6 @@ class FileManagement(Core):
                 else:
                     # All validations passed, perform the move
                     csys.move(abspath, dest)
+                    self.invalidate_status()
 
         return message
@@ -1,18 +1,22 @@
 """ Module for impression management
 """
-import difflib
 import os
 
 import filecmp
 import time
 from logging import getLogger
+from typing import Dict, List, Optional, Tuple
 
 from ..utils import csys
+from ..utils.metrics import ChernMetrics
 from .vobj_core import Core
 from .vimpression import VImpression
+from .chern_impression_index import tree_digest
+from .chern_diff import diff_trees
 from .chern_cache import ChernCache
 
 CHERN_CACHE = ChernCache.instance()
+METRICS = ChernMetrics.instance()
 logger = getLogger("ChernLogger")
 
 
@@ -45,12 +49,14 @@ class ImpressionManagement(Core):
         for pred in self.predecessors():
             if not pred.is_impressed_fast():
                 pred.impress()
-        impression = VImpression()
-        impression.create(self)
+        impression = VImpression(project_path=self.project_path())
+        with METRICS.timer("impression.create"):
+            impression.create(self)
         self.config_file.write_variable("impression", impression.uuid)
         # update the impression_consult_table, since the impression is changed
         consult_table = CHERN_CACHE.impression_consult_table
         consult_table[self.path] = (-1, -1)
+        self.invalidate_status()
 
     def is_impressed(self): # pylint: disable=too-many-return-statements # UnitTest: DONE
         """ Judge whether the file is impressed
@@ -85,12 +91,10 @@ class ImpressionManagement(Core):
         logger.debug("Check the file change")
         # Check the file change: first to check the tree
         file_list = csys.tree_excluded(self.path)
-        impression_tree = impression.tree()
 
-        # Check the file list is the same as the impression tree
-        # if file_list != impression.tree():
-        #     return False
-        if csys.sorted_tree(file_list) != csys.sorted_tree(impression_tree):
+        # Check the file list is the same as the impression tree,
+        # through the digest kept in the impression index
+        if tree_digest(csys.sorted_tree(file_list)) != impression.tree_digest():
             # print("Tree mismatch:")
             # print("Current tree:", csys.sorted_tree(file_list))
             # print("Impression tree:", csys.sorted_tree(impression_tree))
@@ -113,6 +117,7 @@ class ImpressionManagement(Core):
 
         for dirpath, dirnames, filenames in file_list: # pylint: disable=unused-variable
             for f in filenames:
+                METRICS.count("filecmp.cmp")
                 if not filecmp.cmp(f"{self.path}/{dirpath}/{f}",
                                    f"{impression.path}/contents/{dirpath}/{f}"):
                     # print("# File difference:")
@@ -195,7 +200,7 @@ class ImpressionManagement(Core):
         uuid = self.config_file.read_variable("impression", "")
         if uuid == "":
             return None
-        return VImpression(uuid)
+        return VImpression(uuid, self.project_path())
 
     def status(self, consult_id=None): # UnitTest: DONE
         """ Consult the status of the object
@@ -210,11 +215,7 @@ class ImpressionManagement(Core):
                 return status
 
         if not self.is_task_or_algorithm():
-            for sub_object in self.sub_objects():
-                status = sub_object.status(consult_id)
-                if status == "new":
-                    return "new"
-            return "impressed"
+            return self.status_tree()[self.path]
 
         if not self.is_impressed_fast():
             if consult_id:
@@ -226,7 +227,144 @@ class ImpressionManagement(Core):
             consult_table[self.path] = (consult_id, status)
         return status
 
-    # pylint: disable=too-many-locals,too-many-statements
+    def status_tree(self) -> Dict[str, str]:
+        """ The status (new|impressed) of this object and all its sub objects
+
+        A directory is new if any of its sub objects is new.
+        The statuses of each directory are cached, see cached_status for the
+        tasks and algorithms: the cached statuses of a directory are reused
+        while the directories of its subtree are unchanged (their lists of
+        sub objects) and each task and algorithm within keeps its status,
+        checked by cached_status, so that the sub objects are not listed
+        and the statuses not aggregated again.
+        The changes made through Chern also invalidate the chain of the
+        ancestors (see invalidate_status).
+        """
+        if self.is_task_or_algorithm():
+            return {self.path: self.cached_status()}
+        statuses, _, _ = self._status_tree({})
+        return {self.path if path == "." else os.path.join(self.path, path): status
+                for path, status in statuses.items()}
+
+    def _status_tree(self, memo: Dict[str, str]
+                     ) -> Tuple[Dict[str, str], Dict[str, int], List[str]]:
+        """ The statuses of the directory, see status_tree
+
+        Returns:
+            (statuses, dir_mtimes, objects): relative to the directory,
+            the statuses, the modification times of the directories
+            and the tasks and algorithms of the subtree.
+            ``memo'' memoizes the status of the tasks within one pass.
+        """
+        key = os.path.abspath(self.path)
+        cached = CHERN_CACHE.directory_status_table.get(key)
+        if cached is not None and self._status_tree_valid(cached, memo):
+            return cached[1:]
+        now = time.time_ns()
+        statuses = {".": "impressed"}
+        dir_mtimes = {".": os.stat(self.path).st_mtime_ns}
+        objects = []
+        for sub_object in self.sub_objects():
+            name = os.path.relpath(sub_object.path, self.path)
+            if sub_object.is_task_or_algorithm():
+                statuses[name] = sub_object.cached_status(memo)
+                objects.append(name)
+            else:
+                # pylint: disable=protected-access
+                sub_tree = sub_object._status_tree(memo)
+                for merged, sub_table in zip((statuses, dir_mtimes), sub_tree[:2]):
+                    merged.update({os.path.normpath(os.path.join(name, path)): value
+                                   for path, value in sub_table.items()})
+                objects += [os.path.join(name, path) for path in sub_tree[2]]
+            if statuses[name] == "new":
+                statuses["."] = "new"
+        CHERN_CACHE.directory_status_table[key] = (now, statuses, dir_mtimes, objects)
+        return statuses, dir_mtimes, objects
+
+    def _status_tree_valid(self, cached: Tuple, memo: Dict[str, str]) -> bool:
+        """ Whether the cached statuses of the directory are still valid:
+        the directories are unchanged and the tasks keep their status
+        """
+        cached_at, statuses, dir_mtimes, objects = cached
+        for path, mtime in dir_mtimes.items():
+            try:
+                dir_mtime = os.stat(os.path.join(self.path, path)).st_mtime_ns
+            except OSError:
+                return False
+            # The modifications within one second of the check are not trusted
+            if dir_mtime != mtime or dir_mtime >= cached_at - 10**9:
+                return False
+        project_path = self.project_path()
+        for path in objects:
+            obj = self.get_vobject(os.path.join(self.path, path), project_path)
+            if obj.cached_status(memo) != statuses[path]:
+                return False
+        return True
+
+    def cached_status(self, statuses: Optional[Dict[str, str]] = None) -> str:
+        """ The status (new|impressed) of a task or an algorithm
+
+        The status is cached in ChernCache with the signature of the object:
+        the modification time of its files and the impression and status
+        of its predecessors. When the status changes, the cached statuses of
+        the ancestors are invalidated.
+        ``statuses'' memoizes the status of the objects within one pass.
+        """
+        if statuses is None:
+            statuses = {}
+        if self.path in statuses:
+            return statuses[self.path]
+        pred_signature = []
+        for pred in self.predecessors():
+            pred_signature.append((
+                pred.invariant_path(),
+                pred.config_file.read_variable("impression", ""),
+                pred.cached_status(statuses),
+            ))
+        signature = (csys.dir_mtime(self.path), tuple(pred_signature))
+        cached_signature, cached_at, status = CHERN_CACHE.status_tree_table.get(
+            self.path, (None, 0, "")
+        )
+        # The modifications within one second of the check are not trusted
+        if signature != cached_signature or signature[0] >= cached_at - 1:
+            now = time.time()
+            cached_status = status
+            status = "impressed" if self.is_impressed() else "new"
+            CHERN_CACHE.status_tree_table[self.path] = (signature, now, status)
+            if status != cached_status:
+                self._invalidate_ancestors(self.path)
+        statuses[self.path] = status
+        return status
+
+    def invalidate_status(self) -> None:
+        """ Invalidate the cached statuses changed with this object:
+        the object, its successors (recursively) and their ancestors
+        """
+        queue = [self]
+        visited = set()
+        while queue:
+            obj = queue.pop()
+            if obj.path in visited:
+                continue
+            visited.add(obj.path)
+            # The objects are reached with relative and absolute paths
+            for key in (obj.path, os.path.abspath(obj.path)):
+                CHERN_CACHE.status_tree_table.pop(key, None)
+                CHERN_CACHE.impression_consult_table.pop(key, None)
+            self._invalidate_ancestors(obj.path)
+            queue += obj.successors()
+
+    def _invalidate_ancestors(self, path: str) -> None:
+        """ Invalidate the cached statuses of the directories containing path """
+        project_path = self.project_path()
+        path = os.path.abspath(path)
+        while path.startswith(project_path):
+            CHERN_CACHE.directory_status_table.pop(path, None)
+            if path == project_path:
+                break
+            path = os.path.dirname(path)
+
+    # pylint: disable=too-many-locals,too-many-statements,too-many-branches
     def trace(self, impression=None):
         """
         Compare the *current* dependency DAG of `self` with the DAG stored in
@@ -248,10 +386,11 @@ class ImpressionManagement(Core):
 
         if impression is None:
             impression = self.impression()
-        if impression is None:
-            print("No impression exists. Object is NEW.")
-            return
-        impression = VImpression(impression)
+            if impression is None:
+                print("No impression exists. Object is NEW.")
+                return
+            impression = impression.uuid
+        impression = VImpression(impression, self.project_path())
 
         # ---------------------------------------------
         # Build DAG from current object state
@@ -321,7 +460,7 @@ class ImpressionManagement(Core):
         print("\n=== Detailed Diff (removed parent → added child) ===")
 
         def is_parent(parent_uuid, child_uuid):
-            return parent_uuid in VImpression(child_uuid).parents()
+            return parent_uuid in VImpression(child_uuid, self.project_path()).parents()
 
         def colorize_diff(diff_lines):
             # ANSI color codes for terminal output
@@ -355,8 +494,8 @@ class ImpressionManagement(Core):
                     # --------------------------------------------------------
                     #  Run impression diff
                     # --------------------------------------------------------
-                    old_impr = VImpression(r) if r else None
-                    new_impr = VImpression(a) if a else None
+                    old_impr = VImpression(r, self.project_path()) if r else None
+                    new_impr = VImpression(a, self.project_path()) if a else None
 
                     if not (old_impr and new_impr):
                         print("One of the impressions does not exist, skipping diff.")
@@ -390,27 +529,13 @@ class ImpressionManagement(Core):
                     print(f"  Removed files: {removed_files}")
 
                     # diff the common files
-                    for rel in sorted(common):
-                        old_f = os.path.join(old_root, rel)
-                        new_f = os.path.join(new_root, rel)
-
-                        with open(old_f, 'r', encoding='utf-8',
-                                  errors="ignore") as f1:
-                            old_txt = f1.readlines()
-                        with open(new_f, 'r', encoding='utf-8',
-                                  errors="ignore") as f2:
-                            new_txt = f2.readlines()
-
-                        diff = list(difflib.unified_diff(
-                            old_txt, new_txt,
-                            fromfile=f"{r}:{rel}",
-                            tofile=f"{a}:{rel}"
-                        ))
-
-                        if diff:
+                    for rel, kind, diff in diff_trees(old_root, new_root, common, (r, a)):
+                        if kind == "text":
                             diff = colorize_diff(diff).splitlines(keepends=True)
                             print(f"\n  Diff in file: {rel}")
-                            print("".join(diff))
+                        else:
+                            print(f"\n  Changed {kind} file: {rel}")
+                        print("".join(diff))
 
                     # Calculate the changes in incoming edges
                     added_edges_to_a = [e[0] for e in added_edges if e[1] == a]
@@ -45,7 +45,7 @@
             Judge whether obj is the succ/pred of this obj
 
         + doctor:
-            Judge whether it is a good object(with all arc linked)
+            Check the arcs and the aliases of the project (and fix them)
 
         + copy_to:
             Copy the object and its contains to a new path. Before the copy,
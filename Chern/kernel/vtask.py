@@ -83,8 +83,10 @@
 
 """
 import os
+from concurrent.futures import ThreadPoolExecutor
 from logging import getLogger
 from os.path import join
+from typing import Dict, List, Optional
 
 from ..utils import metadata
 from ..utils import csys
@@ -227,3 +229,64 @@ def create_data(path):
     yaml_file = metadata.YamlFile(join(path, "chern.yaml"))
     yaml_file.write_variable("environment", "rawdata")
     yaml_file.write_variable("uuid", "")
+
+
+def create_tasks(base_path: str, begin: int, end: int, *, # pylint: disable=too-many-arguments
+                 parameters: Optional[Dict[str, str]] = None,
+                 template: Optional[str] = None,
+                 max_workers: int = 8) -> List[str]:
+    """ Create the tasks [base_path]_[index] for index in [begin, end)
+
+    The settings are copied from the chern.yaml of the ``template'' task
+    (or the default settings of create_task), and the ``{index}'' in the
+    values of ``parameters'' is replaced by the index of each task.
+    The config.json and chern.yaml of each task are written in one shot,
+    and the tasks are created in a thread pool.
+    The existing paths are skipped.
+
+    Returns:
+        list: the paths of the created tasks
+    """
+    base_path = csys.strip_path_string(base_path)
+    parent_path = os.path.abspath(join(base_path, ".."))
+    object_type = VObject(parent_path).object_type()
+    if object_type not in ("project", "directory"):
+        return []
+    project_path = csys.project_path(parent_path)
+
+    if template is None:
+        settings = {
+            "environment": "reanahub/reana-env-root6:6.18.04",
+            "memory_limit": "256Mi",
+        }
+    else:
+        settings = metadata.YamlFile(join(template, "chern.yaml")).read_variables()
+        settings.pop("alias", None)
+    if parameters is None:
+        parameters = {"index": "{index}"}
+
+    def create(index):
+        path = f"{base_path}_{index}"
+        if os.path.exists(path):
+            logger.warning("Path %s already exists, skipped", path)
+            return None
+        csys.mkdir(path+"/.chern")
+        config_file = metadata.ConfigFile(path + "/.chern/config.json")
+        config_file.write_variables({
+            "object_type": "task",
+            "auto_download": True,
+            "default_runner": "local",
+        })
+        task_parameters = dict(settings.get("parameters", {}))
+        for name, value in parameters.items():
+            task_parameters[name] = str(value).replace("{index}", str(index))
+        yaml_file = metadata.YamlFile(join(path, "chern.yaml"))
+        yaml_file.write_variables(dict(settings, parameters=task_parameters))
+        with open(path + "/.chern/README.md", "w", encoding="utf-8") as f:
+            f.write("Please write README for task "
+                    f"{os.path.relpath(path, project_path)}")
+        return path
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        created = executor.map(create, range(begin, end))
+        return [path for path in created if path is not None]
@@ -5,6 +5,7 @@ from logging import getLogger
 
 from ..utils import metadata
 from ..utils import csys
+from .chern_journal import ChernJournal
 from .vtask_core import Core
 from . import valgorithm as valg
 
@@ -44,11 +45,12 @@ class InputManager(Core):
                   "the ``algorithm'', which will cause a loop.")
             return
 
-        algorithm = self.algorithm()
-        if algorithm is not None:
-            print("Already have algorithm, will replace it")
-            self.remove_algorithm()
-        self.add_arc_from(self.get_vobject(path, self.project_path()))
+        with ChernJournal(self.project_path()).transaction():
+            algorithm = self.algorithm()
+            if algorithm is not None:
+                print("Already have algorithm, will replace it")
+                self.remove_algorithm()
+            self.add_arc_from(self.get_vobject(path, self.project_path()))
 
     def remove_algorithm(self):
         """ Remove the algorithm
@@ -4,6 +4,9 @@ import os
 from logging import getLogger
 
 from .chern_communicator import ChernCommunicator
+from .chern_output_cache import ChernOutputCache
+from .chern_result_cache import ChernResultCache
+from .chern_staging import ChernStaging
 from ..utils import csys
 from .vtask_core import Core
 
@@ -36,6 +39,7 @@ class JobManager(Core):
         """ Collect the results of the job"""
         cherncc = ChernCommunicator.instance()
         cherncc.collect(self.impression())
+        ChernResultCache.instance().flush()
 
     def display(self, filename):
         """ Display the file"""
@@ -65,9 +69,16 @@ class JobManager(Core):
         cherncc = ChernCommunicator.instance()
         cherncc.deposit_with_data(self.impression(), path)
 
-    # pylint: disable=too-many-locals,too-many-branches
+    # pylint: disable=too-many-locals
     def workaround_preshell(self) -> (tuple[bool, str]):
-        """ Pre-shell workaround"""
+        """ Pre-shell workaround
+
+        The task, the algorithm and the algorithm inputs are cloned
+        (reflink when possible) into a staging area,
+        see chern_staging for details.
+        The outputs of the preceding jobs are linked from the output cache,
+        see chern_output_cache for details.
+        """
         # FIXME: Still WIP
         print("Start constructing workaround environment...")
         cherncc = ChernCommunicator.instance()
@@ -81,102 +92,60 @@ class JobManager(Core):
             pre_status = pre.job_status()
             if pre_status not in ("finished", "archived"):
                 return (False, f"Preceding job {pre} is not finished")
-            cherncc.collect(pre.impression())
 
         print("All preceding jobs are finished. Preparing data...")
-        # make a temporal directory for data deposit
-        temp_dir = csys.create_temp_dir(prefix="chernws_")
-        # copy the data to the temporal directory
-        file_list = csys.tree_excluded(self.path)
-        print(file_list)
-        for dirpath, _, filenames in file_list:
-            for f in filenames:
-                full_path = os.path.join(self.project_path(), self.invariant_path(), dirpath, f)
-                rel_path = os.path.relpath(full_path, self.path)
-                dest_path = os.path.join(temp_dir, rel_path)
-                csys.copy(full_path, dest_path)
+        staging = ChernStaging.instance()
+        for area in staging.gc():
+            logger.info("Removed abandoned staging area %s", area)
+        # make a staging area for data deposit
+        temp_dir = staging.create_area(prefix="chernws_")
+        # clone the task to the staging area
+        staging.stage_tree(temp_dir, self.path)
 
         print("Linking preceding jobs...")
-        # Create the temporal directory and copy the data there
+        # The outputs are fetched once into the output cache
+        # and linked to the staging area
+        output_cache = ChernOutputCache.instance()
         for pre in self.inputs():
-            pre_temp_dir = csys.create_temp_dir(prefix="chernimp_")
-            outputs = cherncc.output_files(pre.impression())
-            print(pre_temp_dir)
-            if pre.environment() == "rawdata":
-                for f in outputs:
-                    cherncc.export(pre.impression(), f"{f}", os.path.join(pre_temp_dir, f))
-            else:
-                csys.mkdir(os.path.join(pre_temp_dir, "outputs"))
-                for f in outputs:
-                    output_path = os.path.join(pre_temp_dir, "outputs", f)
-                    cherncc.export(pre.impression(), f"{f}", output_path)
+            uuid = pre.impression().uuid
+            staging.pin_output(temp_dir, uuid)
+            cached_dir = output_cache.fetch(
+                pre.impression(), cherncc, staging.pinned_outputs()
+            )
             alias = self.path_to_alias(pre.invariant_path())
             print(f"Linking preceding job {pre} to {alias}")
-            # Make a symlink
-            csys.symlink(
-                os.path.join(pre_temp_dir),
-                os.path.join(temp_dir, alias),
-            )
+            if pre.environment() == "rawdata":
+                csys.symlink(cached_dir, os.path.join(temp_dir, alias))
+            else:
+                csys.mkdir(os.path.join(temp_dir, alias))
+                csys.symlink(cached_dir, os.path.join(temp_dir, alias, "outputs"))
 
         algorithm = self.algorithm()
         if algorithm:
-            alg_temp_dir = csys.create_temp_dir(prefix="chernws_")
-            file_list = csys.tree_excluded(algorithm.path)
-            for dirpath, _, filenames in file_list:
-                for f in filenames:
-                    full_path = os.path.join(
-                            self.project_path(),
-                            algorithm.invariant_path(),
-                            dirpath, f
-                    )
-                    rel_path = os.path.relpath(full_path, algorithm.path)
-                    dest_path = os.path.join(alg_temp_dir, rel_path)
-                    csys.copy(full_path, dest_path)
-            csys.symlink(
-                os.path.join(alg_temp_dir),
-                os.path.join(temp_dir, "code"),
-            )
+            staging.stage_tree(temp_dir, algorithm.path, "code")
 
             # if the algorithm have inputs, link them too
             alg_inputs = filter(
                 lambda x: (x.object_type() == "algorithm"), algorithm.predecessors()
                 )
-            for alg_in in list(map(lambda x: self.get_task(x.path), alg_inputs)):
-                alg_in_temp_dir = csys.create_temp_dir(prefix="chernimp_")
-                alg_in_file_list = csys.tree_excluded(alg_in.path)
-                for dirpath, _, filenames in alg_in_file_list:
-                    for f in filenames:
-                        full_path = os.path.join(
-                                self.project_path(),
-                                alg_in.invariant_path(),
-                                dirpath, f
-                        )
-                        rel_path = os.path.relpath(full_path, alg_in.path)
-                        dest_path = os.path.join(alg_in_temp_dir, rel_path)
-                        csys.copy(full_path, dest_path)
+            for alg_in in alg_inputs:
                 alias = algorithm.path_to_alias(alg_in.invariant_path())
-                # Link it under code
-                csys.symlink(
-                    os.path.join(alg_in_temp_dir),
-                    os.path.join(temp_dir, "code", alias),
-                )
+                # Put it under code, read only: it is not synced back
+                staging.stage_tree(temp_dir, alg_in.path, os.path.join("code", alias),
+                                   read_only=True)
 
         return (True, temp_dir)
 
     def workaround_postshell(self, path) -> bool:
-        """ Post-shell workaround"""
+        """ Post-shell workaround
+
+        Only the algorithm files modified in the shell are copied back,
+        and the staging area is released afterwards.
+        """
+        staging = ChernStaging.instance()
         algorithm = self.algorithm()
         if algorithm:
-            alg_temp_dir = os.path.join(path, "code")
-            file_list = csys.tree_excluded(algorithm.path)
-            for dirpath, _, filenames in file_list:
-                for f in filenames:
-                    full_path = os.path.join(
-                            self.project_path(),
-                            algorithm.invariant_path(),
-                            dirpath, f
-                    )
-                    rel_path = os.path.relpath(full_path, algorithm.path)
-                    dest_path = os.path.join(alg_temp_dir, rel_path)
-                    csys.copy(dest_path, full_path)
+            for rel_path in staging.sync_back(path, "code", algorithm.path):
+                print(f"Synced {rel_path} back to {algorithm}")
+        staging.release(path)
         return True
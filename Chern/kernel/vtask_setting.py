@@ -120,12 +120,15 @@ class SettingManager(Core):
         """
         Check whether the environment is validated or not
         """
-        if self.environment() == "rawdata":
+        environment = self.environment()
+        if environment == "rawdata":
             return True
-        if self.algorithm() is not None:
-            if self.algorithm().environment() == "script":
+        algorithm = self.algorithm()
+        if algorithm is not None:
+            algorithm_environment = algorithm.environment()
+            if algorithm_environment == "script":
                 return True
-            if self.environment() == self.algorithm().environment():
+            if environment == algorithm_environment:
                 return True
         return False
 
@@ -4,7 +4,8 @@
 
     Functions:
         cli:
-            default entrance, to start chern command line
+            default entrance, to start chern command line,
+            ``--profile'' runs the command under the profiler
         ipython: [deprecated]
             start the ipython shell of chern
         * start_chern_ipython:
@@ -15,6 +16,9 @@
         machine:
             start or stop the chernmachine
 
+        doctor:
+            check (and fix) the arcs and the aliases of the project
+
         config:
             set the configurations: inavailable yet
         prologue:
@@ -22,6 +26,7 @@
 """
 # pylint: disable=broad-exception-caught,import-outside-toplevel
 import os
+import sys
 import logging
 from os.path import join
 from logging import getLogger
@@ -31,6 +36,7 @@ import click
 from .kernel import vproject
 from .utils import csys
 from .utils import metadata
+from .utils import profiling
 from .interface.ChernShell import ChernShell
 
 
@@ -64,13 +70,38 @@ def start_chern_command_line():
     logger.debug("end start_chern_command_line")
 
 
+def recover_journal():
+    """ Replay the interrupted batch of the project of the current directory,
+    see chern_journal
+    """
+    from .kernel.chern_journal import ChernJournal
+    project_path = csys.project_path()
+    if project_path is not None and ChernJournal(project_path).recover():
+        print("Recovered an interrupted operation of the project.")
+
+
 @click.group(invoke_without_command=True)
+@click.option("--profile", is_flag=True,
+              help="Profile the command and print the hot spots.")
+@click.option("--profile-sampling", is_flag=True,
+              help="Use the sampling profiler instead of cProfile.")
+@click.option("--profile-output", default=None,
+              help="Write the profile (pstats, or speedscope for .json).")
 @click.pass_context
-def cli(ctx):
+def cli(ctx, profile, profile_sampling, profile_output):
     """ Chern command only is equal to `Chern ipython`
     """
+    if profile or profile_output:
+        profiler = profiling.start_profiler(profile_sampling, profile_output)
+
+        def stop_profiler():
+            profiler.stop()
+            profiling.report(profiler, output=profile_output,
+                             name=ctx.invoked_subcommand or "chern")
+        ctx.call_on_close(stop_profiler)
     if is_first_time():
         start_first_time()
+    recover_journal()
     if ctx.invoked_subcommand is None:
         try:
             config_file = metadata.ConfigFile(
@@ -191,6 +222,23 @@ def remove(project):
         print("Fail to remove the project")
 
 
+@cli.command()
+@click.option("--fix", is_flag=True, help="Repair the problems in one batch.")
+def doctor(fix):
+    """ Check the arcs and the aliases of the current project,
+    exit with 1 if a problem is left (for CI)
+    """
+    from .kernel.vobject import VObject
+    project_path = csys.project_path()
+    if project_path is None:
+        print("Not in a Chern project")
+        sys.exit(1)
+    message, left = VObject(project_path).doctor(fix)
+    print(message.colored(), end="")
+    if left:
+        sys.exit(1)
+
+
 @cli.command()
 def prologue():
     """ A prologue from the author """
@@ -227,6 +275,7 @@ many others are named after him.
 def cli_sh():
     """ Chern command line command
     """
+    recover_journal()
 
 
 @cli_sh.command()
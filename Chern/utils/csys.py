@@ -5,6 +5,8 @@ define some classes and functions used throughout the project
 # pylint: disable=broad-exception-caught
 # Load module
 import os
+import errno
+import fcntl
 import shutil
 import uuid
 import hashlib
@@ -15,6 +17,10 @@ from typing import Any
 from contextlib import contextmanager
 from colored import fg, attr
 
+from .metrics import ChernMetrics
+
+METRICS = ChernMetrics.instance()
+
 # Utility Functions
 
 
@@ -206,9 +212,25 @@ def project_path(path=None):
     return None
 
 
+def tree_size(path):
+    """ Get the total size of the files in the directory
+    """
+    size = 0
+    for dirpath, _, filenames in os.walk(path):
+        for f in filenames:
+            size += os.path.getsize(os.path.join(dirpath, f))
+    return size
+
+
 def dir_mtime(path):
     """ Get the latest modified time of the directory
     """
+    with METRICS.timer("csys.dir_mtime"):
+        return _dir_mtime(path)
+
+
+def _dir_mtime(path):
+    """ The latest modified time of the files under path, recursively """
     mtime = os.path.getmtime(path)
     if path.endswith(".chern"):
         mtime = -1
@@ -219,7 +241,9 @@ def dir_mtime(path):
             continue
         if sub_dir == "impressions":
             continue
-        mtime = max(mtime, dir_mtime(os.path.join(path, sub_dir)))
+        if sub_dir == "trash" and path.endswith(".chern"):
+            continue
+        mtime = max(mtime, _dir_mtime(os.path.join(path, sub_dir)))
     return mtime
 
 
@@ -252,6 +276,57 @@ def copy(src, dst):
     shutil.copy2(src, dst)
 
 
+# Linux ioctl number to share the extents of a file (reflink),
+# supported by btrfs, xfs (with reflink=1), bcachefs, ...
+FICLONE = 0x40049409
+# (source device, destination device) -> whether FICLONE is supported
+_REFLINK_SUPPORT = {}
+
+
+def reflink(src, dst):
+    """ Clone the file with copy-on-write.
+    Return True if the filesystem supports it, otherwise False.
+    """
+    devices = (os.stat(src).st_dev, os.stat(os.path.dirname(dst)).st_dev)
+    if not _REFLINK_SUPPORT.get(devices, True):
+        return False
+    try:
+        with open(src, "rb") as fsrc, open(dst, "wb") as fdst:
+            fcntl.ioctl(fdst.fileno(), FICLONE, fsrc.fileno())
+    except OSError as e:
+        if os.path.exists(dst):
+            os.remove(dst)
+        if e.errno in (errno.EXDEV, errno.EOPNOTSUPP, errno.ENOTTY,
+                       errno.EINVAL, errno.ENOSYS):
+            _REFLINK_SUPPORT[devices] = False
+        return False
+    _REFLINK_SUPPORT[devices] = True
+    shutil.copystat(src, dst)
+    return True
+
+
+def clone_file(src, dst, allow_hardlink=False):
+    """ Clone the file as cheap as possible:
+    reflink (copy-on-write) first, then hardlink if allowed
+    (only safe if the file will never be modified in place),
+    and finally a normal copy.
+    Return the method used: "reflink", "hardlink" or "copy"
+    """
+    mkdir(os.path.dirname(dst))
+    if os.path.lexists(dst):
+        os.remove(dst)
+    if reflink(src, dst):
+        return "reflink"
+    if allow_hardlink:
+        try:
+            os.link(src, dst)
+            return "hardlink"
+        except OSError:
+            pass
+    shutil.copy2(src, dst)
+    return "copy"
+
+
 def rm_tree(src):
     """ Remove the directory
     """
@@ -347,6 +422,8 @@ def md5sum(file_path):
     """
     hash_md5 = hashlib.md5()
     with open(file_path, "rb") as f:
+        if METRICS.enabled:
+            METRICS.add_bytes("csys.md5", os.fstat(f.fileno()).st_size)
         for chunk in iter(lambda: f.read(4096), b""):
             hash_md5.update(chunk)
     return hash_md5.hexdigest()
@@ -377,3 +454,15 @@ def open_subprocess(command):
     finally:
         # Ensure the subprocess is finished and cleaned up
         process.wait()
+
+
+def pid_alive(pid: int) -> bool:
+    """ Judge whether the process is still running
+    """
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
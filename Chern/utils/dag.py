@@ -0,0 +1,41 @@
+"""
+Helpers to walk a DAG given as the dependencies of each node,
+{node: set of the nodes it depends on}, in topological order:
+
+    ready, waiting, successors = dependency_index(dependencies)
+    while ready:
+        node = ready.pop()
+        ...  # process the node
+        ready.extend(unblock(waiting, successors, node))
+
+They are used to deposit, schedule and run the impressions.
+"""
+from typing import Dict, List, Set, Tuple
+
+
+def dependency_index(dependencies: Dict[str, Set[str]]
+                     ) -> Tuple[List[str], Dict[str, Set[str]], Dict[str, List[str]]]:
+    """ Split the nodes into the ones ready (without dependencies) and
+    the waiting ones, and index the waiting ones by their dependencies
+    """
+    ready = [node for node, deps in dependencies.items() if not deps]
+    waiting = {node: set(deps) for node, deps in dependencies.items() if deps}
+    successors: Dict[str, List[str]] = {}
+    for node, deps in waiting.items():
+        for pred in deps:
+            successors.setdefault(pred, []).append(node)
+    return ready, waiting, successors
+
+
+def unblock(waiting: Dict[str, Set[str]], successors: Dict[str, List[str]],
+            node: str) -> List[str]:
+    """ Remove the processed node from the dependencies
+    and return the nodes that are ready
+    """
+    unblocked = []
+    for succ in successors.get(node, []):
+        waiting[succ].discard(node)
+        if not waiting[succ]:
+            del waiting[succ]
+            unblocked.append(succ)
+    return unblocked
@@ -1,11 +1,163 @@
 """ Utility classes to read and write metadata in JSON and YAML files.
+
+The YAML files are parsed with the C LibYAML bindings when PyYAML has them,
+and the parsed contents are kept in memory, validated by the file status,
+so that the accessors of the same chern.yaml parse it only once.
 """
+import copy
 import json
 import os
 import fcntl  # For Unix-based systems
-from typing import Any, Optional
+import threading
+from typing import Any, Dict, Optional, Tuple
 import yaml
 
+from .metrics import ChernMetrics
+
+METRICS = ChernMetrics.instance()
+
+class _Staging(threading.local):  # pylint: disable=too-few-public-methods
+    """The writes staged in memory by a transaction, see begin_staging.
+
+    The staging belongs to the thread of the transaction, the writes of
+    the other threads (e.g. the thread pools) go to the files directly.
+    """
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.root = ""
+        self.writes: Dict[str, str] = {}
+
+
+_STAGING = _Staging()
+
+
+def begin_staging(root: str) -> None:
+    """Stage the writes to the files under ``root'' in memory.
+
+    The staged contents are seen by the later reads,
+    and they are returned by ``end_staging''.
+    """
+    _STAGING.root = os.path.abspath(root)
+    _STAGING.writes = {}
+
+
+def end_staging() -> Dict[str, str]:
+    """Stop staging and return the staged contents keyed by absolute path."""
+    writes = _STAGING.writes
+    _STAGING.root = ""
+    _STAGING.writes = {}
+    return writes
+
+
+def is_staging() -> bool:
+    """Judge whether the writes are being staged."""
+    return _STAGING.root != ""
+
+
+def _staged_key(file_path: str) -> Optional[str]:
+    """The staging key of the file, or None if the file is not staged."""
+    if not is_staging():
+        return None
+    path = os.path.abspath(file_path)
+    if os.path.commonpath([_STAGING.root, path]) != _STAGING.root:
+        return None
+    return path
+
+
+def exists(file_path: str) -> bool:
+    """Judge whether the file exists, the staged files included."""
+    key = _staged_key(file_path)
+    if key is not None and key in _STAGING.writes:
+        return True
+    return os.path.exists(file_path)
+
+
+def _read_contents(file_path: str) -> Optional[str]:
+    """Read the (staged) contents of the file, None if it does not exist."""
+    key = _staged_key(file_path)
+    if key is not None and key in _STAGING.writes:
+        return _STAGING.writes[key]
+    if not os.path.exists(file_path):
+        return None
+    with open(file_path, encoding='utf-8') as f:
+        return f.read()
+
+
+def _stage_variables(file_path: str, load, dump, variables: Dict[str, Any]) -> bool:
+    """Stage the update of the variables, return False if the file is not staged."""
+    key = _staged_key(file_path)
+    if key is None:
+        return False
+    contents = _read_contents(file_path)
+    data = load(contents) if contents and contents.strip() else {}
+    if not isinstance(data, dict):
+        data = {}
+    data.update(variables)
+    _STAGING.writes[key] = dump(data)
+    return True
+
+
+# The C LibYAML bindings, if PyYAML was built with them
+_YamlLoader = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+
+
+class _YamlDumper(getattr(yaml, "CSafeDumper", yaml.SafeDumper)):
+    """The safe YAML dumper, writing the tuples as lists."""
+
+
+_YamlDumper.add_representer(tuple, _YamlDumper.represent_list)
+
+# The parsed YAML files: absolute path -> (file status, data)
+_YAML_CACHE: Dict[str, Tuple[Tuple[int, int, int, int], Any]] = {}
+_YAML_CACHE_SIZE = 4096
+
+
+def _yaml_load(contents: str) -> Any:
+    """Load the YAML contents."""
+    try:
+        return yaml.load(contents, Loader=_YamlLoader)
+    except yaml.constructor.ConstructorError:
+        # The files written by older versions may have python tags
+        return yaml.load(contents, Loader=yaml.Loader)
+
+
+def _yaml_dump(data: Any, stream=None) -> Any:
+    """Dump the data in YAML, to the stream or to a string."""
+    return yaml.dump(data, stream, Dumper=_YamlDumper)
+
+
+def _yaml_data(file_path: str) -> Any:
+    """The parsed (staged) contents of the YAML file,
+    None if it does not exist or is empty.
+
+    The result is shared by all the readers of the file and must not be modified.
+    """
+    key = _staged_key(file_path)
+    if key is not None and key in _STAGING.writes:
+        contents = _STAGING.writes[key]
+        return _yaml_load(contents) if contents.strip() else None
+    path = os.path.abspath(file_path)
+    try:
+        with open(path, encoding='utf-8') as f:
+            stat = os.fstat(f.fileno())
+            status = (stat.st_mtime_ns, stat.st_ctime_ns, stat.st_size, stat.st_ino)
+            cached = _YAML_CACHE.get(path)
+            if cached is not None and cached[0] == status:
+                METRICS.count("metadata.yaml_cache_hit")
+                return cached[1]
+            contents = f.read()
+    except FileNotFoundError:
+        _YAML_CACHE.pop(path, None)
+        return None
+    METRICS.count("metadata.yaml_load")
+    METRICS.add_bytes("metadata.yaml_read", len(contents))
+    data = _yaml_load(contents) if contents.strip() else None
+    if len(_YAML_CACHE) >= _YAML_CACHE_SIZE:
+        _YAML_CACHE.clear()
+    _YAML_CACHE[path] = (status, data)
+    return data
+
 
 class ConfigFile():
     """ConfigFile class used to read and write metadata in a JSON file.
@@ -33,14 +185,26 @@ class ConfigFile():
         Returns:
             The value of the variable or the default value.
         """
-        if not os.path.exists(self.file_path):
+        contents = _read_contents(self.file_path)
+        if contents is None or not contents.strip():
             return default
-        with open(self.file_path, encoding='utf-8') as f:
-            contents = f.read()
-            if not contents.strip():
-                return default
-            data = json.loads(contents)
-            return data.get(variable_name, default)
+        METRICS.count("metadata.json_parse")
+        METRICS.add_bytes("metadata.json_read", len(contents))
+        data = json.loads(contents)
+        return data.get(variable_name, default)
+
+    def read_variables(self) -> Dict[str, Any]:
+        """Get all the variables of the JSON file.
+
+        Returns:
+            dict: The variables, empty if the file does not exist.
+        """
+        contents = _read_contents(self.file_path)
+        if contents is None or not contents.strip():
+            return {}
+        METRICS.count("metadata.json_parse")
+        METRICS.add_bytes("metadata.json_read", len(contents))
+        return json.loads(contents)
 
     def write_variable(self, variable_name: str, value: Any) -> None:
         """Write a variable to the JSON file.
@@ -49,6 +213,9 @@ class ConfigFile():
             variable_name (str): The name of the variable to write.
             value: The value to write.
         """
+        if _stage_variables(self.file_path, json.loads, json.dumps, {variable_name: value}):
+            return
+        METRICS.count("metadata.json_write")
         os.makedirs(os.path.dirname(self.file_path), exist_ok=True)
         if not os.path.exists(self.file_path):
             with open(self.file_path, "w", encoding='utf-8') as f:
@@ -64,6 +231,32 @@ class ConfigFile():
             json.dump(data, f)
             fcntl.flock(f, fcntl.LOCK_UN)
 
+    def write_variables(self, variables: Dict[str, Any]) -> None:
+        """Write several variables to the JSON file at once.
+
+        Args:
+            variables (dict): The names and the values of the variables to write.
+        """
+        if _stage_variables(self.file_path, json.loads, json.dumps, variables):
+            return
+        METRICS.count("metadata.json_write")
+        os.makedirs(os.path.dirname(self.file_path), exist_ok=True)
+        if not os.path.exists(self.file_path):
+            # A new file is written in one shot
+            with open(self.file_path, "w", encoding='utf-8') as f:
+                json.dump(variables, f)
+            return
+
+        with open(self.file_path, "r+", encoding='utf-8') as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            contents = f.read()
+            data = json.loads(contents) if contents.strip() else {}
+            data.update(variables)
+            f.seek(0)
+            f.truncate()
+            json.dump(data, f)
+            fcntl.flock(f, fcntl.LOCK_UN)
+
 
 class YamlFile():
     """YamlFile class used to read and write metadata in a YAML file.
@@ -88,17 +281,21 @@ class YamlFile():
         Returns:
             The value of the variable or the default value.
         """
-        if not os.path.exists(self.file_path):
+        data = _yaml_data(self.file_path)
+        # Check data is of type dict
+        if not isinstance(data, dict) or variable_name not in data:
             return default
-        with open(self.file_path, encoding='utf-8') as f:
-            contents = f.read()
-            if not contents.strip():
-                return default
-            data = yaml.load(contents, Loader=yaml.Loader)
-            # Check data is of type dict
-            if not isinstance(data, dict):
-                return default
-            return data.get(variable_name, default)
+        # The parsed data is shared, the callers may modify the value
+        return copy.deepcopy(data[variable_name])
+
+    def read_variables(self) -> Dict[str, Any]:
+        """Get all the variables of the YAML file.
+
+        Returns:
+            dict: The variables, empty if the file does not exist.
+        """
+        data = _yaml_data(self.file_path)
+        return copy.deepcopy(data) if isinstance(data, dict) else {}
 
     def write_variable(self, variable_name: str, value: Any) -> None:
         """Write a variable to the YAML file.
@@ -107,21 +304,49 @@ class YamlFile():
             variable_name (str): The name of the variable to write.
             value: The value to write.
         """
+        if _stage_variables(self.file_path, _yaml_load, _yaml_dump, {variable_name: value}):
+            return
+        METRICS.count("metadata.yaml_write")
         os.makedirs(os.path.dirname(self.file_path), exist_ok=True)
         if not os.path.exists(self.file_path):
             with open(self.file_path, "w", encoding='utf-8') as f:
-                yaml.dump({}, f)
+                _yaml_dump({}, f)
 
         with open(self.file_path, "r+", encoding='utf-8') as f:
             fcntl.flock(f, fcntl.LOCK_EX)
             contents = f.read()
-            data = (
-                yaml.load(contents, Loader=yaml.Loader)
-                if contents.strip()
-                else {}
-            )
+            data = _yaml_load(contents) if contents.strip() else {}
             data[variable_name] = value
             f.seek(0)
             f.truncate()
-            yaml.dump(data, f)
+            _yaml_dump(data, f)
+            fcntl.flock(f, fcntl.LOCK_UN)
+        _YAML_CACHE.pop(os.path.abspath(self.file_path), None)
+
+    def write_variables(self, variables: Dict[str, Any]) -> None:
+        """Write several variables to the YAML file at once.
+
+        Args:
+            variables (dict): The names and the values of the variables to write.
+        """
+        if _stage_variables(self.file_path, _yaml_load, _yaml_dump, variables):
+            return
+        METRICS.count("metadata.yaml_write")
+        os.makedirs(os.path.dirname(self.file_path), exist_ok=True)
+        if not os.path.exists(self.file_path):
+            # A new file is written in one shot
+            with open(self.file_path, "w", encoding='utf-8') as f:
+                _yaml_dump(variables, f)
+            _YAML_CACHE.pop(os.path.abspath(self.file_path), None)
+            return
+
+        with open(self.file_path, "r+", encoding='utf-8') as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            contents = f.read()
+            data = _yaml_load(contents) if contents.strip() else {}
+            data.update(variables)
+            f.seek(0)
+            f.truncate()
+            _yaml_dump(data, f)
             fcntl.flock(f, fcntl.LOCK_UN)
+        _YAML_CACHE.pop(os.path.abspath(self.file_path), None)
@@ -0,0 +1,184 @@
+""" The metrics registry of Chern.
+
+The hot paths (the metadata files, the filesystem helpers of csys,
+the impressions and the requests to DITE) report into one registry:
+    counters: the number of calls, e.g. ``metadata.json_parse''
+    bytes: the number of bytes read or sent, e.g. ``dite.upload''
+    histograms: the latencies in seconds, e.g. ``dite.request''
+A metric may have labels, e.g. the endpoint of a DITE request.
+
+The registry is disabled by default and every report then returns at once,
+the shell enables it for the session (``metrics'' in $HOME/.Chern/config.json).
+The totals are shown by the ``stats'' command,
+and can be dumped as JSON or in the Prometheus text format.
+"""
+import bisect
+import json
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from typing import Dict, List, Tuple
+
+# The upper bounds (in seconds) of the latency buckets
+BUCKETS = (0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, float("inf"))
+
+Key = Tuple[str, Tuple[Tuple[str, str], ...]]
+
+
+def _key(name: str, labels: Dict[str, str]) -> Key:
+    return name, tuple(sorted((label, str(value)) for label, value in labels.items()))
+
+
+class Histogram:
+    """ The latency histogram of a metric """
+
+    def __init__(self):
+        self.buckets = [0] * len(BUCKETS)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, seconds: float) -> None:
+        """ Add a latency """
+        self.buckets[bisect.bisect_left(BUCKETS, seconds)] += 1
+        self.count += 1
+        self.sum += seconds
+
+    def as_dict(self) -> Dict:
+        """ The histogram as a dict """
+        return {"count": self.count, "sum": self.sum,
+                "buckets": dict(zip([str(bound) for bound in BUCKETS], self.buckets))}
+
+
+class ChernMetrics:
+    """ The metrics registry """
+    ins = None
+
+    def __init__(self):
+        self.enabled = False
+        self.lock = threading.Lock()
+        self.counters: Dict[Key, int] = {}
+        self.bytes: Dict[Key, int] = {}
+        self.histograms: Dict[Key, Histogram] = {}
+        self.started = time.time()
+
+    @classmethod
+    def instance(cls):
+        """ Singleton instance """
+        if cls.ins is None:
+            cls.ins = ChernMetrics()
+        return cls.ins
+
+    def reset(self) -> None:
+        """ Clear all the metrics """
+        with self.lock:
+            self.counters = {}
+            self.bytes = {}
+            self.histograms = {}
+            self.started = time.time()
+
+    def count(self, name: str, value: int = 1, **labels) -> None:
+        """ Increase a counter """
+        if not self.enabled:
+            return
+        key = _key(name, labels)
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def add_bytes(self, name: str, size: int, **labels) -> None:
+        """ Increase a byte total """
+        if not self.enabled:
+            return
+        key = _key(name, labels)
+        with self.lock:
+            self.bytes[key] = self.bytes.get(key, 0) + size
+
+    def observe(self, name: str, seconds: float, **labels) -> None:
+        """ Add a latency to a histogram """
+        if not self.enabled:
+            return
+        key = _key(name, labels)
+        with self.lock:
+            if key not in self.histograms:
+                self.histograms[key] = Histogram()
+            self.histograms[key].observe(seconds)
+
+    def timer(self, name: str, **labels):
+        """ A context manager observing the latency of the block """
+        if not self.enabled:
+            return nullcontext()
+        return self._timer(name, labels)
+
+    @contextmanager
+    def _timer(self, name: str, labels: Dict[str, str]):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    def snapshot(self) -> Dict[str, List[Dict]]:
+        """ The metrics as lists of {name, labels, value} """
+        with self.lock:
+            def entries(table, value):
+                return [{"name": name, "labels": dict(labels), "value": value(item)}
+                        for (name, labels), item in sorted(table.items())]
+            return {
+                "counters": entries(self.counters, lambda item: item),
+                "bytes": entries(self.bytes, lambda item: item),
+                "histograms": entries(self.histograms, lambda item: item.as_dict()),
+            }
+
+    def summary(self) -> str:
+        """ The totals as a readable table """
+        def label(entry):
+            if not entry["labels"]:
+                return entry["name"]
+            return entry["name"] + " [" + ", ".join(
+                f"{key}={value}" for key, value in entry["labels"].items()) + "]"
+
+        snapshot = self.snapshot()
+        lines = [f"Metrics since {time.strftime('%H:%M:%S', time.localtime(self.started))}"
+                 + ("" if self.enabled else " (disabled)")]
+        for entry in snapshot["counters"]:
+            lines.append(f"  {label(entry):<48} {entry['value']:>10}")
+        for entry in snapshot["bytes"]:
+            lines.append(f"  {label(entry):<48} {entry['value']:>10} bytes")
+        for entry in snapshot["histograms"]:
+            value = entry["value"]
+            mean = value["sum"] / value["count"] if value["count"] else 0.0
+            lines.append(f"  {label(entry):<48} {value['count']:>10}"
+                         f"  total {value['sum']:.3f} s  mean {1000 * mean:.2f} ms")
+        return "\n".join(lines) + "\n"
+
+    def to_json(self) -> str:
+        """ The metrics in JSON """
+        return json.dumps(dict(self.snapshot(), started=self.started), indent=2)
+
+    def to_prometheus(self) -> str:
+        """ The metrics in the Prometheus text format """
+        def metric(name, suffix):
+            return "chern_" + name.replace(".", "_").replace("-", "_") + suffix
+
+        def labels(values, extra=()):
+            items = list(values.items()) + list(extra)
+            if not items:
+                return ""
+            return "{" + ",".join(f'{label}="{value}"' for label, value in items) + "}"
+
+        snapshot = self.snapshot()
+        lines = []
+        for kind, suffix in (("counters", "_total"), ("bytes", "_bytes_total")):
+            for entry in snapshot[kind]:
+                lines.append(f"{metric(entry['name'], suffix)}{labels(entry['labels'])} "
+                             f"{entry['value']}")
+        for entry in snapshot["histograms"]:
+            name = metric(entry["name"], "_seconds")
+            cumulative = 0
+            for bound, count in entry["value"]["buckets"].items():
+                cumulative += count
+                le = "+Inf" if bound == "inf" else bound
+                lines.append(f"{name}_bucket{labels(entry['labels'], [('le', le)])} "
+                             f"{cumulative}")
+            lines.append(f"{name}_sum{labels(entry['labels'])} {entry['value']['sum']}")
+            lines.append(f"{name}_count{labels(entry['labels'])} {entry['value']['count']}")
+        return "\n".join(lines) + "\n"
@@ -0,0 +1,229 @@
+""" Profiling and timing tools for the Chern shell and command line.
+
+Profiler runs a block under cProfile (deterministic) or under a simple
+sampling profiler (a thread that records the stack of the profiled thread
+every few milliseconds), prints the hot spots and optionally writes them:
+    *.json: the speedscope format (https://www.speedscope.app), sampling only
+    other: the pstats format (cProfile), to be read by pstats or snakeviz
+
+CallCounter counts the filesystem calls (open, stat, lstat, listdir, scandir)
+and the HTTP requests (through requests) made in a block,
+it is used by the ``timing on'' mode of the shell.
+"""
+import builtins
+import cProfile
+import io
+import json
+import os
+import pstats
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+import requests
+
+SAMPLING_INTERVAL = 0.005
+DEFAULT_TOP = 20
+
+Frame = Tuple[str, int, str]
+
+
+class _Sampler(threading.Thread):
+    """ Record the stack of a thread at a fixed interval """
+
+    def __init__(self, thread_id: int, interval: float):
+        super().__init__(daemon=True)
+        self.thread_id = thread_id
+        self.interval = interval
+        self.samples: List[Tuple[Frame, ...]] = []
+        self.weights: List[float] = []
+        self.stopped = threading.Event()
+
+    def run(self):
+        last = time.perf_counter()
+        while not self.stopped.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)  # pylint: disable=protected-access
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append((code.co_filename, code.co_firstlineno, code.co_name))
+                frame = frame.f_back
+            now = time.perf_counter()
+            if stack:
+                stack.reverse()
+                self.samples.append(tuple(stack))
+                self.weights.append(now - last)
+            last = now
+
+
+class Profiler:
+    """ Profile the code run between start and stop """
+
+    def __init__(self, sampling: bool = False, interval: float = SAMPLING_INTERVAL):
+        self.sampling = sampling
+        self.interval = interval
+        self.profile: Optional[cProfile.Profile] = None
+        self.sampler: Optional[_Sampler] = None
+        self.elapsed = 0.0
+        self._start = 0.0
+
+    def start(self) -> None:
+        """ Start profiling the current thread """
+        self._start = time.perf_counter()
+        if self.sampling:
+            self.sampler = _Sampler(threading.get_ident(), self.interval)
+            self.sampler.start()
+        else:
+            self.profile = cProfile.Profile()
+            self.profile.enable()
+
+    def stop(self) -> None:
+        """ Stop profiling """
+        if self.sampler is not None:
+            self.sampler.stopped.set()
+            self.sampler.join()
+        if self.profile is not None:
+            self.profile.disable()
+        self.elapsed = time.perf_counter() - self._start
+
+    def hot_spots(self, top: int = DEFAULT_TOP) -> str:
+        """ The top functions, by cumulative time (cProfile)
+        or by the number of samples in which they run (sampling)
+        """
+        if self.profile is not None:
+            stream = io.StringIO()
+            stats = pstats.Stats(self.profile, stream=stream)
+            stats.strip_dirs().sort_stats("cumulative").print_stats(top)
+            return stream.getvalue()
+
+        samples = self.sampler.samples if self.sampler is not None else []
+        total = Counter()
+        own = Counter()
+        for stack in samples:
+            total.update(set(stack))
+            own[stack[-1]] += 1
+        lines = [f"{len(samples)} samples in {self.elapsed:.3f} s",
+                 f"{'total':>7} {'self':>7}  function"]
+        for frame, count in total.most_common(top):
+            filename, line, name = frame
+            lines.append(f"{100 * count / len(samples):6.1f}% "
+                         f"{100 * own[frame] / len(samples):6.1f}%"
+                         f"  {name} ({os.path.basename(filename)}:{line})")
+        return "\n".join(lines) + "\n"
+
+    def write(self, path: str, name: str = "chern") -> None:
+        """ Write the profile, in the speedscope format for *.json """
+        if not path.endswith(".json"):
+            if self.profile is None:
+                raise ValueError("The pstats output needs the cProfile mode")
+            self.profile.dump_stats(path)
+            return
+        if self.sampler is None:
+            raise ValueError("The speedscope output needs the sampling mode")
+        frames: Dict[Frame, int] = {}
+        samples = [[frames.setdefault(frame, len(frames)) for frame in stack]
+                   for stack in self.sampler.samples]
+        document = {
+            "$schema": "https://www.speedscope.app/file-format-schema.json",
+            "shared": {"frames": [{"name": frame[2], "file": frame[0], "line": frame[1]}
+                                  for frame in frames]},
+            "profiles": [{
+                "type": "sampled",
+                "name": name,
+                "unit": "seconds",
+                "startValue": 0,
+                "endValue": sum(self.sampler.weights),
+                "samples": samples,
+                "weights": self.sampler.weights,
+            }],
+            "name": name,
+            "exporter": "chern",
+        }
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(document, f)
+
+
+class CallCounter:
+    """ Count the filesystem calls and the HTTP requests made in the block """
+    FILESYSTEM_CALLS = ("stat", "lstat", "listdir", "scandir")
+
+    def __init__(self):
+        self.filesystem = Counter()
+        self.http = Counter()
+        self.elapsed = 0.0
+        self._originals = {}
+        self._start = 0.0
+        self._lock = threading.Lock()
+
+    def _count(self, counter: Counter, key: str) -> None:
+        with self._lock:
+            counter[key] += 1
+
+    def _wrap(self, counter: Counter, key: str, function):
+        def wrapper(*args, **kwargs):
+            self._count(counter, key)
+            return function(*args, **kwargs)
+        return wrapper
+
+    def __enter__(self) -> 'CallCounter':
+        self._originals = {(builtins, "open"): builtins.open}
+        for name in self.FILESYSTEM_CALLS:
+            self._originals[(os, name)] = getattr(os, name)
+        for (owner, name), function in self._originals.items():
+            setattr(owner, name, self._wrap(self.filesystem, name, function))
+
+        # requests.get, requests.post, ... all go through Session.request
+        original_request = requests.Session.request
+
+        def request(session, method, *args, **kwargs):
+            self._count(self.http, str(method).upper())
+            return original_request(session, method, *args, **kwargs)
+        self._originals[(requests.Session, "request")] = original_request
+        requests.Session.request = request
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.elapsed = time.perf_counter() - self._start
+        for (owner, name), function in self._originals.items():
+            setattr(owner, name, function)
+
+    def summary(self) -> str:
+        """ One line summary of the counts """
+        def counts(counter):
+            total = sum(counter.values())
+            if not total:
+                return "0"
+            return f"{total} (" + ", ".join(
+                f"{key} {value}" for key, value in counter.most_common()) + ")"
+        return (f"[timing] {self.elapsed:.3f} s, filesystem calls: {counts(self.filesystem)}, "
+                f"HTTP requests: {counts(self.http)}")
+
+
+def report(profiler: Profiler, top: int = DEFAULT_TOP, output: Optional[str] = None,
+           name: str = "chern") -> None:
+    """ Print the hot spots of the profiler and write the profile to output """
+    print(profiler.hot_spots(top), end="")
+    if output:
+        profiler.write(output, name)
+        print(f"Profile written to {output}")
+
+
+def start_profiler(sampling: bool = False, output: Optional[str] = None) -> Profiler:
+    """ Start a profiler, in the sampling mode for a speedscope output """
+    profiler = Profiler(sampling or (output or "").endswith(".json"))
+    profiler.start()
+    return profiler
+
+
+def profiled(function, *, sampling: bool = False, top: int = DEFAULT_TOP,
+             output: Optional[str] = None, name: str = "chern"):
+    """ Run the function under the profiler, print the hot spots and write the profile """
+    profiler = start_profiler(sampling, output)
+    try:
+        return function()
+    finally:
+        profiler.stop()
+        report(profiler, top, output, name)
@@ -508,6 +508,36 @@ class TestChernCommunicator(unittest.TestCase):
         prepare.remove_chern_project("demo_genfit_new")
         CHERN_CACHE.__init__()
 
+    @patch("Chern.kernel.chern_communicator.requests.get")
+    @patch("Chern.kernel.chern_communicator.requests.post")
+    def test_deposited_impressions(self, mock_post, mock_get):
+        print(Fore.BLUE + "Testing Deposited Impressions..." + Style.RESET)
+        prepare.create_chern_project("demo_genfit_new")
+        os.chdir("demo_genfit_new")
+
+        class FakeImpression:
+            def __init__(self, uuid):
+                self.uuid = uuid
+
+        impressions = [FakeImpression("abc123"), FakeImpression("def456")]
+
+        self.comm = ChernCommunicator()
+        self.comm.serverurl = MagicMock(return_value="localhost:8080")
+
+        # One request per impression, no batch request
+        mock_get.side_effect = lambda url, timeout: MagicMock(
+            text="TRUE" if url.endswith("def456") else "FALSE"
+        )
+        result = self.comm.deposited_impressions(impressions)
+        mock_post.assert_not_called()
+        self.assertEqual(mock_get.call_count, 2)
+        self.assertEqual(result, {"def456"})
+        self.assertEqual(self.comm.deposited_impressions([]), set())
+
+        os.chdir("..")
+        prepare.remove_chern_project("demo_genfit_new")
+        CHERN_CACHE.__init__()
+
     @patch("Chern.kernel.chern_communicator.requests.get")
     def test_kill(self, mock_get):
         print(Fore.BLUE + "Testing Kill..." + Style.RESET)
@@ -3,10 +3,18 @@ Unit tests for utils/csys.py module
 Tests for all utility functions in the csys module
 """
 import unittest
+import json
 import os
+import pstats
+import time
 import warnings
 from colored import Fore, Style
+from unittest.mock import patch
+import requests
 import Chern.utils.csys as csys
+from Chern.utils import metadata
+from Chern.utils import profiling
+from Chern.utils.metrics import ChernMetrics
 from Chern.kernel.chern_cache import ChernCache
 import prepare
 
@@ -157,6 +165,22 @@ class TestChernUtils(unittest.TestCase):
         finally:
             prepare.remove_chern_project("demo_genfit")
 
+    def test_clone_file(self):
+        """Test file cloning (reflink, hardlink or copy)"""
+        print(Fore.BLUE + "Testing clone_file..." + Style.RESET)
+        prepare.create_chern_project("demo_genfit")
+        try:
+            src = "demo_genfit/Gen/gendata.C"
+            dst = "demo_genfit/clone/gendata.C"
+            method = csys.clone_file(src, dst)
+            self.assertIn(method, ("reflink", "copy"))
+            self.assertEqual(csys.md5sum(src), csys.md5sum(dst))
+            method = csys.clone_file(src, dst, allow_hardlink=True)
+            self.assertIn(method, ("reflink", "hardlink", "copy"))
+            self.assertEqual(csys.md5sum(src), csys.md5sum(dst))
+        finally:
+            prepare.remove_chern_project("demo_genfit")
+
     def test_exists(self):
         """Test file existence check"""
         print(Fore.BLUE + "Testing exists..." + Style.RESET)
@@ -280,6 +304,108 @@ class TestChernUtils(unittest.TestCase):
         # This function is deprecated, just verify it exists
         self.assertTrue(hasattr(csys, 'remove_cache'))
 
+    def test_yaml_cache(self):
+        """Test the parse cache of the YAML files"""
+        print(Fore.BLUE + "Testing yaml cache..." + Style.RESET)
+        prepare.create_chern_project("demo_genfit")
+        try:
+            yaml_file = metadata.YamlFile("demo_genfit/test.yaml")
+            yaml_file.write_variables({"parameters": {"a": 1}, "alias": ["x"]})
+            with patch("Chern.utils.metadata._yaml_load",
+                       wraps=metadata._yaml_load) as load:
+                parameters = yaml_file.read_variable("parameters", {})
+                self.assertEqual(yaml_file.read_variable("alias", []), ["x"])
+                self.assertEqual(metadata.YamlFile("demo_genfit/test.yaml")
+                                 .read_variables()["parameters"], {"a": 1})
+                self.assertEqual(load.call_count, 1)
+                # The returned values are copies
+                parameters["b"] = 2
+                self.assertEqual(yaml_file.read_variable("parameters"), {"a": 1})
+
+                yaml_file.write_variable("alias", ("y", "z"))
+                self.assertEqual(yaml_file.read_variable("alias"), ["y", "z"])
+                # An edit outside of YamlFile is seen as well
+                with open("demo_genfit/test.yaml", "w", encoding="utf-8") as f:
+                    f.write("alias: [w]\n")
+                self.assertEqual(yaml_file.read_variable("alias"), ["w"])
+            self.assertIsNone(metadata.YamlFile("demo_genfit/none.yaml").read_variable("a"))
+        finally:
+            prepare.remove_chern_project("demo_genfit")
+
+    def test_profiling(self):
+        """Test the profiler and the call counter"""
+        print(Fore.BLUE + "Testing profiling..." + Style.RESET)
+        prepare.create_chern_project("demo_genfit")
+        try:
+            def work():
+                total = 0
+                for _ in range(20):
+                    total += len(csys.list_dir("demo_genfit"))
+                    time.sleep(0.002)
+                return total
+
+            result = profiling.profiled(work, output="demo_genfit/work.pstats")
+            self.assertGreater(result, 0)
+            stats = pstats.Stats("demo_genfit/work.pstats")
+            self.assertTrue(any(name == "work" for _, _, name in stats.stats))
+
+            profiling.profiled(work, output="demo_genfit/work.json")
+            with open("demo_genfit/work.json", encoding="utf-8") as f:
+                speedscope = json.load(f)
+            self.assertEqual(speedscope["profiles"][0]["type"], "sampled")
+            self.assertTrue(speedscope["profiles"][0]["samples"])
+
+            with profiling.CallCounter() as counter:
+                work()
+                try:
+                    requests.get("http://127.0.0.1:9/", timeout=0.1)
+                except requests.RequestException:
+                    pass
+            self.assertGreaterEqual(counter.filesystem["listdir"], 20)
+            self.assertEqual(counter.http["GET"], 1)
+            self.assertIn("HTTP requests: 1", counter.summary())
+            self.assertIs(os.listdir, counter._originals[(os, "listdir")])
+        finally:
+            prepare.remove_chern_project("demo_genfit")
+
+    def test_metrics(self):
+        """Test the metrics registry"""
+        print(Fore.BLUE + "Testing metrics..." + Style.RESET)
+        prepare.create_chern_project("demo_genfit")
+        metrics = ChernMetrics.instance()
+        try:
+            metrics.count("disabled.counter")
+            self.assertEqual(metrics.snapshot()["counters"], [])
+
+            metrics.enabled = True
+            config_file = metadata.ConfigFile("demo_genfit/.chern/config.json")
+            config_file.read_variable("object_type")
+            config_file.write_variable("metrics_test", 1)
+            csys.dir_mtime("demo_genfit")
+            metrics.observe("dite.request", 0.002, method="GET", endpoint="status")
+
+            counters = {entry["name"]: entry["value"]
+                        for entry in metrics.snapshot()["counters"]}
+            self.assertGreaterEqual(counters["metadata.json_parse"], 1)
+            self.assertEqual(counters["metadata.json_write"], 1)
+            histograms = {entry["name"]: entry["value"]
+                          for entry in metrics.snapshot()["histograms"]}
+            self.assertEqual(histograms["csys.dir_mtime"]["count"], 1)
+            self.assertEqual(histograms["dite.request"]["buckets"]["0.005"], 1)
+
+            dumped = json.loads(metrics.to_json())
+            self.assertIn("counters", dumped)
+            prometheus = metrics.to_prometheus()
+            self.assertIn("chern_metadata_json_write_total 1", prometheus)
+            self.assertIn('chern_dite_request_seconds_bucket{endpoint="status",'
+                          'method="GET",le="+Inf"} 1', prometheus)
+            self.assertIn("dite.request [endpoint=status, method=GET]", metrics.summary())
+        finally:
+            metrics.enabled = False
+            metrics.reset()
+            prepare.remove_chern_project("demo_genfit")
+            CHERN_CACHE.__init__()
+
 
 if __name__ == '__main__':
     unittest.main(verbosity=2)
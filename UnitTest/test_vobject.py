@@ -1,8 +1,28 @@
+import json
 import os
+import shutil
+import tarfile
+import threading
+import time
 import unittest
+from unittest.mock import patch
 from colored import Fore, Style
 import Chern.kernel.vobject as vobj
-from Chern.kernel.chern_cache import ChernCache
+import Chern.kernel.vtask as vtsk
+from Chern.kernel.vimpression import VImpression
+from Chern.kernel.vobj_file import FileManagement, LsParameters
+from Chern.utils import metadata
+from Chern.kernel.chern_cache import ChernCache, PATH_TABLES
+from Chern.kernel.chern_journal import ChernJournal
+from Chern.kernel.chern_impression_gc import ImpressionCollector
+from Chern.kernel.chern_impression_index import ImpressionIndex, impression_index
+from Chern.kernel.chern_diff import diff_trees
+from Chern.kernel.chern_doctor import ProjectDoctor
+from Chern.kernel.chern_layout_cache import ChernLayoutCache
+from Chern.kernel.chern_schedule import critical_path, levels, runtime_history, simulate
+from Chern.kernel.chern_result_cache import ChernResultCache, reusable
+from Chern.kernel.chern_trash import ChernTrash, wait_deletions
+from Chern.kernel.chern_communicator import ChernCommunicator
 import prepare
 
 CHERN_CACHE = ChernCache.instance()
@@ -151,6 +171,309 @@ class TestChernProject(unittest.TestCase):
         prepare.remove_chern_project("demo_genfit_new")
         CHERN_CACHE.__init__()
 
+    def test_add_inputs(self):
+        print(Fore.BLUE + "Testing Add Inputs..." + Style.RESET)
+        prepare.create_chern_project("demo_complex")
+        os.chdir("demo_complex")
+
+        # The cached statuses of the directories follow the new inputs
+        old = time.time() - 100
+        for dirpath, dirnames, filenames in os.walk("."):
+            for name in dirnames + filenames:
+                os.utime(os.path.join(dirpath, name), (old, old))
+        obj_top = vobj.VObject(".")
+        self.assertEqual(obj_top.status_tree()[os.path.join(".", "code")], "impressed")
+        self.assertEqual(vobj.VObject("code/qa1").add_inputs([("code/gen", "gen")]), 1)
+        statuses = obj_top.status_tree()
+        self.assertEqual(statuses[os.path.join(".", "code")], "new")
+        self.assertEqual(statuses[os.path.join(".", "tasks")], "new")
+
+        vtsk.create_tasks("tasks/sweep", 0, 3, parameters={})
+        vtsk.create_task("tasks/merge")
+        obj_merge = vobj.VObject("tasks/merge")
+
+        added = obj_merge.add_inputs(
+            [(f"tasks/sweep_{i}", f"s_{i}") for i in range(3)] +
+            [("tasks/merge", "self"), ("tasks/sweep_0", "dup"), ("code/ana1", "alg")]
+        )
+        self.assertEqual(added, 3)
+        self.assertEqual([obj.invariant_path() for obj in obj_merge.predecessors()],
+                         [f"tasks/sweep_{i}" for i in range(3)])
+        self.assertEqual(obj_merge.alias_to_path("s_2"), "tasks/sweep_2")
+        self.assertEqual(obj_merge.path_to_alias("tasks/sweep_1"), "s_1")
+        self.assertEqual(obj_merge.impression(), None)
+        for i in range(3):
+            self.assertTrue(vobj.VObject(f"tasks/sweep_{i}").has_successor(obj_merge))
+
+        # Replace an alias and check the loop within the batch
+        added = obj_merge.add_inputs([("tasks/taskGen", "s_0")])
+        self.assertEqual(added, 1)
+        self.assertFalse(vobj.VObject("tasks/sweep_0").has_successor(obj_merge))
+        self.assertEqual(obj_merge.alias_to_path("s_0"), "tasks/taskGen")
+        self.assertEqual(vobj.VObject("tasks/taskGen").add_inputs([("tasks/merge", "m")]), 0)
+
+        os.chdir("..")
+        prepare.remove_chern_project("demo_complex")
+        CHERN_CACHE.__init__()
+
+    def test_bulk_import(self):
+        print(Fore.BLUE + "Testing Bulk Import..." + Style.RESET)
+        prepare.create_chern_project("demo_complex")
+        os.chdir("demo_complex")
+
+        os.makedirs("inputs/data/sub/empty")
+        for name, contents in [("a.txt", "a"), ("b.txt", "bb"), ("c.dat", "c"),
+                               ("data/x.root", "x"), ("data/sub/y.root", "yy")]:
+            with open(f"inputs/{name}", "w", encoding="utf-8") as f:
+                f.write(contents)
+
+        obj_task = vobj.VObject("tasks/taskAna1")
+        progress = []
+        message = obj_task.import_files(["inputs/*.txt", "inputs/data", "inputs/missing"],
+                                        progress=lambda *args: progress.append(args))
+        self.assertIn("Imported 4 files", message.colored())
+        self.assertIn("File does not exist: inputs/missing", message.colored())
+        self.assertEqual(progress[-1][:2], (4, 4))
+        self.assertEqual(progress[-1][3], 6)
+        for name in ["a.txt", "b.txt", "data/x.root", "data/sub/y.root"]:
+            self.assertTrue(os.path.isfile(f"tasks/taskAna1/{name}"))
+        self.assertTrue(os.path.isdir("tasks/taskAna1/data/sub/empty"))
+        self.assertFalse(os.path.exists("tasks/taskAna1/c.dat"))
+
+        # Import again: the identical files are skipped, a different one is kept
+        os.remove("tasks/taskAna1/data/x.root")
+        with open("tasks/taskAna1/b.txt", "w", encoding="utf-8") as f:
+            f.write("changed")
+        message = obj_task.import_files(["inputs/*.txt", "inputs/data"])
+        self.assertIn("Imported 1 files", message.colored())
+        self.assertIn("skipped 2 identical files", message.colored())
+        self.assertIn("File already exists (different): b.txt", message.colored())
+        with open("tasks/taskAna1/b.txt", encoding="utf-8") as f:
+            self.assertEqual(f.read(), "changed")
+        self.assertEqual([name for name in os.listdir("tasks/taskAna1")
+                          if name.endswith(".chern_part")], [])
+
+        # A path is used literally when it exists, the patterns match hidden files
+        os.makedirs("more")
+        for name in ["run[1].txt", ".hidden"]:
+            with open(f"more/{name}", "w", encoding="utf-8") as f:
+                f.write(name)
+        message = obj_task.import_files(["more/run[1].txt"])
+        self.assertIn("Imported 1 files", message.colored())
+        self.assertTrue(os.path.isfile("tasks/taskAna1/run[1].txt"))
+        message = obj_task.import_files(["more/*"])
+        self.assertIn("Imported 1 files", message.colored())
+        self.assertTrue(os.path.isfile("tasks/taskAna1/.hidden"))
+
+        message = vobj.VObject("tasks").import_files(["inputs/a.txt"])
+        self.assertIn("only available for task or algorithm", message.colored())
+
+        os.chdir("..")
+        prepare.remove_chern_project("demo_complex")
+        CHERN_CACHE.__init__()
+
+    def test_trash(self):
+        print(Fore.BLUE + "Testing Trash..." + Style.RESET)
+        prepare.create_chern_project("demo_complex")
+        os.chdir("demo_complex")
+        project_path = os.getcwd()
+
+        message = vobj.VObject("tasks/taskQA").rm()
+        self.assertIn("trash restore tasks/taskQA", message.colored())
+        self.assertFalse(os.path.exists("tasks/taskQA"))
+        chern_trash = ChernTrash(project_path)
+        self.assertEqual([entry["paths"] for entry in chern_trash.entries()],
+                         [["tasks/taskQA"]])
+
+        self.assertIn("Restored tasks/taskQA",
+                      chern_trash.restore("tasks/taskQA").colored())
+        self.assertEqual(vobj.VObject("tasks/taskQA").object_type(), "task")
+        self.assertEqual(chern_trash.entries(), [])
+        self.assertIn("Not in the trash", chern_trash.restore("tasks/taskQA").colored())
+
+        obj_task = vobj.VObject("tasks/taskAna1")
+        with open("tasks/taskAna1/data.txt", "w", encoding="utf-8") as f:
+            f.write("data")
+        obj_task.rm_file("data.txt")
+        self.assertFalse(os.path.exists("tasks/taskAna1/data.txt"))
+        with open("tasks/taskAna1/data.txt", "w", encoding="utf-8") as f:
+            f.write("new")
+        self.assertIn("exists", chern_trash.restore("tasks/taskAna1/data.txt").colored())
+        os.remove("tasks/taskAna1/data.txt")
+
+        # The files removed together share one entry, and purge once
+        for name in ["x.txt", "y.txt", "z.txt"]:
+            with open(f"tasks/taskAna1/{name}", "w", encoding="utf-8") as f:
+                f.write(name)
+        with patch.object(ChernTrash, "purge") as mock_purge:
+            obj_task.rm_files(["x.txt", "y.txt", "z.txt", "chern.yaml"])
+            mock_purge.assert_called_once()
+        self.assertEqual(chern_trash.entries()[-1]["paths"],
+                         [f"tasks/taskAna1/{name}" for name in ["x.txt", "y.txt", "z.txt"]])
+        self.assertTrue(os.path.exists("tasks/taskAna1/chern.yaml"))
+        self.assertIn("Restored tasks/taskAna1/y.txt",
+                      chern_trash.restore("tasks/taskAna1/y.txt").colored())
+        self.assertEqual(chern_trash.entries()[-1]["paths"],
+                         ["tasks/taskAna1/x.txt", "tasks/taskAna1/z.txt"])
+        entry = chern_trash.entries()[-1]["entry"]
+        chern_trash.restore(entry)
+        self.assertTrue(os.path.exists("tasks/taskAna1/z.txt"))
+
+        # The expired entries are deleted in the background
+        vobj.VObject("tasks/taskQA").rm()
+        self.assertEqual(len(chern_trash.entries()), 2)
+        chern_trash.retention = 0
+        self.assertEqual(chern_trash.purge(), 2)
+        self.assertEqual(chern_trash.entries(), [])
+        wait_deletions()
+        self.assertEqual(os.listdir(".chern/trash"), [])
+
+        os.chdir("..")
+        prepare.remove_chern_project("demo_complex")
+        CHERN_CACHE.__init__()
+
+    def test_doctor(self):
+        print(Fore.BLUE + "Testing Doctor..." + Style.RESET)
+        prepare.create_chern_project("demo_genfit_new")
+        os.chdir("demo_genfit_new")
+
+        metadata.ConfigFile("GenTask/.chern/config.json").write_variable("successors", [])
+        metadata.ConfigFile("Gen/.chern/config.json").write_variable(
+            "successors", ["GenTask", "Ghost"])
+        metadata.ConfigFile("FitTask/.chern/config.json").write_variables({
+            "predecessors": ["Fit", "GenTask", "Ghost"],
+            "path_to_alias": {"GenTask": "gen", "Old": "old"},
+        })
+
+        project_doctor = ProjectDoctor(os.getcwd())
+        problems = project_doctor.check()
+        self.assertEqual(len(project_doctor.configs), 5)
+        self.assertEqual(sorted((problem.path, problem.kind) for problem in problems), [
+            ("FitTask", "chern.yaml aliases"),
+            ("FitTask", "missing predecessor"),
+            ("FitTask", "zombie alias"),
+            ("Gen", "missing successor"),
+            ("GenTask", "missing successor link"),
+        ])
+        self.assertIn("5 problems found in 5 objects", project_doctor.report().colored())
+
+        self.assertEqual(project_doctor.fix(), 3)
+        self.assertFalse(os.path.exists(".chern/journal.json"))
+        self.assertEqual(project_doctor.check(), [])
+        obj_fit_task = vobj.VObject("FitTask")
+        self.assertEqual([obj.invariant_path() for obj in obj_fit_task.predecessors()],
+                         ["Fit", "GenTask"])
+        self.assertEqual(obj_fit_task.config_file.read_variable("path_to_alias"),
+                         {"GenTask": "gen"})
+        self.assertEqual(metadata.YamlFile("FitTask/chern.yaml").read_variable("alias"),
+                         ["gen"])
+        self.assertEqual([obj.invariant_path() for obj in vobj.VObject("GenTask").successors()],
+                         ["FitTask"])
+        message, left = vobj.VObject("Gen").doctor()
+        self.assertIn("No problem found", message.colored())
+        self.assertEqual(left, 0)
+
+        os.chdir("..")
+        prepare.remove_chern_project("demo_genfit_new")
+        CHERN_CACHE.__init__()
+
+    def test_listing_snapshot(self):
+        print(Fore.BLUE + "Testing Listing Snapshot..." + Style.RESET)
+        prepare.create_chern_project("demo_complex")
+        os.chdir("demo_complex")
+
+        # Make the directory and the configs old enough to be trusted
+        old = time.time() - 100
+        for name in ["taskAna1", "taskAna2", "taskGen", "taskQA"]:
+            os.utime(f"tasks/{name}/.chern/config.json", (old, old))
+        os.utime("tasks", (old, old))
+
+        obj_tasks = vobj.VObject("tasks")
+        self.assertEqual(sorted(obj_tasks.listing_snapshot()),
+                         [("taskAna1", "task"), ("taskAna2", "task"),
+                          ("taskGen", "task"), ("taskQA", "task")])
+        with patch.object(metadata.ConfigFile, "read_variable") as mock_read:
+            self.assertEqual(len(obj_tasks.listing_snapshot()), 4)
+            mock_read.assert_not_called()
+
+        vtsk.create_task("tasks/taskNew")
+        self.assertIn(("taskNew", "task"), obj_tasks.listing_snapshot())
+
+        with patch.object(vobj.VObject, "status") as mock_status:
+            message = obj_tasks.show_sub_objects(obj_tasks.sub_objects(),
+                                                 LsParameters(status=True))
+            mock_status.assert_not_called()
+        self.assertIn("(new)", message.colored())
+
+        os.chdir("..")
+        prepare.remove_chern_project("demo_complex")
+        CHERN_CACHE.__init__()
+
+    def test_status_tree(self):
+        print(Fore.BLUE + "Testing Status Tree..." + Style.RESET)
+        prepare.create_chern_project("demo_complex")
+        os.chdir("demo_complex")
+
+        obj_top = vobj.VObject(".")
+        self.assertEqual(obj_top.status_tree()[obj_top.path], "impressed")
+
+        # Make the files old enough, the unchanged objects are not checked again
+        old = time.time() - 100
+        for dirpath, dirnames, filenames in os.walk("."):
+            for name in dirnames + filenames:
+                os.utime(os.path.join(dirpath, name), (old, old))
+        CHERN_CACHE.__init__()
+        obj_top.status_tree()
+        with patch.object(vobj.VObject, "is_impressed") as mock_impressed:
+            self.assertEqual(obj_top.status_tree()[obj_top.path], "impressed")
+            mock_impressed.assert_not_called()
+
+        # The cached statuses of the directories are reused, no directory is listed
+        with patch.object(vobj.VObject, "sub_objects") as mock_sub_objects:
+            self.assertEqual(obj_top.status_tree()[obj_top.path], "impressed")
+            mock_sub_objects.assert_not_called()
+
+        # A file edited outside of Chern is seen at once
+        with open("tasks/taskGen/chern.yaml", encoding="utf-8") as f:
+            contents = f.read()
+        with open("tasks/taskGen/chern.yaml", "a", encoding="utf-8") as f:
+            f.write("\n# changed\n")
+        statuses = obj_top.status_tree()
+        self.assertEqual(statuses[obj_top.path], "new")
+        self.assertEqual(statuses[os.path.join(obj_top.path, "tasks")], "new")
+        with open("tasks/taskGen/chern.yaml", "w", encoding="utf-8") as f:
+            f.write(contents)
+        self.assertEqual(obj_top.status_tree()[obj_top.path], "impressed")
+
+        # A change through Chern invalidates the chain of the ancestors
+        with open("extra.txt", "w", encoding="utf-8") as f:
+            f.write("extra")
+        vobj.VObject("code/ana1").import_file(os.path.abspath("extra.txt"))
+        statuses = obj_top.status_tree()
+        self.assertEqual(statuses[obj_top.path], "new")
+        self.assertEqual(statuses[os.path.join(obj_top.path, "code")], "new")
+        self.assertEqual(statuses[os.path.join(obj_top.path, "includes")], "impressed")
+        vobj.VObject("code/ana1").rm_file("extra.txt")
+        self.assertEqual(obj_top.status_tree()[obj_top.path], "impressed")
+
+        vtsk.create_task("tasks/taskNew")
+        statuses = obj_top.status_tree()
+        self.assertEqual(statuses[obj_top.path], "new")
+        self.assertEqual(statuses[os.path.join(obj_top.path, "tasks")], "new")
+        self.assertEqual(statuses[os.path.join(obj_top.path, "code")], "impressed")
+        self.assertEqual(obj_top.status(), "new")
+
+        with patch("Chern.kernel.vobj_execution.ChernCommunicator.instance") as mock_cc:
+            mock_cc.return_value.job_status.return_value = "finished"
+            obj_tasks = vobj.VObject("tasks")
+            job_statuses = obj_tasks.job_status_tree()
+            self.assertEqual(job_statuses[obj_tasks.path], "finished")
+            self.assertEqual(mock_cc.return_value.job_status.call_count, 5)
+
+        os.chdir("..")
+        prepare.remove_chern_project("demo_complex")
+        CHERN_CACHE.__init__()
+
     def test_execution(self):
         print(Fore.BLUE + "Testing Execution Commands..." + Style.RESET)
         prepare.create_chern_project("demo_genfit_new")
@@ -164,6 +487,366 @@ class TestChernProject(unittest.TestCase):
         prepare.remove_chern_project("demo_genfit_new")
         CHERN_CACHE.__init__()
 
+    def test_deposit(self):
+        print(Fore.BLUE + "Testing Deposit..." + Style.RESET)
+        prepare.create_chern_project("demo_complex")
+        os.chdir("demo_complex")
+        obj_tasks = vobj.VObject("tasks")
+        obj_gen = vobj.VObject("tasks/taskGen")
+        obj_ana1 = vobj.VObject("tasks/taskAna1")
+
+        with patch("Chern.kernel.vobj_execution.ChernCommunicator.instance") as mock_cc:
+            cherncc = mock_cc.return_value
+            cherncc.deposited_impressions.return_value = {obj_gen.impression().uuid}
+            uploaded = obj_tasks.deposit()
+            cherncc.deposited_impressions.assert_called_once()
+            deposited = [call.args[0].uuid for call in cherncc.deposit.call_args_list]
+            self.assertEqual(sorted(uploaded), sorted(deposited))
+            self.assertNotIn(obj_gen.impression().uuid, uploaded)
+            # The predecessors of the tasks are deposited too
+            self.assertIn(vobj.VObject("code/ana1").impression().uuid, uploaded)
+            for pred in obj_ana1.predecessors():
+                if pred.impression().uuid in uploaded:
+                    self.assertLess(uploaded.index(pred.impression().uuid),
+                                    uploaded.index(obj_ana1.impression().uuid))
+
+        os.chdir("..")
+        prepare.remove_chern_project("demo_complex")
+        CHERN_CACHE.__init__()
+
+    def test_submission_plan(self):
+        print(Fore.BLUE + "Testing Submission Plan..." + Style.RESET)
+        # a -> b (long), a -> c -> d
+        dependencies = {"a": set(), "b": {"a"}, "c": {"a"}, "d": {"c"}}
+        costs = {"a": 1.0, "b": 5.0, "c": 1.0, "d": 1.0}
+        priorities = critical_path(dependencies, costs)
+        self.assertEqual(priorities, {"a": 6.0, "b": 5.0, "c": 2.0, "d": 1.0})
+        self.assertEqual(levels(dependencies), {"a": 0, "b": 1, "c": 1, "d": 2})
+        self.assertEqual(simulate(dependencies, costs, priorities, 2), (["a", "b", "c", "d"], 6.0))
+        self.assertEqual(simulate(dependencies, costs, priorities, 1)[1], 8.0)
+
+        prepare.create_chern_project("demo_complex")
+        os.chdir("demo_complex")
+        obj_tasks = vobj.VObject("tasks")
+        history = runtime_history(os.getcwd())
+        history.record("tasks/taskAna1", 100.0)
+        history.record("tasks/taskAna1", 300.0)
+        history.record("tasks/taskGen", 50.0)
+        self.assertEqual(history.estimates(["tasks/taskAna1", "tasks/taskQA"]),
+                         {"tasks/taskAna1": 200.0, "tasks/taskQA": 125.0})
+
+        message = obj_tasks.submit(dry_run=True)
+        self.assertIn("Predicted makespan", message.colored())
+
+        # The dry run impresses nothing, and plans the new predecessors
+        with open("extra.txt", "w", encoding="utf-8") as f:
+            f.write("extra")
+        vobj.VObject("code/ana1").import_file(os.path.abspath("extra.txt"))
+        impressions = os.listdir(".chern/impressions")
+        message = vobj.VObject("tasks/taskAna1").submit(dry_run=True)
+        self.assertEqual(sorted(os.listdir(".chern/impressions")), sorted(impressions))
+        self.assertIn("code/ana1", message.colored())
+        self.assertNotIn("tasks/taskGen", message.colored())
+        self.assertIn("2 impressions", message.colored())
+        vobj.VObject("code/ana1").rm_file("extra.txt")
+
+        result_cache = ChernResultCache()
+        result_cache.index.file_path = os.path.join(os.getcwd(), "_results.json")
+        with patch("Chern.kernel.vobj_execution.ChernCommunicator.instance") as mock_cc, \
+             patch.object(ChernResultCache, 'ins', result_cache):
+            cherncc = mock_cc.return_value
+            cherncc.dite_status.return_value = "connected"
+            cherncc.deposited_impressions.return_value = set()
+            obj_tasks.submit("runner", waves=True)
+            waves = [call.args[0] for call in cherncc.execute.call_args_list]
+            self.assertGreater(len(waves), 1)
+            submitted = [uuid for wave in waves for uuid in wave]
+            self.assertEqual(sorted(submitted), sorted(obj_tasks.get_impressions()))
+            # A task is submitted in a later wave than its predecessors
+            for obj in obj_tasks.sub_objects():
+                for pred in obj.predecessors():
+                    if pred.impression().uuid in submitted:
+                        wave = next(i for i, w in enumerate(waves) if obj.impression().uuid in w)
+                        pred_wave = next(i for i, w in enumerate(waves)
+                                         if pred.impression().uuid in w)
+                        self.assertLess(pred_wave, wave)
+
+            # The runtime is recorded when the job is seen finished
+            uuid = vobj.VObject("tasks/taskQA").impression().uuid
+            self.assertIn(uuid, history.submitted)
+            cherncc.job_status.return_value = "finished"
+            vobj.VObject("tasks/taskQA").job_status()
+            self.assertNotIn(uuid, history.submitted)
+            self.assertEqual(len(history.runtimes()["tasks/taskQA"]), 1)
+
+        os.chdir("..")
+        prepare.remove_chern_project("demo_complex")
+        CHERN_CACHE.__init__()
+
+    def test_result_cache(self):
+        print(Fore.BLUE + "Testing Result Cache..." + Style.RESET)
+        # a -> b: a can not be reused if b runs
+        self.assertEqual(reusable({"a": set(), "b": {"a"}}, {"a": "x"}), {})
+        self.assertEqual(reusable({"a": set(), "b": {"a"}}, {"a": "x", "b": "y"}),
+                         {"a": "x", "b": "y"})
+        self.assertEqual(reusable({"a": set(), "b": {"a"}}, {"b": "y"}), {"b": "y"})
+
+        prepare.create_chern_project("demo_complex")
+        os.chdir("demo_complex")
+        obj_tasks = vobj.VObject("tasks")
+        obj_tasks.impress()
+        fingerprints = {obj.invariant_path(): obj.impression().fingerprint()
+                        for obj in obj_tasks.sub_objects()}
+        self.assertTrue(all(fingerprints.values()))
+
+        # The copies have the same fingerprints, until they change
+        obj_tasks.copy_to(os.getcwd() + "/tasks_copy")
+        obj_copy = vobj.VObject("tasks_copy")
+        for obj in obj_copy.sub_objects():
+            self.assertEqual(obj.impression().fingerprint(),
+                             fingerprints["tasks/" + os.path.basename(obj.path)])
+            self.assertNotEqual(obj.impression().uuid,
+                                vobj.VObject("tasks/" + os.path.basename(obj.path))
+                                .impression().uuid)
+        obj_qa = vobj.VObject("tasks_copy/taskQA")
+        with open("tasks_copy/taskQA/extra.txt", "w", encoding="utf-8") as f:
+            f.write("changed")
+        CHERN_CACHE.__init__()
+        obj_qa.impress()
+        self.assertNotEqual(obj_qa.impression().fingerprint(), fingerprints["tasks/taskQA"])
+
+        result_cache = ChernResultCache()
+        result_cache.index.file_path = os.path.join(os.getcwd(), "_results.json")
+        with patch("Chern.kernel.vobj_execution.ChernCommunicator.instance") as mock_cc, \
+             patch.object(ChernResultCache, 'ins', result_cache):
+            cherncc = mock_cc.return_value
+            cherncc.dite_status.return_value = "connected"
+            cherncc.serverurl.return_value = "dite:5000"
+            cherncc.deposited_impressions.return_value = set()
+            cherncc.local_run.return_value = None
+            for obj in obj_tasks.sub_objects():
+                cherncc.job_status.return_value = "finished"
+                obj.job_status()
+            # The status queries only note the results, the submit records them
+            self.assertFalse(os.path.exists("_results.json"))
+            self.assertEqual(len(result_cache.pending), 4)
+
+            obj_copy.submit("runner")
+            submitted = [uuid for call in cherncc.execute.call_args_list
+                         for uuid in call.args[0]]
+            # The changed task runs, and so does its input, needed on the DITE
+            self.assertEqual(sorted(submitted), sorted(
+                [obj_qa.impression().uuid, vobj.VObject("tasks_copy/taskGen").impression().uuid]))
+            obj_ana1 = vobj.VObject("tasks_copy/taskAna1")
+            source = vobj.VObject("tasks/taskAna1").impression().uuid
+            self.assertEqual(
+                obj_ana1.impression().config_file.read_variable("reused_from"), source)
+            self.assertEqual(ChernCommunicator.resolve(obj_ana1.impression()).uuid, source)
+            self.assertEqual(ChernCommunicator.resolve(obj_qa.impression()).uuid,
+                             obj_qa.impression().uuid)
+
+        os.chdir("..")
+        prepare.remove_chern_project("demo_complex")
+        CHERN_CACHE.__init__()
+
+    def test_impression_gc(self):
+        print(Fore.BLUE + "Testing Impression GC..." + Style.RESET)
+        prepare.create_chern_project("demo_complex")
+        os.chdir("demo_complex")
+        impressions_path = os.path.join(".chern", "impressions")
+        obj_gen = vobj.VObject("tasks/taskGen")
+
+        # An unreachable impression, and a parent in the history of taskGen
+        dead_uuid = "0" * 32
+        shutil.copytree(obj_gen.impression().path, os.path.join(impressions_path, dead_uuid))
+        with open("tasks/taskGen/chern.yaml", "a", encoding="utf-8") as f:
+            f.write("\n# changed\n")
+        parent_uuid = obj_gen.impression().uuid
+        obj_gen.impress()
+        self.assertEqual(obj_gen.impression().parents()[-1], parent_uuid)
+
+        collector = ImpressionCollector(os.getcwd())
+        report = collector.collect(dry_run=True)
+        self.assertEqual(report["dead"], [dead_uuid])
+        self.assertGreater(report["size"], 0)
+        self.assertTrue(os.path.exists(os.path.join(impressions_path, dead_uuid)))
+
+        report = collector.collect(archive="dead.tar")
+        self.assertEqual(report["dead"], [dead_uuid])
+        self.assertFalse(os.path.exists(os.path.join(impressions_path, dead_uuid)))
+        with tarfile.open("dead.tar") as tar:
+            self.assertIn(dead_uuid, tar.getnames())
+
+        # Thin the history, the old parent of taskGen is still
+        # a dependency of the impressions of its successors
+        report = collector.collect(keep_parents=0)
+        self.assertGreater(len(report["dead"]), 0)
+        self.assertNotIn(parent_uuid, report["dead"])
+        for obj in vobj.VObject(".").sub_objects_recursively():
+            if obj.is_task_or_algorithm():
+                self.assertFalse(obj.impression().is_zombie())
+                for pred in obj.impression().pred_impressions():
+                    self.assertFalse(pred.is_zombie())
+        # The parents left point to the impressions kept
+        CHERN_CACHE.__init__()
+        for uuid in collector.impressions():
+            for parent in VImpression(uuid, os.getcwd()).parents():
+                self.assertNotIn(parent, report["dead"])
+
+        # The impressions of the objects in the trash are kept
+        obj_qa = vobj.VObject("tasks/taskQA")
+        qa_uuid = obj_qa.impression().uuid
+        obj_qa.rm()
+        report = collector.collect()
+        self.assertNotIn(qa_uuid, report["dead"])
+        ChernTrash(os.getcwd()).restore("tasks/taskQA")
+        CHERN_CACHE.__init__()
+        obj_qa = vobj.VObject("tasks/taskQA")
+        self.assertEqual(obj_qa.impression().uuid, qa_uuid)
+        self.assertFalse(obj_qa.impression().is_zombie())
+        for pred in obj_qa.impression().pred_impressions():
+            self.assertFalse(pred.is_zombie())
+
+        os.chdir("..")
+        prepare.remove_chern_project("demo_complex")
+        CHERN_CACHE.__init__()
+
+    def test_impression_index(self):
+        print(Fore.BLUE + "Testing Impression Index..." + Style.RESET)
+        prepare.create_chern_project("demo_genfit_new")
+        os.chdir("demo_genfit_new")
+        obj_fitTask = vobj.VObject("FitTask")
+        obj_fitTask.impress()
+        impression = obj_fitTask.impression()
+        self.assertTrue(obj_fitTask.is_impressed())
+        self.assertEqual(impression.index_entry()["object_path"], "FitTask")
+        self.assertTrue(os.path.exists(".chern/impressions/index.sqlite"))
+
+        # A new process loads the index, the configs are not parsed again
+        CHERN_CACHE.__init__()
+        with patch.object(ImpressionIndex, "_read_entry") as mock_read:
+            self.assertTrue(obj_fitTask.is_impressed())
+            self.assertEqual(impression.pred_impressions()[0].uuid,
+                             impression.index_entry()["dependencies"][0])
+            mock_read.assert_not_called()
+
+        # The index in memory is loaded again when the database is replaced
+        index = impression_index(os.getcwd())
+        entries = index.entries
+        self.assertIsNotNone(entries)
+        os.remove(".chern/impressions/index.sqlite")
+        self.assertTrue(obj_fitTask.is_impressed())
+        self.assertIsNot(index.entries, entries)
+        self.assertIsNotNone(impression.index_entry())
+        self.assertTrue(os.path.exists(".chern/impressions/index.sqlite"))
+
+        # The returned lists are copies
+        impression.parents().append("dummy")
+        self.assertNotIn("dummy", impression.parents())
+
+        os.chdir("..")
+        prepare.remove_chern_project("demo_genfit_new")
+        CHERN_CACHE.__init__()
+
+    def test_trace_diff(self):
+        print(Fore.BLUE + "Testing Trace Diff..." + Style.RESET)
+        prepare.create_chern_project("demo_genfit_new")
+        os.chdir("demo_genfit_new")
+        for root in ("old", "new"):
+            os.makedirs(root)
+        files = {
+            "same.txt": ("a\nb\n", "a\nb\n"),
+            "text.txt": ("a\nb\n", "a\nc\n"),
+            "data.bin": (b"\0\1\2", b"\0\1\3"),
+            "large.csv": ("1,2\n" * 100, "1,3\n" * 100),
+        }
+        for name, (old, new) in files.items():
+            mode = "wb" if isinstance(old, bytes) else "w"
+            with open(os.path.join("old", name), mode) as f:
+                f.write(old)
+            with open(os.path.join("new", name), mode) as f:
+                f.write(new)
+        os.link("old/same.txt", "new/linked.txt")
+        os.link("old/same.txt", "old/linked.txt")
+
+        result = diff_trees("old", "new", list(files) + ["linked.txt"], ("r", "a"),
+                            max_bytes=100)
+        kinds = {name: kind for name, kind, _ in result}
+        self.assertEqual(kinds, {"text.txt": "text", "data.bin": "binary", "large.csv": "large"})
+        diff = dict((name, lines) for name, _, lines in result)
+        self.assertIn("+c\n", diff["text.txt"])
+        self.assertTrue(diff["large.csv"][0].startswith("size: 400 -> 400"))
+
+        # The trace prints the summary
+        obj_fitTask = vobj.VObject("FitTask")
+        obj_fitTask.impress()
+        obj_fitTask.trace()
+
+        os.chdir("..")
+        prepare.remove_chern_project("demo_genfit_new")
+        CHERN_CACHE.__init__()
+
+    def test_dependency_dag(self):
+        print(Fore.BLUE + "Testing Dependency DAG..." + Style.RESET)
+        prepare.create_chern_project("demo_complex")
+        os.chdir("demo_complex")
+        vtsk.create_tasks("tasks/sweep", 0, 4, parameters={})
+        for i in range(4):
+            vobj.VObject(f"tasks/sweep_{i}").add_input("tasks/taskGen", "gen")
+
+        graph = vobj.VObject(".").build_dependency_dag()
+        self.assertTrue(all(data["type"] == "dependency"
+                            for _, _, data in graph.edges(data=True)))
+        clusters = graph.graph["clusters"]
+        self.assertIn("tasks", clusters)
+        labels = [graph.nodes[node].get("label") for node in clusters["tasks"]]
+        self.assertIn("tasks/sweep_[0..3]", labels)
+        self.assertIn("code", clusters)
+
+        graph = vobj.VObject(".").build_dependency_dag(exclude_algorithms=True)
+        self.assertNotIn("code", graph.graph["clusters"])
+
+        os.chdir("..")
+        prepare.remove_chern_project("demo_complex")
+        CHERN_CACHE.__init__()
+
+    def test_layout_cache(self):
+        print(Fore.BLUE + "Testing Layout Cache..." + Style.RESET)
+        shutil.rmtree("layouts_tmp", ignore_errors=True)
+        with patch("Chern.utils.csys.local_config_dir",
+                   return_value=os.path.abspath("layouts_tmp")):
+            cache = ChernLayoutCache()
+        nodes = ["a", "b", "c", "d"]
+        edges = [("a", "b"), ("a", "c"), ("b", "d"), ("c", "d")]
+        full = {"a": (0.0, 200.0), "b": (-50.0, 100.0),
+                "c": (50.0, 100.0), "d": (0.0, 0.0)}
+        calls = []
+
+        def compute():
+            calls.append(1)
+            return full
+
+        self.assertEqual(cache.layout(nodes, edges, compute, scope="s"), full)
+        self.assertEqual(cache.layout(nodes, edges, compute, scope="s"), full)
+        self.assertEqual(len(calls), 1)
+
+        # A new successor of ``c'': only ``e'' is placed
+        positions = cache.layout(nodes + ["e"], edges + [("c", "e")],
+                                 compute, scope="s")
+        self.assertEqual(len(calls), 1)
+        for node in ("a", "b", "d"):
+            self.assertEqual(positions[node], full[node])
+        self.assertEqual(positions["c"], full["c"])
+        self.assertEqual(positions["e"][1], 0.0)
+        self.assertNotEqual(positions["e"], positions["d"])
+
+        # Too many changes: the full layout is computed again
+        cache.layout(["x", "y"], [("x", "y")], lambda: {"x": (0, 1), "y": (0, 0)},
+                     scope="s")
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(len(cache.load(cache.scopes.read_variable("s"))["nodes"]), 2)
+        shutil.rmtree("layouts_tmp", ignore_errors=True)
+
     def test_core(self):
         print(Fore.BLUE + "Testing Core Commands..." + Style.RESET)
         prepare.create_chern_project("demo_complex")
@@ -208,8 +891,36 @@ class TestChernProject(unittest.TestCase):
         self.assertEqual([obj.invariant_path() for obj in obj_task1.successors()], ['tasksDuplicate/taskAna2'])
         # self.assertEqual([obj.invariant_path() for obj in obj_task1.predecessors()], ['tasksDuplicate/taskGen'])
         self.assertEqual([obj.invariant_path() for obj in obj_task1.predecessors()], ['tasksDuplicate/taskGen', 'code/ana1'])
+        self.assertEqual(obj_task1.path_to_alias('tasksDuplicate/taskGen'), 'gen')
+        self.assertIn('tasksDuplicate/taskAna1',
+                      [obj.invariant_path() for obj in vobj.VObject("code/ana1").successors()])
+        # The new impressions are created from the source impressions
+        imp_copied = obj_task1.impression()
+        self.assertNotEqual(str(imp_copied), str(vobj.VObject("tasks/taskAna1").impression()))
+        self.assertEqual(imp_copied.config_file.read_variable("current_path"),
+                         'tasksDuplicate/taskAna1')
+        self.assertEqual(imp_copied.alias_to_impression_uuid('gen'),
+                         str(vobj.VObject("tasksDuplicate/taskGen").impression()))
         vobj.VObject("tasksDuplicate").rm()
 
+        # An object without a source impression is impressed before its successors
+        plan_impressions = FileManagement.copy_to_plan_impressions
+
+        def without_gen(obj, queue, new_path, plan):
+            impressions = plan_impressions(obj, queue, new_path, plan)
+            impressions.pop("tasksFallback/taskGen")
+            plan["tasksFallback/taskGen"]["impression"] = ""
+            return impressions
+
+        with patch.object(FileManagement, "copy_to_plan_impressions", without_gen):
+            obj_folder.copy_to("tasksFallback")
+        imp_gen = str(vobj.VObject("tasksFallback/taskGen").impression())
+        imp_ana1 = vobj.VObject("tasksFallback/taskAna1").impression()
+        self.assertTrue(vobj.VObject("tasksFallback/taskGen").is_impressed())
+        self.assertIn(imp_gen, imp_ana1.config_file.read_variable("dependencies"))
+        self.assertEqual(imp_ana1.alias_to_impression_uuid('gen'), imp_gen)
+        vobj.VObject("tasksFallback").rm()
+
         imp_taskAna1 = str(vobj.VObject("tasks/taskAna1").impression())
         imp_taskAna2 = str(vobj.VObject("tasks/taskAna2").impression())
         imp_taskQA = str(vobj.VObject("tasks/taskQA").impression())
@@ -222,7 +933,15 @@ class TestChernProject(unittest.TestCase):
         status, _ = obj_folder.move_to_check("tasksMoved")
         self.assertTrue(status)
 
+        def cached_under(path):
+            root = os.path.abspath(path)
+            return [key for name in PATH_TABLES for key in getattr(CHERN_CACHE, name)
+                    if os.path.abspath(key) == root
+                    or os.path.abspath(key).startswith(root + os.sep)]
+        self.assertTrue(cached_under("tasks"))
         obj_folder.move_to("tasksMoved")
+        # The entries cached under the old paths are dropped by the commit
+        self.assertEqual(cached_under("tasks"), [])
         self.assertIn('tasksMoved', [obj.invariant_path() for obj in obj_top.sub_objects()])
 
         for task, imp in zip(["taskAna1", "taskAna2", "taskQA", "taskGen"],
@@ -248,6 +967,69 @@ class TestChernProject(unittest.TestCase):
         prepare.remove_chern_project("demo_complex")
         CHERN_CACHE.__init__()
 
+    def test_journal_recovery(self):
+        print(Fore.BLUE + "Testing Journal Recovery..." + Style.RESET)
+
+        prepare.create_chern_project("demo_complex")
+        os.chdir("demo_complex")
+
+        journal = ChernJournal(os.getcwd())
+        self.assertFalse(journal.recover())
+
+        # Simulate a move interrupted right after the journal is committed
+        obj_folder = vobj.VObject("tasks")
+        writes = obj_folder.move_to_plan(obj_folder.sub_objects_recursively(), "tasksMoved")
+        self.assertIn("code/ana1/.chern/config.json", writes)
+        with open(journal.journal_path, "w", encoding="utf-8") as f:
+            json.dump({"renames": [["tasks", "tasksMoved"]], "writes": writes}, f)
+        self.assertTrue(journal.recover())
+        self.assertFalse(os.path.exists(journal.journal_path))
+        self.assertTrue(vobj.VObject("tasks").is_zombie())
+        self.assertIn("tasksMoved/taskAna1",
+                      [obj.invariant_path() for obj in vobj.VObject("code/ana1").successors()])
+        self.assertEqual(vobj.VObject("tasksMoved/taskAna1").path_to_alias("tasksMoved/taskGen"),
+                         "gen")
+
+        # The writes in a failed transaction are discarded
+        obj_ana1 = vobj.VObject("tasksMoved/taskAna1")
+        obj_qa = vobj.VObject("tasksMoved/taskQA")
+        with self.assertRaises(RuntimeError):
+            with journal.transaction():
+                obj_qa.add_arc_from(obj_ana1)
+                self.assertTrue(obj_qa.has_predecessor(obj_ana1))
+                raise RuntimeError("interrupted")
+        self.assertFalse(obj_qa.has_predecessor(obj_ana1))
+        self.assertFalse(obj_ana1.has_successor(obj_qa))
+
+        # The writes in a successful transaction are committed at once,
+        # the writes of the other threads are not staged
+        with journal.transaction():
+            obj_qa.add_arc_from(obj_ana1)
+            self.assertFalse(os.path.exists(journal.journal_path))
+            new_config = os.path.join(os.getcwd(), "tasksMoved/taskQA/.chern/new.json")
+            metadata.ConfigFile(new_config).write_variable("a", 1)
+            self.assertTrue(metadata.exists(new_config))
+            self.assertFalse(os.path.exists(new_config))
+            thread = threading.Thread(target=metadata.ConfigFile(
+                "tasksMoved/taskAna1/.chern/thread.json").write_variable, args=("b", 2))
+            thread.start()
+            thread.join()
+            self.assertTrue(os.path.exists("tasksMoved/taskAna1/.chern/thread.json"))
+        self.assertTrue(os.path.exists(new_config))
+        self.assertTrue(obj_qa.has_predecessor(obj_ana1))
+        self.assertTrue(obj_ana1.has_successor(obj_qa))
+        self.assertFalse(os.path.exists(journal.journal_path))
+
+        # An uncommitted journal is discarded
+        with open(journal.journal_path + ".chern_tmp", "w", encoding="utf-8") as f:
+            f.write("{")
+        self.assertFalse(journal.recover())
+        self.assertFalse(os.path.exists(journal.journal_path + ".chern_tmp"))
+
+        os.chdir("..")
+        prepare.remove_chern_project("demo_complex")
+        CHERN_CACHE.__init__()
+
     def test_init(self):
         print(Fore.BLUE + "Testing Init Commands..." + Style.RESET)
 
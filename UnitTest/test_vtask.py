@@ -1,10 +1,18 @@
 import os
+import stat
+import sys
 import unittest
 from unittest.mock import patch, MagicMock, ANY, mock_open
 from colored import Fore, Style
 import Chern.kernel.vtask as vtsk
 from Chern.kernel.chern_cache import ChernCache
 from Chern.kernel.chern_communicator import ChernCommunicator
+from Chern.kernel.chern_local_runner import LocalRunner, memory_bytes
+from Chern.kernel.chern_result_cache import ChernResultCache
+from Chern.kernel.chern_output_cache import ChernOutputCache
+from Chern.kernel.chern_staging import ChernStaging
+from Chern.kernel.valgorithm import VAlgorithm
+from Chern.utils import metadata
 import prepare
 
 CHERN_CACHE = ChernCache.instance()
@@ -166,6 +174,91 @@ class TestChernVTask(unittest.TestCase):
         prepare.remove_chern_project("demo_complex")
         CHERN_CACHE.__init__()
 
+    def test_workaround_shell(self):
+        """Test the staging area and the output cache of the workaround shell"""
+        print(Fore.BLUE + "Testing Workaround Shell..." + Style.RESET)
+
+        prepare.create_chern_project("demo_complex")
+        os.chdir("demo_complex")
+        obj_tsk = vtsk.VTask(os.getcwd() + "/tasks/taskAna1")
+        with open("code/ana1/ana.C", "w", encoding="utf-8") as f:
+            f.write("// original\n")
+
+        staging = ChernStaging()
+        staging.registry_dir = os.path.join(os.getcwd(), "_staging")
+        output_cache = ChernOutputCache()
+        output_cache.cache_dir = os.path.join(os.getcwd(), "_outputs")
+        output_cache.index.file_path = os.path.join(
+            output_cache.cache_dir, "index.json"
+        )
+
+        def export(impression, filename, output):
+            with open(output, "w", encoding="utf-8") as f:
+                f.write(impression.uuid + filename)
+
+        with patch.object(ChernCommunicator, 'instance') as mock_instance, \
+             patch.object(ChernStaging, 'ins', staging), \
+             patch.object(ChernOutputCache, 'ins', output_cache), \
+             patch.object(vtsk.VTask, 'is_impressed_fast', return_value=True), \
+             patch.object(vtsk.VTask, 'job_status', return_value="finished"):
+            mock_communicator = MagicMock()
+            mock_instance.return_value = mock_communicator
+            mock_communicator.dite_status.return_value = "connected"
+            mock_communicator.output_files.return_value = ["hist.root"]
+            mock_communicator.export.side_effect = export
+
+            ok, area = obj_tsk.workaround_preshell()
+            self.assertTrue(ok)
+            self.assertTrue(os.path.isfile(os.path.join(area, "chern.yaml")))
+            self.assertTrue(
+                os.path.isfile(os.path.join(area, "gen", "outputs", "hist.root"))
+            )
+            mock_communicator.collect.assert_called_once()
+
+            # Only the modified files are synced back
+            with open(os.path.join(area, "code", "ana.C"), "w", encoding="utf-8") as f:
+                f.write("// modified\n")
+            self.assertEqual(staging.modified_files(area, "code"), ["ana.C"])
+            obj_tsk.workaround_postshell(area)
+            with open("code/ana1/ana.C", encoding="utf-8") as f:
+                self.assertEqual(f.read(), "// modified\n")
+            self.assertFalse(os.path.exists(area))
+            self.assertEqual(staging.areas(), [])
+
+            # The read only files are not hardlinked, even without reflink
+            area = staging.create_area()
+            with patch("Chern.utils.csys.reflink", return_value=False):
+                methods = staging.stage_tree(area, "code/ana1", "code/lib", read_only=True)
+            self.assertEqual(list(methods), ["copy"])
+            staged = os.path.join(area, "code", "lib", "ana.C")
+            self.assertFalse(os.stat(staged).st_mode & stat.S_IWUSR)
+            os.chmod(staged, 0o644)
+            with open(staged, "w", encoding="utf-8") as f:
+                f.write("// edited in the shell\n")
+            with open("code/ana1/ana.C", encoding="utf-8") as f:
+                self.assertEqual(f.read(), "// modified\n")
+            staging.release(area)
+
+            # The outputs are reused in the next session
+            mock_communicator.reset_mock()
+            ok, area = obj_tsk.workaround_preshell()
+            self.assertTrue(ok)
+            mock_communicator.collect.assert_not_called()
+            mock_communicator.export.assert_not_called()
+            self.assertTrue(
+                os.path.isfile(os.path.join(area, "gen", "outputs", "hist.root"))
+            )
+            obj_tsk.workaround_postshell(area)
+
+            # Eviction keeps the cache within the capacity
+            with patch.object(ChernOutputCache, 'capacity', return_value=0):
+                self.assertEqual(len(output_cache.evict()), 1)
+            self.assertEqual(output_cache.size(), 0)
+
+        os.chdir("..")
+        prepare.remove_chern_project("demo_complex")
+        CHERN_CACHE.__init__()
+
     # def test_run_status_method(self):
     #     """Test run_status method with different scenarios"""
     #     print(Fore.BLUE + "Testing run_status Method..." + Style.RESET)
@@ -1585,6 +1678,124 @@ class TestChernVTask(unittest.TestCase):
         prepare.remove_chern_project("demo_complex")
         CHERN_CACHE.__init__()
 
+    def test_create_tasks(self):
+        """Test the bulk task creation"""
+        print(Fore.BLUE + "Testing create_tasks..." + Style.RESET)
+        prepare.create_chern_project("demo_complex")
+        os.chdir("demo_complex")
+
+        created = vtsk.create_tasks("tasks/sweep", 0, 5)
+        self.assertEqual(created, [f"tasks/sweep_{i}" for i in range(5)])
+        obj_tsk = vtsk.VTask(os.getcwd() + "/tasks/sweep_3")
+        self.assertEqual(obj_tsk.object_type(), "task")
+        self.assertEqual(obj_tsk.default_runner(), "local")
+        self.assertEqual(obj_tsk.environment(), "reanahub/reana-env-root6:6.18.04")
+        self.assertEqual(obj_tsk.parameters(), (["index"], {"index": "3"}))
+        self.assertEqual(obj_tsk.readme(), "Please write README for task tasks/sweep_3")
+
+        # The existing tasks are skipped, and the settings follow the template
+        created = vtsk.create_tasks("tasks/sweep", 4, 7,
+                                    parameters={"seed": "10{index}"},
+                                    template="tasks/taskGen")
+        self.assertEqual(created, ["tasks/sweep_5", "tasks/sweep_6"])
+        obj_tsk = vtsk.VTask(os.getcwd() + "/tasks/sweep_6")
+        self.assertEqual(obj_tsk.parameters(), (["seed"], {"seed": "106"}))
+        self.assertEqual(obj_tsk.memory_limit(), "256Mi")
+
+        # Not allowed inside a task
+        self.assertEqual(vtsk.create_tasks("tasks/taskGen/sub", 0, 2), [])
+
+        os.chdir("..")
+        prepare.remove_chern_project("demo_complex")
+        CHERN_CACHE.__init__()
+
+    def test_local_runner(self):
+        """Test the local execution of the impressions"""
+        print(Fore.BLUE + "Testing local runner..." + Style.RESET)
+        self.assertEqual(memory_bytes("256Mi"), 256 * 1024 ** 2)
+        self.assertEqual(memory_bytes("2G"), 2 * 1000 ** 3)
+        self.assertIsNone(memory_bytes("unlimited"))
+
+        prepare.create_chern_project("demo_complex")
+        os.chdir("demo_complex")
+        for name, commands in (
+                ("local_echo", ["test -f code/lib/value.txt",
+                                "echo ${n} > outputs/n.txt",
+                                "if [ -d in ]; then cat in/outputs/n.txt >> outputs/n.txt; fi"]),
+                # Over the memory limit (256Mi) of the task
+                ("local_fail", [f"{sys.executable} -c 'bytearray(1024 ** 3)'"])):
+            os.makedirs(f"code/{name}/.chern")
+            metadata.ConfigFile(f"code/{name}/.chern/config.json").write_variable(
+                "object_type", "algorithm")
+            metadata.YamlFile(f"code/{name}/chern.yaml").write_variables(
+                {"environment": "script", "commands": commands})
+        # An algorithm input of the algorithm, staged in code/lib
+        os.makedirs("code/local_lib/.chern")
+        metadata.ConfigFile("code/local_lib/.chern/config.json").write_variable(
+            "object_type", "algorithm")
+        metadata.YamlFile("code/local_lib/chern.yaml").write_variables({"environment": "script"})
+        with open("code/local_lib/value.txt", "w", encoding="utf-8") as f:
+            f.write("1")
+        VAlgorithm(os.getcwd() + "/code/local_echo").add_input(
+            os.getcwd() + "/code/local_lib", "lib")
+        tasks = {}
+        for name, algorithm in (("localA", "local_echo"), ("localB", "local_echo"),
+                                ("localC", "local_fail"), ("localD", "local_echo")):
+            vtsk.create_task(f"tasks/{name}")
+            tasks[name] = vtsk.VTask(os.getcwd() + f"/tasks/{name}")
+            tasks[name].add_algorithm(os.getcwd() + f"/code/{algorithm}")
+            tasks[name].add_parameter("n", name[-1])
+        tasks["localB"].add_input(os.getcwd() + "/tasks/localA", "in")
+        tasks["localD"].add_input(os.getcwd() + "/tasks/localC", "in")
+
+        runner = LocalRunner()
+        runner.runs_dir = os.path.join(os.getcwd(), "_runs")
+        runner.max_workers = 2
+        result_cache = ChernResultCache()
+        result_cache.index.file_path = os.path.join(os.getcwd(), "_results.json")
+        with patch.object(LocalRunner, 'ins', runner), \
+             patch.object(ChernResultCache, 'ins', result_cache), \
+             patch.object(ChernCommunicator, 'ins', None):
+            message = tasks["localB"].submit("local-exec")
+            # localB, localA, their algorithm and its algorithm input
+            self.assertIn("4 to run", message.colored())
+            tasks["localD"].submit_local(wait=True)
+            runner.wait()
+
+            cherncc = ChernCommunicator.instance()
+            impression = tasks["localB"].impression()
+            self.assertEqual(cherncc.job_status(impression), "finished")
+            self.assertEqual(cherncc.workflow(impression)[0], "local-exec")
+            self.assertEqual(cherncc.output_files(impression), ["n.txt"])
+            cherncc.export(impression, "n.txt", "n.txt")
+            with open("n.txt", encoding="utf-8") as f:
+                self.assertEqual(f.read().split(), ["B", "A"])
+
+            # The failure of localC stops localD
+            self.assertEqual(cherncc.job_status(tasks["localC"].impression()), "failed")
+            self.assertEqual(runner.record(tasks["localC"].impression().uuid)["returncode"], 1)
+            record = runner.record(tasks["localD"].impression().uuid)
+            self.assertEqual(record["status"], "failed")
+            self.assertIn("dependency", record["reason"])
+
+            # The finished impressions are not run again
+            self.assertEqual(runner.execute([impression]), ([], {}))
+
+            # An identical copy reuses the outputs
+            tasks["localA"].copy_to(os.getcwd() + "/tasks/localA_copy")
+            copy = vtsk.VTask(os.getcwd() + "/tasks/localA_copy")
+            self.assertEqual(copy.impression().fingerprint(),
+                             tasks["localA"].impression().fingerprint())
+            message = copy.submit_local(wait=True)
+            self.assertIn("0 to run", message.colored())
+            self.assertIn("1 reusing", message.colored())
+            self.assertEqual(cherncc.job_status(copy.impression()), "finished")
+            self.assertEqual(cherncc.output_files(copy.impression()), ["n.txt"])
+
+        os.chdir("..")
+        prepare.remove_chern_project("demo_complex")
+        CHERN_CACHE.__init__()
+
     # def test_create_task_function(self):
     #     """Test create_task function"""
     #     print(Fore.BLUE + "Testing create_task function..." + Style.RESET)